@@ -0,0 +1,262 @@
+"""
+Compact build and test results for the tester and bugfixer.
+
+Instead of handing the raw Maven log to the LLM, run_java_command reads the
+JUnit XML reports written by Surefire/Failsafe (or jest-junit) and falls back
+to the jest console summary. The result is a short summary of the test
+counts, the failing tests with their assertion messages and trimmed stack
+traces, and the build errors (e.g. compilation errors) from the log.
+"""
+
+import logging
+import os
+import re
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+REPORT_DIR_NAMES = ("surefire-reports", "failsafe-reports")
+SKIP_DIR_NAMES = {".git", "node_modules", ".tasks"}
+MAX_FAILURES = 10
+MAX_STACK_FRAMES = 6
+MAX_MESSAGE_CHARS = 500
+MAX_BUILD_ERRORS = 20
+
+# Frames aus Test-Framework und Reflection helfen dem Bugfixer nicht
+NOISE_FRAME_PREFIXES = (
+    "at org.junit.",
+    "at org.opentest4j.",
+    "at org.apache.maven.",
+    "at org.mockito.internal.",
+    "at java.base/",
+    "at jdk.internal.",
+    "at sun.reflect.",
+    "at java.lang.reflect.",
+    "at node:internal",
+    "at processTicksAndRejections",
+)
+
+# Zeilen im Maven/npm Log, die nur Rauschen sind
+NOISE_LINE_PATTERNS = (
+    re.compile(r"^\[INFO\] Download(ing|ed) from "),
+    re.compile(r"^Download(ing|ed) from "),
+    re.compile(r"^Progress \(\d+\)"),
+    re.compile(r"^\[INFO\] -+$"),
+    re.compile(r"^\[INFO\]\s*$"),
+    re.compile(r"^npm (WARN|notice) "),
+)
+
+BUILD_ERROR_PATTERN = re.compile(r"^\[ERROR\] (?!Tests run:|Failures:|\s*$)")
+JEST_SUMMARY_PATTERN = re.compile(r"^(Test Suites|Tests|Snapshots):\s+(.*)$")
+JEST_FAILURE_HEADER = re.compile(r"^\s*● (.+)$")
+
+
+@dataclass
+class TestFailure:
+    name: str
+    message: str = ""
+    trace: list[str] = field(default_factory=list)
+
+
+@dataclass
+class TestSummary:
+    source: str
+    tests: int = 0
+    failures: int = 0
+    errors: int = 0
+    skipped: int = 0
+    failed_tests: list[TestFailure] = field(default_factory=list)
+
+
+def is_noise_line(line: str) -> bool:
+    return any(pattern.match(line) for pattern in NOISE_LINE_PATTERNS)
+
+
+def is_result_line(line: str) -> bool:
+    """Lines that must survive the truncation of a long log."""
+    return bool(BUILD_ERROR_PATTERN.match(line)) or line.startswith(
+        ("[INFO] BUILD ", "[ERROR] BUILD ")
+    )
+
+
+def _trim_message(message: str) -> str:
+    message = (message or "").strip()
+    if len(message) > MAX_MESSAGE_CHARS:
+        return message[:MAX_MESSAGE_CHARS] + " ..."
+    return message
+
+
+def _trim_stack_trace(trace: str) -> list[str]:
+    """Keeps the frames of the project code and the 'Caused by' lines."""
+    frames = []
+    for raw_line in (trace or "").splitlines()[1:]:
+        line = raw_line.strip()
+        if line.startswith("Caused by:"):
+            frames.append(line)
+        elif line.startswith("at ") and not line.startswith(NOISE_FRAME_PREFIXES):
+            frames.append(line)
+        if len(frames) >= MAX_STACK_FRAMES:
+            break
+    return frames
+
+
+def _find_junit_reports(workspace: str, since: float) -> list[str]:
+    reports = []
+    for root, dirs, files in os.walk(workspace):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIR_NAMES]
+        in_report_dir = os.path.basename(root) in REPORT_DIR_NAMES
+        for name in files:
+            if not name.endswith(".xml"):
+                continue
+            if (in_report_dir and name.startswith("TEST-")) or name.startswith("junit"):
+                path = os.path.join(root, name)
+                # Nur Reports aus diesem Lauf, keine Reste von früheren Builds
+                if os.path.getmtime(path) >= since:
+                    reports.append(path)
+    return sorted(reports)
+
+
+def parse_junit_reports(workspace: str, since: float) -> TestSummary | None:
+    """
+    Reads the JUnit XML reports (Surefire, Failsafe, jest-junit) that were
+    written after 'since'. Returns None if there are none.
+    """
+    report_files = _find_junit_reports(workspace, since)
+    if not report_files:
+        return None
+
+    summary = TestSummary(source="junit-xml")
+    for report_file in report_files:
+        try:
+            root = ET.parse(report_file).getroot()
+        except ET.ParseError as e:
+            logger.warning(f"Could not parse test report {report_file}: {e}")
+            continue
+
+        suites = [root] if root.tag == "testsuite" else root.iter("testsuite")
+        for suite in suites:
+            for case in suite.iter("testcase"):
+                summary.tests += 1
+                if case.find("skipped") is not None:
+                    summary.skipped += 1
+                    continue
+
+                problem = case.find("failure")
+                if problem is not None:
+                    summary.failures += 1
+                else:
+                    problem = case.find("error")
+                    if problem is None:
+                        continue
+                    summary.errors += 1
+
+                if len(summary.failed_tests) >= MAX_FAILURES:
+                    continue
+                classname = case.get("classname") or suite.get("name") or ""
+                message = problem.get("message") or ""
+                if problem.get("type") and problem.get("type") not in message:
+                    message = f"{problem.get('type')}: {message}"
+                summary.failed_tests.append(
+                    TestFailure(
+                        name=f"{classname}.{case.get('name')}".lstrip("."),
+                        message=_trim_message(message),
+                        trace=_trim_stack_trace(problem.text),
+                    )
+                )
+    return summary
+
+
+def parse_jest_output(output: str) -> TestSummary | None:
+    """Extracts the summary lines and failure blocks of the jest console output."""
+    lines = output.splitlines()
+    counts = {}
+    for line in lines:
+        match = JEST_SUMMARY_PATTERN.match(line.strip())
+        if match:
+            counts[match.group(1)] = match.group(2)
+    if "Tests" not in counts:
+        return None
+
+    def _count(label: str) -> int:
+        match = re.search(rf"(\d+) {label}", counts["Tests"])
+        return int(match.group(1)) if match else 0
+
+    summary = TestSummary(
+        source="jest",
+        tests=_count("total"),
+        failures=_count("failed"),
+        skipped=_count("skipped"),
+    )
+
+    current = None
+    for line in lines:
+        header = JEST_FAILURE_HEADER.match(line)
+        if header:
+            if len(summary.failed_tests) >= MAX_FAILURES:
+                break
+            current = TestFailure(name=header.group(1).strip())
+            summary.failed_tests.append(current)
+            continue
+        if current is None:
+            continue
+        stripped = line.strip()
+        if stripped.startswith("at "):
+            if not stripped.startswith(NOISE_FRAME_PREFIXES) and "node_modules" not in stripped:
+                if len(current.trace) < MAX_STACK_FRAMES:
+                    current.trace.append(stripped)
+        elif stripped and not current.trace and len(current.message) < MAX_MESSAGE_CHARS:
+            current.message = _trim_message(f"{current.message} {stripped}")
+    return summary
+
+
+def extract_build_errors(output: str) -> list[str]:
+    """Returns the distinct [ERROR] lines of a Maven log (e.g. compile errors)."""
+    errors = []
+    for line in output.splitlines():
+        if BUILD_ERROR_PATTERN.match(line) and line not in errors:
+            errors.append(line)
+            if len(errors) >= MAX_BUILD_ERRORS:
+                break
+    return errors
+
+
+def format_test_summary(summary: TestSummary) -> str:
+    lines = [
+        f"Tests: {summary.tests} run, {summary.failures} failed, "
+        f"{summary.errors} errors, {summary.skipped} skipped ({summary.source})"
+    ]
+    for failure in summary.failed_tests:
+        lines.append(f"FAILED {failure.name}")
+        if failure.message:
+            lines.append(f"  {failure.message}")
+        lines.extend(f"    {frame}" for frame in failure.trace)
+    hidden = summary.failures + summary.errors - len(summary.failed_tests)
+    if hidden > 0:
+        lines.append(f"... and {hidden} more failed tests")
+    return "\n".join(lines)
+
+
+def summarize_build_output(workspace: str, output: str, since: float) -> str | None:
+    """
+    Builds the compact result of a build/test command. Returns None if there
+    are neither test results nor build errors, so the caller can fall back to
+    the (noise-filtered) log.
+    """
+    summary = parse_junit_reports(workspace, since) or parse_jest_output(output)
+    build_errors = extract_build_errors(output)
+
+    parts = []
+    if summary is not None:
+        parts.append(format_test_summary(summary))
+    # Bei Testfehlern wiederholen die [ERROR] Zeilen nur die Failures
+    if build_errors and (summary is None or not summary.failed_tests):
+        parts.append("Build errors:\n" + "\n".join(build_errors))
+    if not parts:
+        return None
+
+    if "BUILD SUCCESS" in output:
+        parts.append("BUILD SUCCESS")
+    elif "BUILD FAILURE" in output:
+        parts.append("BUILD FAILURE")
+    return "\n\n".join(parts)
@@ -0,0 +1,358 @@
+"""
+Checkpointed graph runs in the app database.
+
+SqlAlchemyCheckpointSaver is a LangGraph checkpointer on top of the app's
+SQLAlchemy database (GraphCheckpoint / GraphCheckpointWrite). Runs of a card
+use the card id as thread id, so LangGraph stores a checkpoint after every
+completed node. Only the newest CHECKPOINTS_KEPT_PER_THREAD checkpoints of a
+thread are kept; the worker only ever resumes from the latest one.
+
+A GraphRun row exists while a card run has not reached the end. The worker
+creates it when a run starts and removes it together with the checkpoints
+when the run finishes. A row left over at the start of a cycle belongs to an
+interrupted run (error, recursion limit, restart); the worker resumes it from
+its last checkpoint in the kept worktree, up to RESUME_MAX_ATTEMPTS times.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections.abc import AsyncIterator, Iterator, Sequence
+from datetime import datetime, timezone
+from typing import Any
+
+from flask import Flask
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from extensions import db
+from models import GraphCheckpoint, GraphCheckpointWrite, GraphRun
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTS_KEPT_PER_THREAD = 3
+RESUME_MAX_ATTEMPTS = int(os.environ.get("RESUME_MAX_ATTEMPTS", "3"))
+
+
+def _thread_config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+        }
+    }
+
+
+def _delete_checkpoints(thread_id: str) -> None:
+    GraphCheckpointWrite.query.filter_by(thread_id=thread_id).delete()
+    GraphCheckpoint.query.filter_by(thread_id=thread_id).delete()
+
+
+class SqlAlchemyCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer that stores checkpoints in the app database. Every
+    call runs in its own app context; the async variants run the sync ones in
+    a worker thread, so the runtime loop never blocks on the database.
+    """
+
+    def __init__(self, app: Flask, keep_per_thread: int = CHECKPOINTS_KEPT_PER_THREAD):
+        super().__init__()
+        self.app = app
+        self.keep_per_thread = keep_per_thread
+
+    # --- Sync API ---
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        configurable = config["configurable"]
+        with self.app.app_context():
+            query = GraphCheckpoint.query.filter_by(
+                thread_id=configurable["thread_id"],
+                checkpoint_ns=configurable.get("checkpoint_ns", ""),
+            )
+            if checkpoint_id := get_checkpoint_id(config):
+                row = query.filter_by(checkpoint_id=checkpoint_id).first()
+            else:
+                row = query.order_by(GraphCheckpoint.checkpoint_id.desc()).first()
+            return self._to_tuple(row) if row else None
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        with self.app.app_context():
+            query = GraphCheckpoint.query
+            if config:
+                configurable = config["configurable"]
+                query = query.filter_by(thread_id=configurable["thread_id"])
+                if configurable.get("checkpoint_ns") is not None:
+                    query = query.filter_by(checkpoint_ns=configurable["checkpoint_ns"])
+                if checkpoint_id := get_checkpoint_id(config):
+                    query = query.filter_by(checkpoint_id=checkpoint_id)
+            if before and (before_id := get_checkpoint_id(before)):
+                query = query.filter(GraphCheckpoint.checkpoint_id < before_id)
+
+            results = []
+            for row in query.order_by(GraphCheckpoint.checkpoint_id.desc()):
+                if limit is not None and len(results) >= limit:
+                    break
+                checkpoint_tuple = self._to_tuple(row)
+                if filter and any(
+                    checkpoint_tuple.metadata.get(key) != value
+                    for key, value in filter.items()
+                ):
+                    continue
+                results.append(checkpoint_tuple)
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+
+        with self.app.app_context():
+            row = GraphCheckpoint.query.filter_by(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+            ).first()
+            if row is None:
+                row = GraphCheckpoint(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint["id"],
+                )
+                db.session.add(row)
+            row.parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+            row.type = checkpoint_type
+            row.checkpoint = checkpoint_blob
+            row.metadata_type = metadata_type
+            row.checkpoint_metadata = metadata_blob
+            row.created_at = datetime.now(timezone.utc)
+            self._prune(thread_id, checkpoint_ns)
+            db.session.commit()
+
+        return _thread_config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        configurable = config["configurable"]
+        keys = {
+            "thread_id": configurable["thread_id"],
+            "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+            "checkpoint_id": configurable["checkpoint_id"],
+            "task_id": task_id,
+        }
+        with self.app.app_context():
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                row = GraphCheckpointWrite.query.filter_by(**keys, idx=idx).first()
+                if row is not None and idx >= 0:
+                    # Reguläre Writes sind idempotent, nur Sonder-Writes (Fehler, Interrupts) ersetzen
+                    continue
+                if row is None:
+                    row = GraphCheckpointWrite(**keys, idx=idx)
+                    db.session.add(row)
+                row.task_path = task_path
+                row.channel = channel
+                row.type, row.value = self.serde.dumps_typed(value)
+            db.session.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.app.app_context():
+            _delete_checkpoints(thread_id)
+            db.session.commit()
+
+    # InMemorySaver zählt Versionen als "<n>.<zufall>", das passt auch hier
+    get_next_version = InMemorySaver.get_next_version
+
+    # --- Async API ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in results:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # --- Helpers ---
+
+    def _to_tuple(self, row: GraphCheckpoint) -> CheckpointTuple:
+        writes = GraphCheckpointWrite.query.filter_by(
+            thread_id=row.thread_id,
+            checkpoint_ns=row.checkpoint_ns,
+            checkpoint_id=row.checkpoint_id,
+        ).all()
+        writes.sort(key=lambda w: writes_sort_key(w.task_path, w.task_id, w.idx))
+        return CheckpointTuple(
+            config=_thread_config(row.thread_id, row.checkpoint_ns, row.checkpoint_id),
+            checkpoint=self.serde.loads_typed((row.type, row.checkpoint)),
+            metadata=self.serde.loads_typed((row.metadata_type, row.checkpoint_metadata)),
+            parent_config=(
+                _thread_config(row.thread_id, row.checkpoint_ns, row.parent_checkpoint_id)
+                if row.parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (w.task_id, w.channel, self.serde.loads_typed((w.type, w.value)))
+                for w in writes
+            ],
+        )
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        db.session.flush()
+        outdated = [
+            checkpoint_id
+            for (checkpoint_id,) in db.session.query(GraphCheckpoint.checkpoint_id)
+            .filter_by(thread_id=thread_id, checkpoint_ns=checkpoint_ns)
+            .order_by(GraphCheckpoint.checkpoint_id.desc())
+            .offset(self.keep_per_thread)
+        ]
+        if not outdated:
+            return
+        for model in (GraphCheckpointWrite, GraphCheckpoint):
+            model.query.filter(
+                model.thread_id == thread_id,
+                model.checkpoint_ns == checkpoint_ns,
+                model.checkpoint_id.in_(outdated),
+            ).delete(synchronize_session=False)
+
+
+_checkpointers: dict[int, SqlAlchemyCheckpointSaver] = {}
+
+
+def get_checkpointer(app: Flask) -> SqlAlchemyCheckpointSaver:
+    """Returns the process-wide checkpointer of the app."""
+    if id(app) not in _checkpointers:
+        _checkpointers[id(app)] = SqlAlchemyCheckpointSaver(app)
+    return _checkpointers[id(app)]
+
+
+# --- Run registry ---
+
+
+def start_graph_run(
+    app: Flask, thread_id: str, card: dict, trello_list_id: str | None, workspace: str
+) -> int:
+    """Registers a (resumed) run of a card and returns its attempt number."""
+    with app.app_context():
+        run = db.session.get(GraphRun, thread_id)
+        if run is None:
+            run = GraphRun(thread_id=thread_id, attempts=0)
+            db.session.add(run)
+        run.card_json = json.dumps(card)
+        run.trello_list_id = trello_list_id
+        run.workspace = workspace
+        run.attempts += 1
+        run.updated_at = datetime.now(timezone.utc)
+        db.session.commit()
+        return run.attempts
+
+
+def fail_graph_run(app: Flask, thread_id: str, error: str) -> None:
+    with app.app_context():
+        run = db.session.get(GraphRun, thread_id)
+        if run is not None:
+            run.last_error = error[:2000]
+            run.updated_at = datetime.now(timezone.utc)
+            db.session.commit()
+
+
+def remove_graph_run(app: Flask, thread_id: str) -> None:
+    """Forgets a run together with its checkpoints (finished or given up)."""
+    with app.app_context():
+        GraphRun.query.filter_by(thread_id=thread_id).delete()
+        _delete_checkpoints(thread_id)
+        db.session.commit()
+
+
+def get_interrupted_runs(app: Flask) -> list[dict]:
+    """
+    Returns the runs left over from earlier cycles as open tasks for the
+    worker (oldest first). Runs that already used up RESUME_MAX_ATTEMPTS are
+    dropped; their cards stay in the in-progress list for a human to look at.
+    """
+    with app.app_context():
+        runs = GraphRun.query.order_by(GraphRun.updated_at).all()
+        open_tasks = []
+        for run in runs:
+            if run.attempts >= RESUME_MAX_ATTEMPTS:
+                logger.error(
+                    f"Giving up on run {run.thread_id} after {run.attempts} attempts. "
+                    f"Last error: {run.last_error}"
+                )
+                GraphRun.query.filter_by(thread_id=run.thread_id).delete()
+                _delete_checkpoints(run.thread_id)
+                continue
+            open_tasks.append(
+                {
+                    "trello_card": json.loads(run.card_json),
+                    "trello_list_id": run.trello_list_id,
+                    "resume_workspace": run.workspace,
+                }
+            )
+        db.session.commit()
+        return open_tasks
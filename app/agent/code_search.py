@@ -0,0 +1,313 @@
+"""
+Trigram index for the search_code tool.
+
+Per workspace the index stores the lower-cased trigrams of every text file
+from the file index (repo_index). A query is narrowed down to the files that
+contain all trigrams of the search string, and only those are scanned. The
+index is persisted as JSON in the git directory of the workspace, so it
+survives restarts and every worktree has its own. It is refreshed
+incrementally: files whose mtime or size changed are re-indexed, deleted
+files are dropped, and write_to_file updates single files right away.
+Entries of unmodified tracked files carry their git blob id, so a new task
+worktree starts from the index of the base clone and only indexes the files
+that differ. Everything runs locally.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+from agent.repo_index import clean_blob_ids, get_file_index, git_output, main_worktree
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+INDEX_FILE_NAME = "agent-search-index.json"
+MAX_INDEXED_FILE_BYTES = 1_000_000
+BINARY_SNIFF_BYTES = 8192
+MAX_SEARCH_OUTPUT_CHARS = 15000
+MAX_LINE_CHARS = 300
+
+
+def _trigrams(text: str) -> set[str]:
+    text = text.lower()
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass
+class _FileEntry:
+    mtime: float
+    size: int
+    trigrams: frozenset
+    blob: str | None = None  # git blob id, solange die Datei unverändert ist
+
+
+class CodeSearchIndex:
+    """Trigram index of one workspace."""
+
+    def __init__(self, workspace: str, seed: "CodeSearchIndex | None" = None):
+        self.workspace = workspace
+        self._files: dict[str, _FileEntry] = {}
+        self._postings: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+        self._index_file = self._locate_index_file()
+        self._load()
+        if not self._files and seed is not None:
+            self._seed_from(seed)
+
+    # --- Persistence ---
+
+    def _locate_index_file(self) -> str | None:
+        git_dir = git_output(self.workspace, "rev-parse", "--absolute-git-dir")
+        return os.path.join(git_dir.strip(), INDEX_FILE_NAME) if git_dir else None
+
+    def _load(self) -> None:
+        if not self._index_file or not os.path.exists(self._index_file):
+            return
+        try:
+            with open(self._index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return
+            for path, entry in data["files"].items():
+                self._add_entry(
+                    path,
+                    _FileEntry(
+                        float(entry["mtime"]),
+                        int(entry["size"]),
+                        frozenset(str(t) for t in entry["trigrams"]),
+                        str(entry["blob"]) if entry.get("blob") else None,
+                    ),
+                )
+        except Exception as e:
+            logger.warning(f"Could not load search index {self._index_file}: {e}")
+            self._files, self._postings = {}, {}
+
+    def _save(self) -> None:
+        if not self._index_file:
+            return
+        files = {
+            path: {
+                "mtime": entry.mtime,
+                "size": entry.size,
+                "blob": entry.blob,
+                "trigrams": sorted(entry.trigrams),
+            }
+            for path, entry in self._files.items()
+        }
+        tmp_file = f"{self._index_file}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "files": files}, f)
+            os.replace(tmp_file, self._index_file)
+        except OSError as e:
+            logger.warning(f"Could not save search index {self._index_file}: {e}")
+
+    def _seed_from(self, seed: "CodeSearchIndex") -> None:
+        # Unveränderte Dateien mit derselben Blob-ID haben dieselben Trigramme
+        with seed._lock:
+            seed_files = dict(seed._files)
+        seeded = 0
+        for path, blob in clean_blob_ids(self.workspace).items():
+            entry = seed_files.get(path)
+            if entry is None or entry.blob != blob:
+                continue
+            try:
+                stat = os.stat(os.path.join(self.workspace, path))
+            except OSError:
+                continue
+            self._add_entry(path, _FileEntry(stat.st_mtime, stat.st_size, entry.trigrams, blob))
+            seeded += 1
+        logger.info(f"Seeded search index of {self.workspace} with {seeded} files from {seed.workspace}")
+
+    # --- Maintenance ---
+
+    def _add_entry(self, path: str, entry: _FileEntry) -> None:
+        self._files[path] = entry
+        for trigram in entry.trigrams:
+            self._postings.setdefault(trigram, set()).add(path)
+
+    def _remove_entry(self, path: str) -> None:
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        for trigram in entry.trigrams:
+            paths = self._postings.get(trigram)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self._postings[trigram]
+
+    def _index_file_content(self, path: str, blob: str | None = None) -> None:
+        self._remove_entry(path)
+        full_path = os.path.join(self.workspace, path)
+        try:
+            stat = os.stat(full_path)
+            if stat.st_size > MAX_INDEXED_FILE_BYTES:
+                return
+            with open(full_path, "rb") as f:
+                raw = f.read()
+        except OSError:
+            return
+        if b"\0" in raw[:BINARY_SNIFF_BYTES]:
+            return
+        text = raw.decode("utf-8", errors="replace")
+        self._add_entry(
+            path, _FileEntry(stat.st_mtime, stat.st_size, frozenset(_trigrams(text)), blob)
+        )
+
+    def refresh(self) -> int:
+        """Re-indexes new and changed files, drops deleted ones. Returns the number of changes."""
+        with self._lock:
+            current = set(get_file_index(self.workspace))
+            blobs = None
+            changes = 0
+            for path in list(self._files):
+                if path not in current:
+                    self._remove_entry(path)
+                    changes += 1
+            for path in current:
+                entry = self._files.get(path)
+                try:
+                    stat = os.stat(os.path.join(self.workspace, path))
+                except OSError:
+                    continue
+                if entry and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+                    continue
+                if blobs is None:
+                    blobs = clean_blob_ids(self.workspace)
+                self._index_file_content(path, blobs.get(path))
+                changes += 1
+            if changes:
+                self._save()
+            return changes
+
+    def update_file(self, path: str) -> None:
+        """Re-indexes one file right after it was written."""
+        with self._lock:
+            self._index_file_content(path)
+
+    # --- Query ---
+
+    def candidate_files(self, query: str) -> list[str]:
+        """Files that may contain the (case-insensitive) literal query."""
+        with self._lock:
+            trigrams = _trigrams(query)
+            if not trigrams:
+                return sorted(self._files)
+            posting_lists = sorted(
+                (self._postings.get(t, set()) for t in trigrams), key=len
+            )
+            candidates = set(posting_lists[0])
+            for paths in posting_lists[1:]:
+                candidates &= paths
+                if not candidates:
+                    break
+            return sorted(candidates)
+
+
+_indexes: dict[str, CodeSearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(workspace: str, refresh: bool = True) -> CodeSearchIndex:
+    """
+    Returns the (refreshed) search index of a workspace. A new index of a task
+    worktree is seeded from the index of the base clone.
+    """
+    with _indexes_lock:
+        index = _indexes.get(workspace)
+    if index is None:
+        base_clone = main_worktree(workspace)
+        seed = get_search_index(base_clone, refresh=False) if base_clone else None
+        with _indexes_lock:
+            index = _indexes.get(workspace)
+            if index is None:
+                index = _indexes[workspace] = CodeSearchIndex(workspace, seed)
+    if refresh:
+        index.refresh()
+    return index
+
+
+def update_search_index(workspace: str, path: str) -> None:
+    """Updates a single file, if the workspace already has an index in memory."""
+    index = _indexes.get(workspace)
+    if index is not None:
+        index.update_file(path)
+
+
+def search_workspace(
+    workspace: str,
+    query: str,
+    files: list[str] | None = None,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    context_lines: int = 2,
+    max_results: int = 50,
+) -> str:
+    """
+    Searches the workspace and renders the matches grep-style:
+    'path:line: text' for matches, 'path-line- text' for context lines.
+    """
+    flags = 0 if case_sensitive else re.IGNORECASE
+    matcher = re.compile(query if regex else re.escape(query), flags)
+
+    index = get_search_index(workspace)
+    # Für Regex gibt es keine Trigramme, dann werden alle Dateien durchsucht
+    candidates = index.candidate_files("" if regex else query)
+    if files is not None:
+        allowed = set(files)
+        candidates = [path for path in candidates if path in allowed]
+
+    output: list[str] = []
+    output_chars = 0
+    match_count = 0
+    matched_files = 0
+    truncated = False
+
+    for path in candidates:
+        try:
+            with open(os.path.join(workspace, path), "r", encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            continue
+
+        hits = [no for no, line in enumerate(lines) if matcher.search(line)]
+        if not hits:
+            continue
+        matched_files += 1
+
+        shown: set[int] = set()
+        file_blocks = 0
+        for no in hits:
+            match_count += 1
+            if truncated or match_count > max_results:
+                truncated = True
+                continue
+            block = []
+            for ctx in range(max(0, no - context_lines), min(len(lines), no + context_lines + 1)):
+                if ctx in shown:
+                    continue
+                shown.add(ctx)
+                sep = ":" if ctx == no else "-"
+                block.append(f"{path}{sep}{ctx + 1}{sep} {lines[ctx][:MAX_LINE_CHARS]}")
+            block_text = "\n".join(block)
+            if output_chars + len(block_text) > MAX_SEARCH_OUTPUT_CHARS:
+                truncated = True
+                continue
+            output.append(block_text)
+            output_chars += len(block_text)
+            file_blocks += 1
+        if file_blocks:
+            output.append("--")
+
+    if not match_count:
+        return f"No matches for '{query}'."
+    result = "\n".join(output[:-1] if output and output[-1] == "--" else output)
+    summary = f"[{match_count} matches in {matched_files} files"
+    if truncated:
+        summary += ", output truncated. Narrow the query or use the pattern filter"
+    return f"{result}\n{summary}]"
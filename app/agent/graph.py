@@ -1,12 +1,15 @@
 from langchain.chat_models import BaseChatModel
 from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import ToolNode
 
 # Imports deiner Tools
 from agent.local_tools import (
     create_github_pr,
+    find_symbol,
     finish_task,
+    get_outline,
     git_add,
     git_commit,
     git_create_branch,
@@ -15,7 +18,10 @@ from agent.local_tools import (
     list_files,
     log_thought,
     read_file,
+    read_files,
     run_java_command,
+    run_tests,
+    search_code,
     write_to_file,
 )
 
@@ -30,6 +36,70 @@ from agent.nodes.tester import create_tester_node
 from agent.nodes.trello_fetch_node import create_trello_fetch_node
 from agent.nodes.trello_update_node import create_trello_update_node
 from agent.state import AgentState
+from agent.utils import get_workspace, use_workspace
+
+
+# Tools ohne Seiteneffekte dürfen gleichzeitig laufen (lokale + Git MCP Tools)
+READ_ONLY_TOOLS = {
+    "read_file",
+    "read_files",
+    "list_files",
+    "search_code",
+    "get_outline",
+    "find_symbol",
+    "git_status",
+    "git_diff",
+    "git_diff_staged",
+    "git_diff_unstaged",
+    "git_log",
+    "git_show",
+}
+
+
+def _batch_tool_calls(tool_calls: list[dict]) -> list[list[dict]]:
+    """
+    Groups consecutive read-only tool calls into one batch; every mutating
+    call gets its own batch, so writes and git commands keep their order.
+    """
+    batches: list[list[dict]] = []
+    for tool_call in tool_calls:
+        read_only = tool_call["name"] in READ_ONLY_TOOLS
+        if read_only and batches and batches[-1][0]["name"] in READ_ONLY_TOOLS:
+            batches[-1].append(tool_call)
+        else:
+            batches.append([tool_call])
+    return batches
+
+
+def create_tool_node(tools: list):
+    """
+    ToolNode, der die Tools im Workspace des aktuellen Laufs (state["workspace"])
+    ausführt. So arbeiten parallele Läufe in ihren eigenen Worktrees.
+    Read-only Tool Calls einer Nachricht laufen parallel (ToolNode führt die
+    Calls eines Aufrufs gleichzeitig im Thread Pool aus), alle anderen
+    nacheinander in der Reihenfolge des LLM.
+    """
+    tool_node = ToolNode(tools)
+
+    async def tools_node(state: AgentState, config: RunnableConfig):
+        with use_workspace(state.get("workspace") or get_workspace()):
+            ai_msg = state["messages"][-1]
+            batches = _batch_tool_calls(getattr(ai_msg, "tool_calls", None) or [])
+            if len(batches) <= 1:
+                return await tool_node.ainvoke(state, config)
+
+            tool_messages = []
+            for batch in batches:
+                batch_state = {
+                    **state,
+                    "messages": state["messages"][:-1]
+                    + [ai_msg.model_copy(update={"tool_calls": batch})],
+                }
+                result = await tool_node.ainvoke(batch_state, config)
+                tool_messages.extend(result["messages"])
+            return {"messages": tool_messages}
+
+    return tools_node
 
 
 def router_tester_old(state):
@@ -165,7 +235,7 @@ def create_workflow(
 ) -> StateGraph:
     # --- Tool Sets ---
     base_tools = [log_thought, finish_task]
-    read_tools = [list_files, read_file]
+    read_tools = [list_files, read_file, read_files, search_code, get_outline, find_symbol]
     write_tools = [write_to_file]
 
     # Git Tools lokal definieren
@@ -181,7 +251,7 @@ def create_workflow(
     analyst_tools = read_tools + base_tools
     coder_tools = git_local_tools_coder + read_tools + write_tools + base_tools
     # Tester braucht Java + Git
-    tester_tools = git_local_tools_tester + [run_java_command]
+    tester_tools = git_local_tools_tester + [run_tests, run_java_command]
 
     # --- Graph Nodes ---
     workflow = StateGraph(AgentState)
@@ -204,9 +274,9 @@ def create_workflow(
     )
 
     # Tool Nodes
-    workflow.add_node("tools_coder", ToolNode(coder_tools))
-    workflow.add_node("tools_analyst", ToolNode(analyst_tools))
-    workflow.add_node("tools_tester", ToolNode(tester_tools))
+    workflow.add_node("tools_coder", create_tool_node(coder_tools))
+    workflow.add_node("tools_analyst", create_tool_node(analyst_tools))
+    workflow.add_node("tools_tester", create_tool_node(tester_tools))
 
     workflow.add_node("correction", create_correction_node())
     workflow.add_node("trello_update", create_trello_update_node(sys_config))
@@ -0,0 +1,108 @@
+"""
+On-demand rendering of the workflow graph (Mermaid / PNG).
+
+Rendering is never done in the polling path. The web endpoints in webapp.py
+and the CLI render_graph.py call these helpers explicitly. Results are cached
+on disk by a hash of the graph topology (and the render method for PNGs), so
+an unchanged graph is rendered only once.
+
+The topology does not depend on the LLMs, tools or configuration, so
+build_topology_graph compiles the workflow with a placeholder model and
+needs neither the warm runtime nor a finished agent run.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.runnables.graph import MermaidDrawMethod
+from langgraph.graph.state import CompiledStateGraph
+
+from agent.graph import create_workflow
+
+logger = logging.getLogger(__name__)
+
+# api: mermaid.ink (remote), pyppeteer: local headless browser,
+# graphviz: local pygraphviz
+GRAPH_RENDER_METHODS = ("api", "pyppeteer", "graphviz")
+
+
+def get_default_render_method() -> str:
+    return os.environ.get("GRAPH_RENDER_METHOD", "api").lower()
+
+
+class _TopologyChatModel(GenericFakeChatModel):
+    """Placeholder LLM for build_topology_graph. It is never invoked."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@functools.cache
+def build_topology_graph() -> CompiledStateGraph:
+    """Compiles the workflow without LLMs, MCP tools or checkpointer, only for drawing."""
+    llm = _TopologyChatModel(messages=iter(()))
+    return create_workflow(llm, llm, [], [], "", {}, "backend").compile()
+
+
+def get_graph_topology_hash(graph) -> str:
+    """Stable hash over the nodes and edges of a compiled graph."""
+    drawable = graph.get_graph()
+    topology = {
+        "nodes": sorted(drawable.nodes),
+        "edges": sorted(
+            [edge.source, edge.target, str(edge.data or ""), edge.conditional]
+            for edge in drawable.edges
+        ),
+    }
+    return hashlib.sha256(json.dumps(topology).encode()).hexdigest()[:16]
+
+
+def render_graph_mermaid(graph, cache_dir: str) -> str:
+    """Returns the Mermaid source of the graph, cached by topology hash."""
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = os.path.join(cache_dir, f"{get_graph_topology_hash(graph)}.mmd")
+
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return f.read()
+
+    mermaid_code = graph.get_graph().draw_mermaid()
+    with open(cache_file, "w", encoding="utf-8") as f:
+        f.write(mermaid_code)
+    logger.info(f"Graph rendered as Mermaid: {cache_file}")
+    return mermaid_code
+
+
+def render_graph_png(graph, cache_dir: str, method: str | None = None) -> bytes:
+    """
+    Returns the graph as PNG bytes, cached by topology hash and render method.
+    :raises ValueError: If the render method is unknown.
+    :raises ImportError: If the optional dependency of a local method is missing.
+    """
+    method = (method or get_default_render_method()).lower()
+    if method not in GRAPH_RENDER_METHODS:
+        raise ValueError(f"Unknown graph render method: {method}")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_file = os.path.join(cache_dir, f"{get_graph_topology_hash(graph)}-{method}.png")
+
+    if os.path.exists(cache_file):
+        with open(cache_file, "rb") as f:
+            return f.read()
+
+    drawable = graph.get_graph()
+    if method == "graphviz":
+        png_bytes = drawable.draw_png()
+    elif method == "pyppeteer":
+        png_bytes = drawable.draw_mermaid_png(draw_method=MermaidDrawMethod.PYPPETEER)
+    else:
+        png_bytes = drawable.draw_mermaid_png(draw_method=MermaidDrawMethod.API)
+
+    with open(cache_file, "wb") as f:
+        f.write(png_bytes)
+    logger.info(f"Graph rendered as PNG ({method}): {cache_file}")
+    return png_bytes
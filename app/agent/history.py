@@ -0,0 +1,165 @@
+"""
+Compaction of the conversation history before each LLM call.
+
+The graph state keeps the full history. Only the copy that is sent to the
+LLM is compacted: stale tool outputs (reads of a file that was read or
+written again later, older build logs) are elided, and if the history is
+still above the token budget the oldest tool outputs outside the recent
+window are shortened. Messages are never dropped, so every tool call keeps
+its tool result.
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "24000"))
+# So viele letzte Nachrichten werden nie gekürzt
+HISTORY_KEEP_RECENT_MESSAGES = int(os.environ.get("HISTORY_KEEP_RECENT_MESSAGES", "6"))
+# Über dem Budget wird bis auf diesen Anteil gekürzt. Dadurch ändert sich der
+# Prefix nur in Schüben statt bei jedem Schritt (Prompt-Caching der Provider).
+HISTORY_COMPACTION_TARGET_RATIO = 0.75
+ELIDED_PREVIEW_CHARS = 300
+
+FILE_READ_TOOLS = {"read_file"}
+BATCH_READ_TOOLS = {"read_files"}
+FILE_WRITE_TOOLS = {"write_to_file"}
+BUILD_TOOLS = {"run_java_command", "run_tests"}
+
+
+@dataclass
+class CompactionStats:
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def _elide(message: ToolMessage, reason: str) -> ToolMessage:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if len(content) <= ELIDED_PREVIEW_CHARS:
+        return message
+    preview = content[:ELIDED_PREVIEW_CHARS]
+    return message.model_copy(
+        update={"content": f"[{reason}, {len(content)} chars elided]\n{preview} ..."}
+    )
+
+
+def _tool_calls_by_id(messages: list[BaseMessage]) -> dict[str, dict]:
+    calls = {}
+    for message in messages:
+        if isinstance(message, AIMessage):
+            for tool_call in message.tool_calls or []:
+                calls[tool_call.get("id")] = tool_call
+    return calls
+
+
+def _file_path(tool_call: dict) -> str | None:
+    path = (tool_call.get("args") or {}).get("filepath")
+    return path.lstrip("/") if isinstance(path, str) else None
+
+
+def _file_paths(tool_call: dict) -> set[str]:
+    """Paths of a batch read; empty if it read line ranges (not comparable)."""
+    paths = set()
+    for entry in (tool_call.get("args") or {}).get("files") or []:
+        if not isinstance(entry, dict) or entry.get("start_line") or entry.get("end_line"):
+            return set()
+        if isinstance(entry.get("path"), str):
+            paths.add(entry["path"].lstrip("/"))
+    return paths
+
+
+def _find_stale_outputs(messages: list[BaseMessage]) -> dict[int, str]:
+    """Returns index -> reason for tool outputs that were superseded later on."""
+    calls = _tool_calls_by_id(messages)
+    stale = {}
+    seen_files = set()
+    seen_build = False
+
+    # Rückwärts: die jeweils letzte Version bleibt erhalten
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if isinstance(message, AIMessage):
+            for tool_call in message.tool_calls or []:
+                if tool_call.get("name") in FILE_WRITE_TOOLS:
+                    path = _file_path(tool_call)
+                    if path:
+                        seen_files.add(path)
+            continue
+        if not isinstance(message, ToolMessage):
+            continue
+
+        tool_call = calls.get(message.tool_call_id) or {}
+        name = tool_call.get("name") or message.name
+        if name in FILE_READ_TOOLS:
+            path = _file_path(tool_call)
+            if path in seen_files:
+                stale[index] = f"superseded read of {path}"
+            elif path:
+                seen_files.add(path)
+        elif name in BATCH_READ_TOOLS:
+            paths = _file_paths(tool_call)
+            if paths and paths <= seen_files:
+                stale[index] = f"superseded read of {', '.join(sorted(paths))}"
+            seen_files |= paths
+        elif name in BUILD_TOOLS:
+            if seen_build:
+                stale[index] = "older build output"
+            seen_build = True
+    return stale
+
+
+def compact_history(
+    messages: list[BaseMessage],
+    token_budget: int = HISTORY_TOKEN_BUDGET,
+    keep_recent: int = HISTORY_KEEP_RECENT_MESSAGES,
+) -> tuple[list[BaseMessage], CompactionStats]:
+    """
+    Returns a compacted copy of the history for the next LLM call and the
+    token counts before and after (approximate).
+    """
+    tokens_before = count_tokens_approximately(messages)
+    compacted = list(messages)
+    recent_start = max(0, len(compacted) - keep_recent)
+
+    for index, reason in _find_stale_outputs(compacted).items():
+        if index < recent_start:
+            compacted[index] = _elide(compacted[index], reason)
+
+    tokens_after = count_tokens_approximately(compacted)
+    if tokens_after > token_budget:
+        # Älteste Tool-Ausgaben zuerst kürzen, bis das Ziel unter dem Budget erreicht ist
+        target = int(token_budget * HISTORY_COMPACTION_TARGET_RATIO)
+        for index in range(recent_start):
+            message = compacted[index]
+            if not isinstance(message, ToolMessage) or message is not messages[index]:
+                continue
+            before = count_tokens_approximately([message])
+            compacted[index] = _elide(message, "old tool output")
+            tokens_after -= before - count_tokens_approximately([compacted[index]])
+            if tokens_after <= target:
+                break
+
+    return compacted, CompactionStats(tokens_before, tokens_after)
+
+
+def compact_state_history(state: dict, role: str) -> tuple[list[BaseMessage], int]:
+    """
+    Compacts state["messages"] for a node and logs the savings.
+    Returns the messages for the LLM and the number of tokens saved.
+    """
+    messages, stats = compact_history(state["messages"])
+    if stats.tokens_saved > 0:
+        logger.info(
+            f"History compaction ({role}): {stats.tokens_before} -> "
+            f"{stats.tokens_after} tokens (saved {stats.tokens_saved})"
+        )
+    return messages, stats.tokens_saved
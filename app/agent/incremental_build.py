@@ -0,0 +1,201 @@
+"""
+Incremental verification for the tester (Maven projects).
+
+Instead of 'mvn clean test' in every coder -> tester -> bugfixer loop, the
+tester runs only the test classes affected by the uncommitted changes
+(Surefire -Dtest=...) and keeps target/ between iterations, so Maven only
+recompiles what changed. Affected are the changed test classes themselves
+and the test classes that are named after or reference a changed class.
+Changes to pom.xml or resources run the whole test suite (still without
+clean). The full clean build runs once as the final gate: its result is
+recorded per workspace together with the hash of the working tree, and
+git_push_origin refuses to push a tree that did not pass it.
+"""
+
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from dataclasses import dataclass, field
+
+from agent.code_search import get_search_index
+from agent.repo_index import get_file_index
+
+logger = logging.getLogger(__name__)
+
+MAX_INCREMENTAL_TEST_CLASSES = 40
+TEST_SOURCE_MARKER = "src/test/"
+TEST_CLASS_PATTERN = re.compile(r"^(Test\w*|\w*(Test|Tests|IT|TestCase))$")
+# Änderungen hieran (und an pom.xml) betreffen potentiell alle Tests
+RESOURCE_DIR_MARKERS = ("src/main/resources/", "src/test/resources/")
+FULL_BUILD_COMMAND_PATTERN = re.compile(r"\bclean\b.*\b(test|verify|install|package)\b")
+# Build-Ausgabe gehört nicht zum Stand des Codes
+TREE_HASH_EXCLUDES = (":(exclude,glob)**/target/**", ":(exclude,glob)**/node_modules/**")
+
+_full_builds: dict[str, str] = {}
+_full_builds_lock = threading.Lock()
+
+
+@dataclass
+class TestSelection:
+    changed_files: list[str]
+    test_classes: list[str] = field(default_factory=list)
+    run_all: bool = False
+    reason: str = ""
+
+
+def _git(workspace: str, *args: str, env: dict | None = None) -> str:
+    return subprocess.run(
+        ["git", *args],
+        cwd=workspace,
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+
+
+def get_changed_files(workspace: str) -> list[str]:
+    """Uncommitted changes (staged, unstaged and untracked) relative to HEAD."""
+    try:
+        tracked = _git(workspace, "diff", "--name-only", "HEAD").splitlines()
+    except subprocess.CalledProcessError:
+        # Noch kein Commit vorhanden
+        tracked = _git(workspace, "diff", "--name-only", "--cached").splitlines()
+    untracked = _git(workspace, "ls-files", "--others", "--exclude-standard").splitlines()
+    return sorted({path for path in tracked + untracked if path})
+
+
+def _class_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _is_test_class(path: str) -> bool:
+    return (
+        TEST_SOURCE_MARKER in path
+        and path.endswith(".java")
+        and bool(TEST_CLASS_PATTERN.match(_class_name(path)))
+    )
+
+
+def select_affected_tests(workspace: str, changed_files: list[str]) -> TestSelection:
+    """Maps the changed files to the test classes that have to run."""
+    selection = TestSelection(changed_files=changed_files)
+    test_files = [path for path in get_file_index(workspace) if _is_test_class(path)]
+    affected: set[str] = set()
+    changed_classes: set[str] = set()
+
+    for path in changed_files:
+        if os.path.basename(path) == "pom.xml" or any(
+            marker in path for marker in RESOURCE_DIR_MARKERS
+        ):
+            selection.run_all = True
+            selection.reason = f"{path} changed"
+            return selection
+        if not path.endswith(".java"):
+            continue
+        if _is_test_class(path):
+            if os.path.exists(os.path.join(workspace, path)):
+                affected.add(path)
+            continue
+        changed_classes.add(_class_name(path))
+
+    if changed_classes:
+        # Tests, die nach der Klasse benannt sind oder sie verwenden
+        index = get_search_index(workspace)
+        test_file_set = set(test_files)
+        for class_name in changed_classes:
+            affected.update(p for p in test_files if _class_name(p).startswith(class_name))
+            word = re.compile(rf"\b{re.escape(class_name)}\b")
+            for path in index.candidate_files(class_name):
+                if path not in test_file_set or path in affected:
+                    continue
+                try:
+                    with open(os.path.join(workspace, path), "r", encoding="utf-8", errors="replace") as f:
+                        if word.search(f.read()):
+                            affected.add(path)
+                except OSError:
+                    continue
+
+    selection.test_classes = sorted({_class_name(path) for path in affected})
+    if len(selection.test_classes) > MAX_INCREMENTAL_TEST_CLASSES:
+        selection.run_all = True
+        selection.reason = f"{len(selection.test_classes)} affected test classes"
+    return selection
+
+
+def build_test_command(selection: TestSelection | None) -> str:
+    """Maven command for a selection; None means the full clean build."""
+    if selection is None:
+        return "mvn -B clean test"
+    if selection.run_all:
+        return "mvn -B test"
+    if not selection.test_classes:
+        # Nur kompilieren, es gibt keine betroffenen Tests
+        return "mvn -B test-compile"
+    return (
+        f"mvn -B test -Dtest={','.join(selection.test_classes)} "
+        "-Dsurefire.failIfNoSpecifiedTests=false -DfailIfNoTests=false"
+    )
+
+
+def describe_selection(selection: TestSelection) -> str:
+    changed = len(selection.changed_files)
+    if selection.run_all:
+        return f"Incremental run: all tests ({selection.reason}), {changed} changed files, no clean."
+    if not selection.test_classes:
+        return f"Incremental run: no affected test classes for {changed} changed files, compile only."
+    return (
+        f"Incremental run: {len(selection.test_classes)} affected test classes for "
+        f"{changed} changed files: {', '.join(selection.test_classes)}"
+    )
+
+
+def working_tree_hash(workspace: str) -> str | None:
+    """
+    Git tree hash of the working tree (tracked and untracked, non-ignored
+    files), computed with a temporary index so the real index stays as is.
+    """
+    try:
+        index_file = _git(workspace, "rev-parse", "--git-path", "index").strip()
+        index_file = os.path.join(workspace, index_file)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_index = os.path.join(tmp_dir, "index")
+            if os.path.exists(index_file):
+                # Kopie des Index: git muss nur geänderte Dateien neu hashen
+                shutil.copyfile(index_file, tmp_index)
+            env = {**os.environ, "GIT_INDEX_FILE": tmp_index}
+            _git(workspace, "add", "-A", "--", ".", *TREE_HASH_EXCLUDES, env=env)
+            return _git(workspace, "write-tree", env=env).strip()
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.warning(f"Could not hash working tree of {workspace}: {e}")
+        return None
+
+
+def is_full_build_command(command: str) -> bool:
+    return command.strip().startswith(("mvn", "./mvnw")) and bool(
+        FULL_BUILD_COMMAND_PATTERN.search(command)
+    )
+
+
+def record_full_build(workspace: str, tree_hash: str | None) -> None:
+    """Remembers that the given tree passed the full clean build."""
+    if not tree_hash:
+        return
+    with _full_builds_lock:
+        _full_builds[workspace] = tree_hash
+    logger.info(f"Full build passed for {workspace} at tree {tree_hash[:12]}")
+
+
+def has_passing_full_build(workspace: str) -> bool:
+    """True if the current working tree passed the full clean build."""
+    with _full_builds_lock:
+        passed_hash = _full_builds.get(workspace)
+    return passed_hash is not None and passed_hash == working_tree_hash(workspace)
+
+
+def requires_full_build_gate(workspace: str) -> bool:
+    return os.path.exists(os.path.join(workspace, "pom.xml"))
@@ -54,7 +54,9 @@ def _create_openrouter_llm(model: str, temperature: float) -> BaseChatModel:
         model=model,
         temperature=temperature,
         base_url="https://openrouter.ai/api/v1",
-        api_key=SecretStr(api_key)
+        api_key=SecretStr(api_key),
+        # Die Runs werden gestreamt, ohne das fehlt die Token-Usage für die Metriken
+        stream_usage=True,
     )
 
 def _create_anthropic_llm(model: str, temperature: float) -> BaseChatModel:
@@ -76,6 +78,44 @@ def _create_ollama_llm(model: str, temperature: float) -> BaseChatModel:
         api_key=api_key,
     )
 
+def get_prompt_cache_kwargs(llm: BaseChatModel, cache_key: str) -> dict:
+    """
+    Invoke kwargs that enable provider-side prompt caching of the stable prefix
+    (tools, system prompt, earlier turns). The prefix must stay byte-identical
+    between calls, so callers always send the same system prompt first.
+
+    - Anthropic: automatic cache breakpoint on the last message (cache_control).
+    - OpenAI: caches prefixes automatically; prompt_cache_key routes the calls
+      of one node to the same cache.
+    - Gemini, Mistral, Ollama, OpenRouter: nothing to mark, implicit caching
+      (where offered) only needs the stable prefix.
+    """
+    if isinstance(llm, ChatAnthropic):
+        return {"cache_control": {"type": "ephemeral"}}
+    if isinstance(llm, ChatOpenAI) and not llm.openai_api_base:
+        return {"prompt_cache_key": cache_key}
+    return {}
+
+
+def bind_tools_per_choice(
+    llm: BaseChatModel, tools: list, tool_choices: tuple[str, ...]
+) -> dict:
+    """
+    Binds the tools once per tool_choice variant, so the tool schemas are
+    serialized at graph build time instead of on every LLM call. Variants the
+    provider does not support are left out; callers fall back to the first one.
+    """
+    chains = {}
+    for tool_choice in tool_choices:
+        try:
+            chains[tool_choice] = llm.bind_tools(tools, tool_choice=tool_choice)
+        except Exception as e:
+            logger.warning(f"tool_choice '{tool_choice}' not supported: {e}")
+    if not chains:
+        raise ValueError("LLM does not support tool calling")
+    return chains
+
+
 LLM_PROVIDERS: Dict[str, Callable[[str, float], BaseChatModel]] = {
     "openai": _create_openai_llm,
     "mistral": _create_mistral_llm,
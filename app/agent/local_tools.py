@@ -1,14 +1,48 @@
+import asyncio
+import codecs
 import logging
 import os
 import re
+import shlex
 import subprocess
+import time
+from collections import deque
+from typing import Optional
 
 import docker
 import requests
 from docker.errors import APIError, NotFound
 from langchain_core.tools import tool
-
-from agent.utils import get_workbench, get_workspace
+from pydantic import BaseModel, Field
+
+from agent.build_results import is_noise_line, is_result_line, summarize_build_output
+from agent.code_search import search_workspace, update_search_index
+from agent.incremental_build import (
+    build_test_command,
+    describe_selection,
+    get_changed_files,
+    has_passing_full_build,
+    is_full_build_command,
+    record_full_build,
+    requires_full_build_gate,
+    select_affected_tests,
+    working_tree_hash,
+)
+from agent.repo_index import (
+    filter_files,
+    get_file_index,
+    invalidate_file_index,
+    render_file_tree,
+)
+from agent.symbol_index import (
+    MAX_OUTLINE_CHARS,
+    get_outline_index,
+    render_outline,
+    render_symbols,
+    update_outline_index,
+)
+from agent.test_cache import is_cacheable_command, make_cache_key, test_result_cache
+from agent.utils import TASK_WORKSPACES_DIR, get_workbench, get_workspace
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +68,24 @@ def report_test_result(result: str, summary: str):
 
 MAX_TOOL_OUTPUT_CHARS = 20000
 
+# Wall-clock Limit pro Befehl im Workbench-Container (z.B. mvn clean test)
+JAVA_COMMAND_TIMEOUT_SECONDS = int(os.environ.get("JAVA_COMMAND_TIMEOUT_SECONDS", "900"))
+# Nach SIGTERM bekommt der Prozess so lange Zeit, bevor SIGKILL folgt
+JAVA_COMMAND_KILL_GRACE_SECONDS = 10
+# timeout(1) endet mit 124, bzw. 137 wenn nach der Grace-Zeit SIGKILL nötig war.
+# 137 kann aber auch der OOM-Killer oder ein externes 'docker kill' sein.
+TIMEOUT_EXIT_CODE = 124
+KILLED_EXIT_CODE = 137
+# [ERROR]/BUILD Zeilen, die unabhängig vom Ring Buffer aufbewahrt werden
+MAX_RESULT_LINES = 200
+
+# Opt-in: Maven-Befehle über den residenten Maven Daemon (mvnd) im Workbench ausführen
+WARM_BUILD_MODE = os.environ.get("WARM_BUILD_MODE", "off").strip().lower()
+WARM_BUILD_WARMUP_COMMAND = "mvnd -B -q -DskipTests test-compile"
+MAVEN_COMMAND_PATTERN = re.compile(r"^mvn(?=\s|$)")
+
+TRUNCATION_MARKER = "\n... [output truncated to stay within prompt budget] ...\n"
+
 
 def _truncate_tool_output(output: str, limit: int = MAX_TOOL_OUTPUT_CHARS) -> str:
     if len(output) <= limit:
@@ -41,52 +93,303 @@ def _truncate_tool_output(output: str, limit: int = MAX_TOOL_OUTPUT_CHARS) -> st
     
     # Truncate middle to keep start and end for better context
     half = limit // 2
-    return (
-        output[:half]
-        + "\n... [output truncated to stay within prompt budget] ...\n"
-        + output[-half:]
-    )
+    return output[:half] + TRUNCATION_MARKER + output[-half:]
 
 
-@tool
-def run_java_command(command: str):
+class OutputRingBuffer:
     """
-    Führt einen Shell-Befehl im Java-Container aus.
-    Nutze dies für: 'mvn clean install', 'mvn test', 'java -jar ...'.
-    Gib NUR den Befehl als String an.
+    Bounded buffer for streamed command output. Keeps the first and the last
+    limit/2 characters (like _truncate_tool_output) without ever holding the
+    full output in memory.
+    """
+
+    def __init__(self, limit: int = MAX_TOOL_OUTPUT_CHARS):
+        self._half = limit // 2
+        self._head = ""
+        self._tail: deque[str] = deque()
+        self._tail_len = 0
+        self._truncated = False
+
+    def write(self, text: str) -> None:
+        if len(self._head) < self._half:
+            take = self._half - len(self._head)
+            self._head += text[:take]
+            text = text[take:]
+        if not text:
+            return
+
+        self._tail.append(text)
+        self._tail_len += len(text)
+        while self._tail_len > self._half:
+            overflow = self._tail_len - self._half
+            first = self._tail[0]
+            self._truncated = True
+            if len(first) <= overflow:
+                self._tail.popleft()
+                self._tail_len -= len(first)
+            else:
+                self._tail[0] = first[overflow:]
+                self._tail_len -= overflow
+
+    def getvalue(self) -> str:
+        tail = "".join(self._tail)
+        if self._truncated:
+            return self._head + TRUNCATION_MARKER + tail
+        return self._head + tail
+
+
+def _stream_exec(exec_id: str, buffer: OutputRingBuffer, result_lines: list[str]) -> None:
+    # Blockiert, deshalb in einem Thread ausführen
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+
+    def _write_lines(text: str, final: bool = False) -> str:
+        lines = text.split("\n")
+        rest = lines.pop()
+        if final and rest:
+            lines.append(rest)
+            rest = ""
+        for line in lines:
+            if is_noise_line(line):
+                continue
+            buffer.write(line + "\n")
+            if is_result_line(line) and len(result_lines) < MAX_RESULT_LINES:
+                result_lines.append(line)
+        return rest
+
+    for chunk in client.api.exec_start(exec_id, stream=True):
+        pending = _write_lines(pending + decoder.decode(chunk))
+    _write_lines(pending + decoder.decode(b"", final=True), final=True)
+
+
+async def _run_workbench_command(command: str) -> tuple[int | None, str]:
+    """
+    Runs a command in the workbench container of the current workspace.
+    Returns the exit code (None if it did not run) and the tool output.
     """
     WORKSPACE = get_workspace()
     WORKBENCH = get_workbench()
     if not client:
-        return "Error: Docker client not initialized. Is the socket mounted?"
+        return None, "Error: Docker client not initialized. Is the socket mounted?"
+
+    timeout_seconds = JAVA_COMMAND_TIMEOUT_SECONDS
+    buffer = OutputRingBuffer()
+    result_lines: list[str] = []
 
     try:
-        container = client.containers.get(WORKBENCH)
+        container = await asyncio.to_thread(client.containers.get, WORKBENCH)
 
         if container.status != "running":
-            return f"Error: Container {WORKBENCH} is not running (Status: {container.status})."
+            return None, f"Error: Container {WORKBENCH} is not running (Status: {container.status})."
 
         logger.info(f"Executing in Java-Box: {command}")
 
-        exec_result = container.exec_run(command, workdir=WORKSPACE)
+        # 'timeout' im Container beendet hängende Builds, auch wenn die
+        # Verbindung zum Agenten abreißt
+        exec_cmd = [
+            "timeout",
+            f"--kill-after={JAVA_COMMAND_KILL_GRACE_SECONDS}",
+            str(timeout_seconds),
+            *shlex.split(command),
+        ]
+        started_at = time.time()
+        exec_id = (
+            await asyncio.to_thread(
+                client.api.exec_create, container.id, exec_cmd, workdir=WORKSPACE
+            )
+        )["Id"]
 
-        output = exec_result.output.decode("utf-8")
-        exit_code = exec_result.exit_code
+        try:
+            await asyncio.wait_for(
+                asyncio.to_thread(_stream_exec, exec_id, buffer, result_lines),
+                timeout_seconds + 2 * JAVA_COMMAND_KILL_GRACE_SECONDS,
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Command did not finish in time, giving up: {command}")
+            return None, (
+                f"❌ TIMEOUT after {timeout_seconds}s (no response from container):\n"
+                f"{buffer.getvalue()}"
+            )
 
+        exit_code = (await asyncio.to_thread(client.api.exec_inspect, exec_id))[
+            "ExitCode"
+        ]
+        elapsed_seconds = time.time() - started_at
+        output = buffer.getvalue()
         logger.debug(f"--- COMMAND OUTPUT ({command}) ---\n{output}\n---")
-        output = _truncate_tool_output(output)
+
+        # Kompakte Zusammenfassung statt Maven-Log, falls Reports/Fehler gefunden
+        summary = await asyncio.to_thread(
+            summarize_build_output,
+            WORKSPACE,
+            "\n".join(result_lines) + "\n" + output,
+            started_at,
+        )
+        if summary:
+            output = summary
 
         if exit_code == 0:
-            return f"✅ SUCCESS:\n{output}"
+            return exit_code, f"✅ SUCCESS:\n{output}"
+        elif exit_code == TIMEOUT_EXIT_CODE or (
+            exit_code == KILLED_EXIT_CODE and elapsed_seconds >= timeout_seconds
+        ):
+            return exit_code, f"❌ TIMEOUT after {timeout_seconds}s (Exit Code {exit_code}):\n{output}"
+        elif exit_code == KILLED_EXIT_CODE:
+            return exit_code, (
+                f"❌ KILLED after {elapsed_seconds:.0f}s (Exit Code {exit_code}, "
+                f"SIGKILL, e.g. out of memory):\n{output}"
+            )
         else:
-            return f"❌ FAILED (Exit Code {exit_code}):\n{output}"
+            return exit_code, f"❌ FAILED (Exit Code {exit_code}):\n{output}"
 
     except NotFound:
-        return f"Error: Container '{WORKBENCH}' not found. Please start the docker-compose setup."
+        return None, f"Error: Container '{WORKBENCH}' not found. Please start the docker-compose setup."
     except APIError as e:
-        return f"Docker API Error: {str(e)}"
+        return None, f"Docker API Error: {str(e)}"
     except Exception as e:
-        return f"System Error: {str(e)}"
+        return None, f"System Error: {str(e)}"
+
+
+# --- BUILD TOOLS ---
+_mvnd_available: dict[str, bool] = {}
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def _is_mvnd_available() -> bool:
+    WORKBENCH = get_workbench()
+    if WORKBENCH not in _mvnd_available:
+        try:
+            container = await asyncio.to_thread(client.containers.get, WORKBENCH)
+            result = await asyncio.to_thread(
+                container.exec_run, ["sh", "-c", "command -v mvnd"]
+            )
+            _mvnd_available[WORKBENCH] = result.exit_code == 0
+        except Exception as e:
+            logger.warning(f"Could not check for mvnd in {WORKBENCH}: {e}")
+            return False
+        if not _mvnd_available[WORKBENCH]:
+            logger.warning(
+                f"WARM_BUILD_MODE=mvnd, but mvnd is not installed in {WORKBENCH}. "
+                f"Falling back to mvn (build the workbench from workbench/backend/Dockerfile)."
+            )
+    return _mvnd_available[WORKBENCH]
+
+
+async def _resolve_build_command(command: str) -> str:
+    """In warm build mode 'mvn ...' is sent to the resident Maven daemon."""
+    if WARM_BUILD_MODE != "mvnd" or not client:
+        return command
+    if not MAVEN_COMMAND_PATTERN.match(command.strip()):
+        return command
+    if not await _is_mvnd_available():
+        return command
+    return MAVEN_COMMAND_PATTERN.sub("mvnd", command.strip(), count=1)
+
+
+async def _warm_up_build_daemon() -> None:
+    started = time.monotonic()
+    exit_code, output = await _run_workbench_command(WARM_BUILD_WARMUP_COMMAND)
+    if exit_code == 0:
+        logger.info(f"Build daemon warmed up in {time.monotonic() - started:.1f}s")
+    else:
+        logger.warning(f"Build daemon warm-up failed (Exit Code {exit_code}):\n{output[-2000:]}")
+
+
+def start_build_daemon_warmup() -> None:
+    """
+    Starts the daemon (and loads the project's plugins) in the background
+    while the coder works, so the first test run of the tester is already warm.
+    Call from the event loop; uses the workspace of the current context.
+    """
+    if WARM_BUILD_MODE != "mvnd" or not client:
+        return
+
+    async def _warm_up() -> None:
+        if await _is_mvnd_available():
+            await _warm_up_build_daemon()
+
+    task = asyncio.create_task(_warm_up())
+    # Referenz halten, sonst kann der Task vom GC eingesammelt werden
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _run_build(command: str, bypass_cache: bool = False) -> tuple[int | None, str, str | None]:
+    """
+    Runs a build/test command with the test result cache: on an identical
+    tree the stored result of the same command is returned without building.
+    Returns exit code, output and the tree hash (None if not computed).
+    """
+    WORKSPACE = get_workspace()
+    cacheable = is_cacheable_command(command)
+    tree_hash = None
+    if cacheable or is_full_build_command(command):
+        tree_hash = await asyncio.to_thread(working_tree_hash, WORKSPACE)
+
+    cache_key = make_cache_key(tree_hash, get_workbench(), command) if tree_hash else None
+    if cacheable and cache_key and not bypass_cache:
+        cached = test_result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Test result cache hit for '{command}' at tree {tree_hash[:12]}")
+            return cached.exit_code, (
+                f"(Cached result: this command already ran on identical code, tree "
+                f"{tree_hash[:12]}. Use bypass_cache=true to run it again.)\n{cached.output}"
+            ), tree_hash
+
+    exit_code, output = await _run_workbench_command(await _resolve_build_command(command))
+    # Timeouts, Kills und Docker-Fehler sagen nichts über den Code aus
+    if (
+        cacheable
+        and cache_key
+        and exit_code is not None
+        and exit_code not in (TIMEOUT_EXIT_CODE, KILLED_EXIT_CODE)
+    ):
+        test_result_cache.put(cache_key, exit_code, output)
+    return exit_code, output, tree_hash
+
+
+@tool
+async def run_java_command(command: str, bypass_cache: bool = False):
+    """
+    Führt einen Shell-Befehl im Java-Container aus.
+    Nutze dies für: 'mvn clean install', 'mvn test', 'java -jar ...'.
+    Gib NUR den Befehl als String an.
+    Build-/Testergebnisse werden pro Code-Stand gecacht; bypass_cache=true erzwingt einen neuen Lauf.
+    """
+    WORKSPACE = get_workspace()
+    exit_code, output, tree_hash = await _run_build(command, bypass_cache)
+    if exit_code == 0 and tree_hash and is_full_build_command(command):
+        record_full_build(WORKSPACE, tree_hash)
+    return output
+
+
+@tool
+async def run_tests(full: bool = False, bypass_cache: bool = False):
+    """
+    Verifies the changes with Maven.
+    full=False (default): incremental run, compiles only what changed and runs
+    only the test classes affected by the uncommitted changes. Use it in every
+    test iteration.
+    full=True: 'mvn clean test' with all tests. Run it ONCE as the final gate
+    after the incremental run passed; pushing requires it.
+    Results are cached per code state; bypass_cache=True forces a new run
+    (e.g. for a suspected flaky test).
+    """
+    WORKSPACE = get_workspace()
+    try:
+        if full:
+            exit_code, output, tree_hash = await _run_build(build_test_command(None), bypass_cache)
+            if exit_code == 0:
+                record_full_build(WORKSPACE, tree_hash)
+            return f"Full clean build (final gate).\n{output}"
+
+        changed_files = await asyncio.to_thread(get_changed_files, WORKSPACE)
+        selection = await asyncio.to_thread(select_affected_tests, WORKSPACE, changed_files)
+        logger.info(describe_selection(selection))
+        _, output, _ = await _run_build(build_test_command(selection), bypass_cache)
+        return f"{describe_selection(selection)}\n{output}"
+    except subprocess.CalledProcessError as e:
+        return f"ERROR determining the changed files: {e.stderr or e}"
 
 
 # --- GIT & FILE TOOLS ---
@@ -110,6 +413,22 @@ def finish_task(summary: str):
     return "Task marked as finished."
 
 
+def _resolve_workspace_path(workspace: str, path: str) -> str | None:
+    """
+    Resolves a path relative to the workspace, or None if it leaves the
+    workspace (.., symlinks) or points into the worktrees of other tasks.
+    """
+    root = os.path.realpath(workspace)
+    full_path = os.path.realpath(os.path.join(root, path.lstrip("/")))
+    if os.path.commonpath([root, full_path]) != root:
+        return None
+    # Im Basis-Clone liegen die Worktrees der anderen Tasks
+    tasks_root = os.path.join(root, TASK_WORKSPACES_DIR)
+    if os.path.commonpath([tasks_root, full_path]) == tasks_root:
+        return None
+    return full_path
+
+
 @tool
 def read_file(filepath: str):
     """
@@ -119,10 +438,10 @@ def read_file(filepath: str):
     try:
         # FIX: Führende Slashes entfernen, um absolute Pfade zu verhindern
         clean_path = filepath.lstrip("/")
-        full_path = os.path.join(WORKSPACE, clean_path)
+        full_path = _resolve_workspace_path(WORKSPACE, clean_path)
 
         # Security
-        if not os.path.abspath(full_path).startswith(WORKSPACE):
+        if full_path is None:
             return "ERROR: Access denied."
 
         if not os.path.exists(full_path):
@@ -137,30 +456,240 @@ def read_file(filepath: str):
         return f"ERROR reading file: {str(e)}"
 
 
+READ_FILES_MAX_CHARS_PER_FILE = 20000
+READ_FILES_MAX_CHARS_TOTAL = 60000
+BINARY_SNIFF_BYTES = 8192
+
+
+class FileRange(BaseModel):
+    path: str = Field(..., description="File path relative to the repository root.")
+    start_line: Optional[int] = Field(
+        None, description="First line to read (1-based, inclusive). Default: 1."
+    )
+    end_line: Optional[int] = Field(
+        None, description="Last line to read (inclusive). Default: end of file."
+    )
+
+
+def _read_file_range(full_path: str, start_line: int | None, end_line: int | None, budget: int):
+    """
+    Returns (text, first line, last line, total line count, truncated) for the
+    requested line range, cut off at a line boundary within the budget.
+    """
+    with open(full_path, "r", encoding="utf-8", errors="replace") as f:
+        lines = f.readlines()
+
+    start = max(1, start_line or 1)
+    end = min(len(lines), end_line or len(lines))
+    text = ""
+    truncated = False
+    for line_no in range(start, end + 1):
+        line = lines[line_no - 1]
+        if len(text) + len(line) > budget:
+            truncated = True
+            end = line_no - 1
+            break
+        text += line
+    return text, start, end, len(lines), truncated
+
+
 @tool
-def list_files(directory: str = "."):
+def read_files(files: list[FileRange]):
     """
-    Lists files in a directory (recursive).
+    Reads several files (or line ranges of files) in one call.
+    Prefer this over multiple read_file calls. Large files are cut off;
+    request a line range (start_line/end_line) to read further.
+    """
+    WORKSPACE = get_workspace()
+    remaining = READ_FILES_MAX_CHARS_TOTAL
+    sections = []
+
+    for entry in files:
+        if isinstance(entry, dict):
+            entry = FileRange(**entry)
+        clean_path = entry.path.lstrip("/")
+        full_path = _resolve_workspace_path(WORKSPACE, clean_path)
+
+        if full_path is None:
+            sections.append(f"=== {clean_path} ===\nERROR: Access denied.")
+            continue
+        if not os.path.isfile(full_path):
+            sections.append(f"=== {clean_path} ===\nERROR: File does not exist.")
+            continue
+        if remaining <= 0:
+            sections.append(f"=== {clean_path} ===\n[skipped: total read budget exhausted]")
+            continue
+
+        try:
+            with open(full_path, "rb") as f:
+                if b"\0" in f.read(BINARY_SNIFF_BYTES):
+                    size = os.path.getsize(full_path)
+                    sections.append(f"=== {clean_path} ===\n[binary file, {size} bytes]")
+                    continue
+
+            text, start, end, total, truncated = _read_file_range(
+                full_path,
+                entry.start_line,
+                entry.end_line,
+                min(READ_FILES_MAX_CHARS_PER_FILE, remaining),
+            )
+        except Exception as e:
+            sections.append(f"=== {clean_path} ===\nERROR reading file: {str(e)}")
+            continue
+
+        remaining -= len(text)
+        header = f"=== {clean_path} (lines {start}-{end} of {total}) ==="
+        if total == 0:
+            header = f"=== {clean_path} (empty file) ==="
+        if truncated:
+            text += f"[truncated after line {end}, request start_line={end + 1} to continue]\n"
+        sections.append(f"{header}\n{text.rstrip()}")
+
+    return "\n\n".join(sections) if sections else "No files requested."
+
+
+LIST_FILES_PAGE_SIZE = 200
+
+
+@tool
+def list_files(
+    directory: str = ".",
+    pattern: Optional[str] = None,
+    max_depth: Optional[int] = None,
+    offset: int = 0,
+    limit: int = LIST_FILES_PAGE_SIZE,
+    tree: bool = False,
+):
+    """
+    Lists the files of the repository below a directory (recursive, without
+    git-ignored files such as build output).
+    pattern: optional glob, e.g. '*.java' or 'src/main/**/*Service.java'.
+    max_depth: optional, 1 = only files directly in the directory.
+    offset/limit: pagination for large repositories.
+    tree: True renders a compact directory tree instead of a flat list.
     """
     WORKSPACE = get_workspace()
     try:
         clean_dir = directory.lstrip("/")
-        target_dir = os.path.join(WORKSPACE, clean_dir)
-        if not os.path.abspath(target_dir).startswith(WORKSPACE):
+        if _resolve_workspace_path(WORKSPACE, clean_dir) is None:
             return "Access denied"
 
-        file_list = []
-        for root, dirs, files in os.walk(target_dir):
-            if ".git" in root:
-                continue
-            for file in files:
-                rel_path = os.path.relpath(os.path.join(root, file), WORKSPACE)
-                file_list.append(rel_path)
-        return "\n".join(file_list) if file_list else "No files found."
+        files = filter_files(get_file_index(WORKSPACE), clean_dir, pattern, max_depth)
+        if not files:
+            return "No files found."
+
+        offset = max(0, offset)
+        limit = max(1, min(limit, 1000))
+        page = files[offset : offset + limit]
+        listing = render_file_tree(page) if tree else "\n".join(page)
+        if offset == 0 and len(page) == len(files):
+            return listing
+
+        footer = f"[Showing {offset + 1}-{offset + len(page)} of {len(files)} files."
+        if offset + len(page) < len(files):
+            footer += f" Use offset={offset + len(page)} for more, or narrow with pattern/max_depth."
+        return f"{listing}\n{footer}]"
     except Exception as e:
         return str(e)
 
 
+@tool
+def search_code(
+    query: str,
+    pattern: Optional[str] = None,
+    regex: bool = False,
+    case_sensitive: bool = False,
+    context_lines: int = 2,
+    max_results: int = 50,
+):
+    """
+    Searches the code of the repository (like grep) and returns the matching
+    lines with line numbers and context. Use it to find classes, methods,
+    usages or error messages instead of reading files one by one.
+    query: text to search for (a regular expression if regex=True).
+    pattern: optional glob to restrict the files, e.g. '*.java' or 'src/test/**'.
+    """
+    WORKSPACE = get_workspace()
+    try:
+        files = None
+        if pattern:
+            files = filter_files(get_file_index(WORKSPACE), "", pattern)
+        return search_workspace(
+            WORKSPACE,
+            query,
+            files=files,
+            regex=regex,
+            case_sensitive=case_sensitive,
+            context_lines=max(0, min(context_lines, 10)),
+            max_results=max(1, min(max_results, 200)),
+        )
+    except re.error as e:
+        return f"ERROR: Invalid regular expression: {e}"
+    except Exception as e:
+        return f"ERROR searching code: {str(e)}"
+
+
+@tool
+def get_outline(path: str):
+    """
+    Shows the outline of a Java or TypeScript file: package, imports and the
+    classes, methods, constructors and fields with line numbers and
+    signatures, without the method bodies. For a directory it shows the
+    outlines of all source files below it. Use it to find the lines you need,
+    then read only those with read_files (start_line/end_line).
+    """
+    WORKSPACE = get_workspace()
+    try:
+        clean_path = path.strip("/")
+        clean_path = "" if clean_path == "." else clean_path
+        if _resolve_workspace_path(WORKSPACE, clean_path) is None:
+            return "ERROR: Access denied."
+
+        index = get_outline_index(WORKSPACE)
+        outline = index.get(clean_path)
+        if outline is not None:
+            return render_outline(outline)
+        if os.path.isfile(os.path.join(WORKSPACE, clean_path)):
+            return f"ERROR: No outline for {clean_path} (only Java and TypeScript/JavaScript files)."
+
+        outlines = index.outlines(f"{clean_path}/" if clean_path else "")
+        if not outlines:
+            return f"ERROR: No Java or TypeScript files found in '{path}'."
+        sections = []
+        total = 0
+        for outline in outlines:
+            section = render_outline(outline, with_imports=False)
+            if total + len(section) > MAX_OUTLINE_CHARS:
+                sections.append(
+                    f"[{len(outlines) - len(sections)} more files not shown, "
+                    f"ask for a subdirectory or a single file]"
+                )
+                break
+            sections.append(section)
+            total += len(section)
+        return "\n\n".join(sections)
+    except Exception as e:
+        return f"ERROR reading outline: {str(e)}"
+
+
+@tool
+def find_symbol(name: str, kind: Optional[str] = None):
+    """
+    Finds the declaration of a class, interface, enum, method, constructor,
+    field or function and returns file, line and signature.
+    name: symbol name, optionally qualified like 'UserService.findById'.
+    kind: optional filter, e.g. 'class', 'interface', 'method', 'field', 'function'.
+    """
+    WORKSPACE = get_workspace()
+    try:
+        matches = get_outline_index(WORKSPACE).find(name.strip(), kind)
+        if not matches:
+            return f"No symbol named '{name}' found. Try search_code for a text search."
+        return render_symbols(matches)
+    except Exception as e:
+        return f"ERROR finding symbol: {str(e)}"
+
+
 @tool
 def write_to_file(filepath: str, content: str):
     """
@@ -170,14 +699,18 @@ def write_to_file(filepath: str, content: str):
     try:
         # FIX: Führende Slashes entfernen
         clean_path = filepath.lstrip("/")
-        full_path = os.path.join(WORKSPACE, clean_path)
+        full_path = _resolve_workspace_path(WORKSPACE, clean_path)
 
-        if not os.path.abspath(full_path).startswith(WORKSPACE):
+        if full_path is None:
             return "ERROR: Access denied."
+        clean_path = os.path.relpath(full_path, os.path.realpath(WORKSPACE))
 
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
         with open(full_path, "w", encoding="utf-8") as f:
             f.write(content)
+        invalidate_file_index(WORKSPACE)
+        update_search_index(WORKSPACE, clean_path)
+        update_outline_index(WORKSPACE, clean_path)
         return f"Successfully wrote to {clean_path}"
     except Exception as e:
         return f"ERROR writing file: {str(e)}"
@@ -199,6 +732,7 @@ def git_create_branch(branch_name: str):
             capture_output=True,
             text=True,
         )
+        invalidate_file_index(WORKSPACE)
         return f"Successfully created and switched to branch '{branch_name}'."
     except subprocess.CalledProcessError as e:
         return f"ERROR creating branch: {e.stderr}"
@@ -215,6 +749,13 @@ def git_push_origin():
     if not token:
         return "ERROR: GITHUB_TOKEN missing."
 
+    # Finales Gate: nur ein Stand, der den vollen Clean-Build bestanden hat
+    if requires_full_build_gate(WORKSPACE) and not has_passing_full_build(WORKSPACE):
+        return (
+            "ERROR: The current code has not passed the full clean build. "
+            "Run run_tests with full=true and push only if it succeeds."
+        )
+
     try:
         # URL Auth Logic (wie vorher)
         current_url = subprocess.check_output(
@@ -255,6 +796,13 @@ def create_github_pr(title: str, body: str):
     if not token:
         return "ERROR: GITHUB_TOKEN missing."
 
+    # Finales Gate: nur ein Stand, der den vollen Clean-Build bestanden hat
+    if requires_full_build_gate(WORKSPACE) and not has_passing_full_build(WORKSPACE):
+        return (
+            "ERROR: The current code has not passed the full clean build. "
+            "Run run_tests with full=true and push only if it succeeds."
+        )
+
     try:
         # 1. Repo-Infos aus der Remote-URL parsen
         # URL Formate: https://github.com/OWNER/REPO.git oder mit Token
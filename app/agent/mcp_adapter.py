@@ -10,6 +10,9 @@ from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from pydantic import Field, create_model
 
+from agent.repo_index import invalidate_file_index
+from agent.utils import get_workspace
+
 
 # --- GENERISCHE KLASSE ---
 class McpServerClient:
@@ -52,6 +55,12 @@ class McpServerClient:
         """Räumt auf und stoppt den Server."""
         await self.exit_stack.aclose()
 
+    async def ping(self) -> None:
+        """Health-Check: wirft eine Exception, wenn der Server nicht mehr antwortet."""
+        if not self.session:
+            raise RuntimeError("MCP Session not started.")
+        await self.session.send_ping()
+
     async def get_langchain_tools(self):
         """Holt Tools vom Server und konvertiert sie."""
         if not self.session:
@@ -148,11 +157,14 @@ class McpServerClient:
                         "MCP Session not connected. Ensure the client is used within an 'async with' block."
                     )
 
-                # Pfad-Injection für Git Server (Spezialfall, könnte man auch auslagern)
+                # Pfad-Injection für Git Server: Workspace des aktuellen Laufs
                 if "repo_path" in kwargs:
-                    kwargs["repo_path"] = "/app/work_dir"
+                    kwargs["repo_path"] = get_workspace()
 
                 result = await self.session.call_tool(tool_name, arguments=kwargs)
+                if "repo_path" in kwargs:
+                    # Git Tools können den Dateibaum ändern (checkout, reset, ...)
+                    invalidate_file_index(kwargs["repo_path"])
 
                 output_text = []
                 if hasattr(result, "content") and result.content:
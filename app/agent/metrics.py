@@ -0,0 +1,318 @@
+"""
+Token and latency accounting per graph run.
+
+A RunMetricsCollector is passed as LangChain callback to the graph run. It
+sees every LLM call of the nodes and every tool execution of the ToolNodes
+and aggregates calls, tokens, wall time, retries and errors per node and per
+tool. After the run the aggregates are stored as RunMetric rows, which feed
+the dashboard summary and the Prometheus endpoint /metrics.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any
+from uuid import UUID
+
+from flask import Flask
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from sqlalchemy import func
+
+from extensions import db
+from models import RunMetric
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MetricTotals:
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    cached_prompt_tokens: int = 0
+    completion_tokens: int = 0
+    seconds: float = 0.0
+
+
+def _usage_from_result(response: LLMResult) -> tuple[int, int, int]:
+    """Returns prompt, cached prompt and completion tokens of an LLM call."""
+    prompt_tokens = cached_prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+                details = usage.get("input_token_details") or {}
+                cached_prompt_tokens += details.get("cache_read", 0) or 0
+    if not (prompt_tokens or completion_tokens):
+        # Ältere Provider liefern die Werte nur in llm_output
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = token_usage.get("prompt_tokens", 0)
+        completion_tokens = token_usage.get("completion_tokens", 0)
+    return prompt_tokens, cached_prompt_tokens, completion_tokens
+
+
+class RunMetricsCollector(BaseCallbackHandler):
+    """
+    Callback handler that aggregates LLM and tool metrics of one graph run.
+    A second LLM call of the same node in the same graph step counts as retry.
+    """
+
+    run_inline = True
+
+    def __init__(self, card_id: str | None = None, card_name: str | None = None):
+        self.run_id = str(uuid.uuid4())
+        self.card_id = card_id
+        self.card_name = card_name
+        self.started_at = datetime.now(timezone.utc)
+        self.nodes: dict[str, MetricTotals] = {}
+        self.tools: dict[str, MetricTotals] = {}
+        self.run_seconds = 0.0
+        self.run_failed = False
+        self._start = time.monotonic()
+        self._pending: dict[UUID, tuple[str, str, float]] = {}
+        self._node_steps: set[tuple[str, Any]] = set()
+        self._lock = threading.Lock()
+
+    # --- LLM ---
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs
+    ) -> None:
+        self._start_llm(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        self._start_llm(run_id, metadata)
+
+    def _start_llm(self, run_id: UUID, metadata: dict | None) -> None:
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node", "unknown")
+        with self._lock:
+            totals = self.nodes.setdefault(node, MetricTotals())
+            step_key = (node, metadata.get("langgraph_step"))
+            if step_key in self._node_steps:
+                totals.retries += 1
+            self._node_steps.add(step_key)
+            self._pending[run_id] = ("node", node, time.monotonic())
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs) -> None:
+        prompt_tokens, cached_prompt_tokens, completion_tokens = _usage_from_result(
+            response
+        )
+        totals = self._finish(run_id)
+        if totals is not None:
+            with self._lock:
+                totals.prompt_tokens += prompt_tokens
+                totals.cached_prompt_tokens += cached_prompt_tokens
+                totals.completion_tokens += completion_tokens
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._finish(run_id, failed=True)
+
+    # --- Tools ---
+
+    def on_tool_start(
+        self, serialized, input_str, *, run_id: UUID, metadata=None, **kwargs
+    ) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        with self._lock:
+            self.tools.setdefault(name, MetricTotals())
+            self._pending[run_id] = ("tool", name, time.monotonic())
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs) -> None:
+        self._finish(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._finish(run_id, failed=True)
+
+    def _finish(self, run_id: UUID, failed: bool = False) -> MetricTotals | None:
+        with self._lock:
+            pending = self._pending.pop(run_id, None)
+            if pending is None:
+                return None
+            kind, name, start = pending
+            totals = (self.nodes if kind == "node" else self.tools)[name]
+            totals.calls += 1
+            totals.seconds += time.monotonic() - start
+            if failed:
+                totals.errors += 1
+            return totals
+
+    # --- Run ---
+
+    def finish_run(self, failed: bool = False) -> None:
+        self.run_seconds = time.monotonic() - self._start
+        self.run_failed = failed
+
+    def log_summary(self) -> None:
+        prompt_tokens = sum(t.prompt_tokens for t in self.nodes.values())
+        cached_prompt_tokens = sum(t.cached_prompt_tokens for t in self.nodes.values())
+        completion_tokens = sum(t.completion_tokens for t in self.nodes.values())
+        slowest = sorted(
+            list(self.nodes.items()) + list(self.tools.items()),
+            key=lambda item: item[1].seconds,
+            reverse=True,
+        )[:3]
+        logger.info(
+            f"Run metrics for {self.card_id or 'task'}: {self.run_seconds:.1f}s, "
+            f"{prompt_tokens} prompt ({cached_prompt_tokens} cached) / "
+            f"{completion_tokens} completion tokens, "
+            f"slowest: {', '.join(f'{name} {t.seconds:.1f}s' for name, t in slowest)}"
+        )
+
+    def to_rows(self) -> list[RunMetric]:
+        def _row(kind: str, name: str, totals: MetricTotals) -> RunMetric:
+            return RunMetric(
+                run_id=self.run_id,
+                card_id=self.card_id,
+                card_name=(self.card_name or "")[:200] or None,
+                started_at=self.started_at,
+                kind=kind,
+                name=name[:100],
+                calls=totals.calls,
+                errors=totals.errors,
+                retries=totals.retries,
+                prompt_tokens=totals.prompt_tokens,
+                cached_prompt_tokens=totals.cached_prompt_tokens,
+                completion_tokens=totals.completion_tokens,
+                seconds=totals.seconds,
+            )
+
+        run_totals = MetricTotals(
+            calls=1,
+            errors=int(self.run_failed),
+            retries=sum(t.retries for t in self.nodes.values()),
+            prompt_tokens=sum(t.prompt_tokens for t in self.nodes.values()),
+            cached_prompt_tokens=sum(t.cached_prompt_tokens for t in self.nodes.values()),
+            completion_tokens=sum(t.completion_tokens for t in self.nodes.values()),
+            seconds=self.run_seconds,
+        )
+        rows = [_row("run", "graph", run_totals)]
+        rows += [_row("node", name, totals) for name, totals in self.nodes.items()]
+        rows += [_row("tool", name, totals) for name, totals in self.tools.items()]
+        return rows
+
+
+def save_run_metrics(app: Flask, collector: RunMetricsCollector) -> None:
+    """Stores the metrics of a finished run (call via asyncio.to_thread)."""
+    # Eigener App-Context: eigene DB-Session, unabhängig von parallelen Läufen
+    with app.app_context():
+        try:
+            db.session.add_all(collector.to_rows())
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not store run metrics: {e}")
+
+
+def _aggregate(kind: str, run_ids=None):
+    query = db.session.query(
+        RunMetric.name,
+        func.sum(RunMetric.calls),
+        func.sum(RunMetric.errors),
+        func.sum(RunMetric.retries),
+        func.sum(RunMetric.prompt_tokens),
+        func.sum(RunMetric.cached_prompt_tokens),
+        func.sum(RunMetric.completion_tokens),
+        func.sum(RunMetric.seconds),
+    ).filter(RunMetric.kind == kind)
+    if run_ids is not None:
+        query = query.filter(RunMetric.run_id.in_(run_ids))
+    rows = query.group_by(RunMetric.name).all()
+    return [
+        {
+            "name": name,
+            "calls": calls or 0,
+            "errors": errors or 0,
+            "retries": retries or 0,
+            "prompt_tokens": prompt_tokens or 0,
+            "cached_prompt_tokens": cached_prompt_tokens or 0,
+            "completion_tokens": completion_tokens or 0,
+            "seconds": seconds or 0.0,
+        }
+        for (
+            name,
+            calls,
+            errors,
+            retries,
+            prompt_tokens,
+            cached_prompt_tokens,
+            completion_tokens,
+            seconds,
+        ) in rows
+    ]
+
+
+def get_metrics_summary(run_limit: int = 20) -> dict:
+    """Summary of the last runs for the dashboard (needs an app context)."""
+    recent_runs = (
+        RunMetric.query.filter_by(kind="run")
+        .order_by(RunMetric.started_at.desc())
+        .limit(run_limit)
+        .all()
+    )
+    run_ids = [run.run_id for run in recent_runs]
+    by_seconds = lambda row: row["seconds"]  # noqa: E731
+    return {
+        "runs": recent_runs,
+        "nodes": sorted(_aggregate("node", run_ids), key=by_seconds, reverse=True),
+        "tools": sorted(_aggregate("tool", run_ids), key=by_seconds, reverse=True),
+    }
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus_metrics() -> str:
+    """All-time totals in the Prometheus text format (needs an app context)."""
+    lines = []
+
+    def _metric(name: str, metric_type: str, help_text: str, samples) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            label_str = ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+
+    runs = _aggregate("run")
+    run_totals = runs[0] if runs else {"calls": 0, "errors": 0, "seconds": 0.0}
+    _metric("agent_runs_total", "counter", "Graph runs.", [({}, run_totals["calls"])])
+    _metric(
+        "agent_run_failures_total", "counter", "Failed graph runs.", [({}, run_totals["errors"])]
+    )
+    _metric(
+        "agent_run_seconds_total", "counter", "Wall time of graph runs.", [({}, run_totals["seconds"])]
+    )
+
+    nodes = _aggregate("node")
+    for key, metric_name, help_text in (
+        ("calls", "agent_llm_calls_total", "LLM calls per node."),
+        ("retries", "agent_llm_retries_total", "Repeated LLM calls within one node step."),
+        ("errors", "agent_llm_errors_total", "Failed LLM calls per node."),
+        ("prompt_tokens", "agent_llm_prompt_tokens_total", "Prompt tokens per node."),
+        (
+            "cached_prompt_tokens",
+            "agent_llm_cached_prompt_tokens_total",
+            "Prompt tokens read from the provider's prompt cache per node.",
+        ),
+        ("completion_tokens", "agent_llm_completion_tokens_total", "Completion tokens per node."),
+        ("seconds", "agent_llm_seconds_total", "LLM wall time per node."),
+    ):
+        _metric(metric_name, "counter", help_text, [({"node": r["name"]}, r[key]) for r in nodes])
+
+    tools = _aggregate("tool")
+    for key, metric_name, help_text in (
+        ("calls", "agent_tool_calls_total", "Tool executions per tool."),
+        ("errors", "agent_tool_errors_total", "Failed tool executions per tool."),
+        ("seconds", "agent_tool_seconds_total", "Tool wall time per tool."),
+    ):
+        _metric(metric_name, "counter", help_text, [({"tool": r["name"]}, r[key]) for r in tools])
+
+    return "\n".join(lines) + "\n"
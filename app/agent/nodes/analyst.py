@@ -1,5 +1,7 @@
 import logging
 
+from agent.history import compact_state_history
+from agent.llm_factory import get_prompt_cache_kwargs
 from agent.state import AgentState
 from agent.utils import load_system_prompt, sanitize_response
 from langchain.chat_models import BaseChatModel
@@ -10,21 +12,23 @@ logger = logging.getLogger(__name__)
 
 def create_analyst_node(llm: BaseChatModel, tools, repo_url, agent_stack):
     sys_msg = load_system_prompt(agent_stack, "analyst")
+    # Gleicher Prefix bei jedem Aufruf -> Provider können ihn cachen
+    cache_kwargs = get_prompt_cache_kwargs(llm, f"{agent_stack}-analyst")
+    # Wir erlauben dem Analysten etwas mehr Freiheit ("auto"), da er oft chatten muss,
+    # um zu denken. Aber am Ende soll er finish_task nutzen.
+    chain = llm.bind_tools(tools, tool_choice="auto")
 
     async def analyst_node(state: AgentState):
         # Prompt mit Repo-URL anreichern
-        current_messages = [SystemMessage(content=sys_msg)] + state["messages"]
+        history, tokens_saved = compact_state_history(state, "analyst")
+        current_messages = [SystemMessage(content=sys_msg)] + history
 
-        # Wir erlauben dem Analysten etwas mehr Freiheit ("auto"), da er oft chatten muss,
-        # um zu denken. Aber am Ende soll er finish_task nutzen.
-        chain = llm.bind_tools(tools, tool_choice="auto")
-
-        response = await chain.ainvoke(current_messages)
+        response = await chain.ainvoke(current_messages, **cache_kwargs)
         response = sanitize_response(response)
         logger.info(
             f"\n=== ANALYST RESPONSE ===\nContent: '{response.content}'\nTool Calls: {response.tool_calls}\n============================"
         )
 
-        return {"messages": [response]}
+        return {"messages": [response], "history_tokens_saved": tokens_saved}
 
     return analyst_node
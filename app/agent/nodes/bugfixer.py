@@ -1,5 +1,7 @@
 import logging
 
+from agent.history import compact_state_history
+from agent.llm_factory import bind_tools_per_choice, get_prompt_cache_kwargs
 from agent.state import AgentState
 from agent.utils import load_system_prompt
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
@@ -9,16 +11,21 @@ logger = logging.getLogger(__name__)
 
 def create_bugfixer_node(llm, tools, repo_url, agent_stack):
     sys_msg = load_system_prompt(agent_stack, "bugfixer")
+    # Gleicher Prefix bei jedem Aufruf -> Provider können ihn cachen
+    cache_kwargs = get_prompt_cache_kwargs(llm, f"{agent_stack}-bugfixer")
+    # Tool-Schemas einmal pro tool_choice serialisieren, nicht bei jedem Versuch
+    chains = bind_tools_per_choice(llm, tools, ("auto", "any"))
 
     async def bugfixer_node(state: AgentState):
-        current_messages = [SystemMessage(content=sys_msg)] + state["messages"]
+        history, tokens_saved = compact_state_history(state, "bugfixer")
+        current_messages = [SystemMessage(content=sys_msg)] + history
 
         current_tool_choice = "auto"
 
         for attempt in range(3):
             try:
-                chain = llm.bind_tools(tools, tool_choice=current_tool_choice)
-                response = await chain.ainvoke(current_messages)
+                chain = chains.get(current_tool_choice, chains["auto"])
+                response = await chain.ainvoke(current_messages, **cache_kwargs)
 
                 has_content = bool(response.content)
                 has_tool_calls = bool(getattr(response, "tool_calls", []))
@@ -27,7 +34,7 @@ def create_bugfixer_node(llm, tools, repo_url, agent_stack):
                     logger.info(
                         f"\n=== BUGFIXER RESPONSE (Attempt {attempt + 1}) ===\nContent: '{response.content}'\nTool Calls: {response.tool_calls}\n============================="
                     )
-                    return {"messages": [response]}
+                    return {"messages": [response], "history_tokens_saved": tokens_saved}
 
                 logger.warning(f"Attempt {attempt + 1}: Empty response. Escalating...")
                 current_tool_choice = "any"
@@ -1,5 +1,7 @@
 import logging
 
+from agent.history import compact_state_history
+from agent.llm_factory import bind_tools_per_choice, get_prompt_cache_kwargs
 from agent.state import AgentState
 from agent.utils import load_system_prompt
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
@@ -19,16 +21,21 @@ def safe_truncate(value, length=100):
 
 def create_coder_node(llm, tools, repo_url, agent_stack):
     sys_msg = load_system_prompt(agent_stack, "coder")
+    # Gleicher Prefix bei jedem Aufruf -> Provider können ihn cachen
+    cache_kwargs = get_prompt_cache_kwargs(llm, f"{agent_stack}-coder")
+    # Tool-Schemas einmal pro tool_choice serialisieren, nicht bei jedem Versuch
+    chains = bind_tools_per_choice(llm, tools, ("auto", "any"))
 
     async def coder_node(state: AgentState):
-        current_messages = [SystemMessage(content=sys_msg)] + state["messages"]
+        history, tokens_saved = compact_state_history(state, "coder")
+        current_messages = [SystemMessage(content=sys_msg)] + history
 
         current_tool_choice = "auto"
 
         for attempt in range(3):
             try:
-                chain = llm.bind_tools(tools, tool_choice=current_tool_choice)
-                response = await chain.ainvoke(current_messages)
+                chain = chains.get(current_tool_choice, chains["auto"])
+                response = await chain.ainvoke(current_messages, **cache_kwargs)
 
                 has_content = bool(response.content)
                 tool_calls = getattr(response, "tool_calls", []) or []
@@ -52,7 +59,7 @@ def create_coder_node(llm, tools, repo_url, agent_stack):
                         # Auch den Content kürzen, falls er riesig ist
                         logger.info(f"Content: {safe_truncate(response.content, 100)}")
 
-                    return {"messages": [response]}
+                    return {"messages": [response], "history_tokens_saved": tokens_saved}
 
                 logger.warning(
                     f"Attempt {attempt + 1}: Empty response. Escalating strategy..."
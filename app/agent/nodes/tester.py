@@ -1,6 +1,8 @@
 import logging
 from typing import Literal
 
+from agent.history import compact_state_history
+from agent.llm_factory import get_prompt_cache_kwargs
 from agent.local_tools import report_test_result
 from agent.state import AgentState
 from agent.utils import load_system_prompt
@@ -25,13 +27,16 @@ class TesterResult(BaseModel):
 
 def create_tester_node(llm, tools, repo_url, agent_stack):
     sys_msg = load_system_prompt(agent_stack, "tester")
+    # Gleicher Prefix bei jedem Aufruf -> Provider können ihn cachen
+    cache_kwargs = get_prompt_cache_kwargs(llm, f"{agent_stack}-tester")
     llm_with_tools = llm.bind_tools(tools + [report_test_result])
 
     async def tester_node(state: AgentState):
-        current_messages = [SystemMessage(content=sys_msg)] + state["messages"]
+        history, tokens_saved = compact_state_history(state, "tester")
+        current_messages = [SystemMessage(content=sys_msg)] + history
 
         # LLM Aufruf
-        response = await llm_with_tools.ainvoke(current_messages)
+        response = await llm_with_tools.ainvoke(current_messages, **cache_kwargs)
 
         has_content = bool(response.content)
         has_tool_calls = bool(getattr(response, "tool_calls", []))
@@ -39,9 +44,9 @@ def create_tester_node(llm, tools, repo_url, agent_stack):
         if has_content or has_tool_calls:
             logger.info(f"\n=== TESTER RESPONSE ===\nTool Calls: {response.tool_calls}")
             logger.debug(f"\nContent: '{response.content}")
-            return {"messages": [response]}
+            return {"messages": [response], "history_tokens_saved": tokens_saved}
 
         # Wir geben die Message zurück. LangGraph kümmert sich um den Rest.
-        return {"messages": [response]}
+        return {"messages": [response], "history_tokens_saved": tokens_saved}
 
     return tester_node
@@ -0,0 +1,172 @@
+"""
+Cached file index of a workspace for list_files.
+
+The index comes from 'git ls-files' (tracked plus untracked, non-ignored
+files), so .gitignore is respected and build output like target/ or
+node_modules/ never shows up. It is cached per workspace and invalidated by
+the tools that change files or the checked-out tree (write_to_file, git
+tools). Outside a git repository it falls back to a filtered os.walk.
+
+The git helpers below are shared with the search and outline indexes
+(code_search, symbol_index), which key their caches by blob id and keep
+them next to the base clone of a worktree.
+"""
+
+import fnmatch
+import logging
+import os
+import subprocess
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Nur für den Fallback ohne Git
+SKIP_DIR_NAMES = {".git", ".tasks", "node_modules", "target", "build", "dist", "__pycache__"}
+
+_index_cache: dict[str, list[str]] = {}
+_index_lock = threading.Lock()
+
+
+def git_output(workspace: str, *args: str) -> str | None:
+    """Stdout of a git command in the workspace, None if git fails."""
+    try:
+        return subprocess.run(
+            ["git", *args],
+            cwd=workspace,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return None
+
+
+def clean_blob_ids(workspace: str) -> dict[str, str]:
+    """Blob ids of the tracked files that are unchanged in the working tree."""
+    staged = git_output(workspace, "ls-files", "-s", "-z")
+    modified = git_output(workspace, "diff", "--name-only", "-z")
+    if staged is None or modified is None:
+        return {}
+    modified_paths = set(modified.split("\0"))
+    blobs = {}
+    for record in staged.split("\0"):
+        if not record:
+            continue
+        meta, path = record.split("\t", 1)
+        if path not in modified_paths:
+            blobs[path] = meta.split()[1]
+    return blobs
+
+
+def git_common_dir(workspace: str) -> str | None:
+    """The .git directory of the base clone, shared by all of its worktrees."""
+    output = git_output(workspace, "rev-parse", "--path-format=absolute", "--git-common-dir")
+    return output.strip() if output else None
+
+
+def main_worktree(workspace: str) -> str | None:
+    """Base clone of a linked worktree, None for the base clone itself."""
+    git_dir = git_output(workspace, "rev-parse", "--absolute-git-dir")
+    common_dir = git_common_dir(workspace)
+    if not git_dir or not common_dir:
+        return None
+    if os.path.normpath(git_dir.strip()) == os.path.normpath(common_dir):
+        return None
+    return os.path.dirname(os.path.normpath(common_dir))
+
+
+def _build_file_index(workspace: str) -> list[str]:
+    try:
+        result = subprocess.run(
+            ["git", "ls-files", "--cached", "--others", "--exclude-standard", "-z"],
+            cwd=workspace,
+            check=True,
+            capture_output=True,
+        )
+        files = {
+            path
+            for path in result.stdout.decode("utf-8", errors="replace").split("\0")
+            # Gelöschte, aber noch im Index stehende Dateien ausblenden
+            if path and os.path.lexists(os.path.join(workspace, path))
+        }
+        return sorted(files)
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
+        logger.info(f"git ls-files not available in {workspace}, walking the tree: {e}")
+
+    files = []
+    for root, dirs, filenames in os.walk(workspace):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIR_NAMES)
+        for filename in filenames:
+            files.append(os.path.relpath(os.path.join(root, filename), workspace))
+    return sorted(files)
+
+
+def get_file_index(workspace: str) -> list[str]:
+    """Returns the sorted relative file paths of the workspace (cached)."""
+    with _index_lock:
+        files = _index_cache.get(workspace)
+    if files is None:
+        files = _build_file_index(workspace)
+        with _index_lock:
+            _index_cache[workspace] = files
+    return files
+
+
+def invalidate_file_index(workspace: str | None = None) -> None:
+    """Drops the cached index of one workspace, or of all if None."""
+    with _index_lock:
+        if workspace is None:
+            _index_cache.clear()
+        else:
+            _index_cache.pop(workspace, None)
+
+
+def filter_files(
+    files: list[str],
+    directory: str = "",
+    pattern: str | None = None,
+    max_depth: int | None = None,
+) -> list[str]:
+    """
+    Files below 'directory', optionally matching a glob (on the path relative
+    to the directory or on the file name) and at most 'max_depth' levels deep
+    (1 = only files directly in the directory).
+    """
+    prefix = directory.strip("/")
+    prefix = "" if prefix in ("", ".") else prefix + "/"
+
+    selected = []
+    for path in files:
+        if not path.startswith(prefix):
+            continue
+        rel_path = path[len(prefix):]
+        if max_depth is not None and rel_path.count("/") >= max_depth:
+            continue
+        if pattern and not (
+            fnmatch.fnmatch(rel_path, pattern)
+            or fnmatch.fnmatch(os.path.basename(rel_path), pattern)
+        ):
+            continue
+        selected.append(path)
+    return selected
+
+
+def render_file_tree(files: list[str]) -> str:
+    """Compact tree: each directory once, files indented below it."""
+    lines = []
+    previous_parts: list[str] = []
+    for path in files:
+        parts = path.split("/")
+        dirs, filename = parts[:-1], parts[-1]
+        common = 0
+        while (
+            common < len(dirs)
+            and common < len(previous_parts)
+            and dirs[common] == previous_parts[common]
+        ):
+            common += 1
+        for depth in range(common, len(dirs)):
+            lines.append("  " * depth + dirs[depth] + "/")
+        lines.append("  " * len(dirs) + filename)
+        previous_parts = dirs
+    return "\n".join(lines)
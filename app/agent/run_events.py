@@ -0,0 +1,258 @@
+"""
+Live progress of graph runs.
+
+The worker runs the graph with astream (stream modes tasks, messages and
+values) and publishes node transitions, tool calls and results and LLM
+token deltas to an in-memory event bus. The dashboard reads the bus over
+Server-Sent Events (/runs/events) and shows it on the live run view (/runs).
+
+The bus is a ring buffer of RUN_EVENT_BUFFER_SIZE events with sequence
+numbers, shared by all readers. Publishing only takes a short lock, so the
+agent loop never waits for a reader. A slow reader skips the events that
+dropped out of the buffer, and a reconnecting EventSource continues after
+its Last-Event-ID. Event ids carry a per-process epoch, so an id from before
+a restart replays the new buffer instead of waiting for its old sequence
+number. Token deltas are merged into one event per node every
+TOKEN_FLUSH_SECONDS.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.graph.state import CompiledStateGraph
+
+logger = logging.getLogger(__name__)
+
+RUN_EVENT_BUFFER_SIZE = int(os.environ.get("RUN_EVENT_BUFFER_SIZE", "2000"))
+MAX_EVENT_TEXT_CHARS = 2000
+TOKEN_FLUSH_SECONDS = 0.5
+TOKEN_FLUSH_CHARS = 1000
+# Letzte abgeschlossene Läufe, die die Live-Ansicht noch zeigt
+RECENT_RUNS = 10
+
+
+@dataclass
+class RunEvent:
+    epoch: str
+    seq: int
+    run_id: str
+    type: str  # run_start, node_start, node_end, tokens, tool_call, tool_result, run_end
+    data: dict
+    created_at: float
+
+    def to_sse(self) -> str:
+        return f"id: {self.epoch}-{self.seq}\ndata: {json.dumps(asdict(self), default=str)}\n\n"
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= MAX_EVENT_TEXT_CHARS:
+        return text
+    return text[:MAX_EVENT_TEXT_CHARS] + f"... ({len(text)} chars)"
+
+
+def _message_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    # Content-Blöcke (z.B. Anthropic): nur die Text-Teile
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content or []
+    )
+
+
+class RunEventBus:
+    """Bounded, thread-safe buffer of run events with blocking reads."""
+
+    def __init__(self, max_events: int = RUN_EVENT_BUFFER_SIZE):
+        self._events: deque[RunEvent] = deque(maxlen=max_events)
+        self._seq = 0
+        # Neu pro Prozess, damit Event-IDs von vor einem Neustart erkennbar sind
+        self.epoch = uuid.uuid4().hex[:8]
+        self._condition = threading.Condition()
+        self._runs: dict[str, dict] = {}
+
+    def publish(self, run_id: str, event_type: str, **data) -> None:
+        with self._condition:
+            self._seq += 1
+            self._events.append(
+                RunEvent(self.epoch, self._seq, run_id, event_type, data, time.time())
+            )
+            self._track_run(run_id, event_type, data)
+            self._condition.notify_all()
+
+    def resume_seq(self, last_event_id: str | None) -> int:
+        """
+        Sequence number to continue after for a Last-Event-ID ("<epoch>-<seq>")
+        or a plain sequence number. Ids of another process start from the
+        beginning of the buffer.
+        """
+        epoch, _, seq = (last_event_id or "").rpartition("-")
+        try:
+            after_seq = int(seq)
+        except ValueError:
+            return 0
+        if (epoch and epoch != self.epoch) or after_seq > self._seq:
+            return 0
+        return after_seq
+
+    def wait_for_events(self, after_seq: int, timeout: float) -> list[RunEvent]:
+        """
+        Returns the buffered events after `after_seq`, waiting up to `timeout`
+        seconds for new ones. Called from the request threads of the SSE stream.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > after_seq, timeout)
+            if self._seq <= after_seq:
+                return []
+            first_seq = self._seq - len(self._events) + 1
+            start = max(after_seq + 1 - first_seq, 0)
+            return [self._events[i] for i in range(start, len(self._events))]
+
+    def runs(self) -> list[dict]:
+        """Running and recently finished runs, newest first."""
+        with self._condition:
+            return sorted(
+                (dict(run) for run in self._runs.values()),
+                key=lambda run: run["started_at"],
+                reverse=True,
+            )
+
+    def _track_run(self, run_id: str, event_type: str, data: dict) -> None:
+        if event_type == "run_start":
+            self._runs[run_id] = {"run_id": run_id, "started_at": time.time(), **data}
+            finished = [r for r in self._runs.values() if r.get("status")]
+            for run in sorted(finished, key=lambda r: r["started_at"])[:-RECENT_RUNS]:
+                self._runs.pop(run["run_id"], None)
+            return
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        if event_type == "node_start":
+            run["node"] = data["node"]
+        elif event_type == "run_end":
+            run["status"] = data["status"]
+            run["error"] = data.get("error")
+            run["node"] = None
+
+
+run_event_bus = RunEventBus()
+
+
+class RunEventPublisher:
+    """Translates the astream chunks of one graph run into bus events."""
+
+    def __init__(self, run_id: str, bus: RunEventBus = run_event_bus):
+        self.run_id = run_id
+        self.bus = bus
+        self._tokens: list[str] = []
+        self._token_node: str | None = None
+        self._token_chars = 0
+        self._last_flush = time.monotonic()
+
+    def publish(self, event_type: str, **data) -> None:
+        self.flush_tokens()
+        self.bus.publish(self.run_id, event_type, **data)
+
+    def on_chunk(self, mode: str, chunk) -> None:
+        if mode == "tasks":
+            self._on_task(chunk)
+        elif mode == "messages":
+            message, metadata = chunk
+            self._on_message(message, metadata.get("langgraph_node"))
+
+    def _on_task(self, task: dict) -> None:
+        if "result" not in task:
+            self.publish("node_start", node=task["name"])
+            return
+        self.publish(
+            "node_end",
+            node=task["name"],
+            error=_truncate(str(task["error"])) if task.get("error") else None,
+        )
+        result = task.get("result")
+        if not isinstance(result, dict):
+            return
+        for message in result.get("messages") or []:
+            for tool_call in getattr(message, "tool_calls", None) or []:
+                self.publish(
+                    "tool_call",
+                    node=task["name"],
+                    name=tool_call["name"],
+                    args=_truncate(json.dumps(tool_call["args"], default=str)),
+                )
+
+    def _on_message(self, message, node: str | None) -> None:
+        if isinstance(message, ToolMessage):
+            self.publish(
+                "tool_result",
+                node=node,
+                name=message.name,
+                status=message.status,
+                content=_truncate(_message_text(message.content)),
+            )
+        elif isinstance(message, AIMessage):
+            # AIMessageChunk beim Streaming, sonst die ganze Antwort auf einmal
+            text = _message_text(message.content)
+            if text:
+                self._add_tokens(node, text)
+
+    def _add_tokens(self, node: str | None, text: str) -> None:
+        if node != self._token_node:
+            self.flush_tokens()
+            self._token_node = node
+        self._tokens.append(text)
+        self._token_chars += len(text)
+        if (
+            self._token_chars >= TOKEN_FLUSH_CHARS
+            or time.monotonic() - self._last_flush >= TOKEN_FLUSH_SECONDS
+        ):
+            self.flush_tokens()
+
+    def flush_tokens(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._tokens:
+            return
+        text = "".join(self._tokens)
+        self._tokens.clear()
+        self._token_chars = 0
+        self.bus.publish(self.run_id, "tokens", node=self._token_node, text=text)
+
+
+async def stream_graph_run(
+    app_graph: CompiledStateGraph,
+    graph_input: dict | None,
+    config: dict,
+    run_id: str,
+    label: str,
+) -> dict:
+    """
+    Runs the graph like ainvoke, publishes its progress to the event bus
+    and returns the final state.
+    """
+    publisher = RunEventPublisher(run_id)
+    publisher.publish("run_start", label=label, resumed=graph_input is None)
+    final_state = {}
+    status = "failed"
+    error = None
+    try:
+        async for mode, chunk in app_graph.astream(
+            graph_input, config, stream_mode=["tasks", "messages", "values"]
+        ):
+            if mode == "values":
+                final_state = chunk
+            else:
+                publisher.on_chunk(mode, chunk)
+        status = "finished"
+        return final_state
+    except Exception as e:
+        error = _truncate(str(e))
+        raise
+    finally:
+        publisher.publish("run_end", status=status, error=error)
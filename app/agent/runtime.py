@@ -0,0 +1,277 @@
+"""
+Long-lived agent runtime.
+
+The runtime owns the expensive resources of the agent (MCP server processes,
+their LangChain tools, the LLM clients and the compiled graph) and keeps them
+warm across scheduler ticks. It runs its own event loop in a background
+thread, because MCP sessions are bound to the loop they were started on.
+Resources are rebuilt only when the decrypted config, the repository or the
+stack changes, or when a health check fails.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+
+from langchain.chat_models import BaseChatModel
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph import StateGraph
+from langgraph.graph.state import CompiledStateGraph
+
+from agent.graph import create_workflow
+from agent.llm_factory import get_llm
+from agent.mcp_adapter import McpServerClient
+
+logger = logging.getLogger(__name__)
+
+HEALTH_CHECK_TIMEOUT_SECONDS = 5
+
+
+@dataclass
+class RuntimeResources:
+    graph: CompiledStateGraph
+    llm_large: BaseChatModel
+    llm_small: BaseChatModel
+    git_tools: list = field(default_factory=list)
+    task_tools: list = field(default_factory=list)
+    mcp_clients: list[McpServerClient] = field(default_factory=list)
+
+
+def _fingerprint(
+    sys_config: dict, system_def: dict, repo_url: str, agent_stack: str, workspace: str
+) -> str:
+    payload = json.dumps(
+        {
+            "sys_config": sys_config,
+            "command": system_def["command"],
+            "repo_url": repo_url,
+            "agent_stack": agent_stack,
+            "workspace": workspace,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AgentRuntime:
+    """
+    Keeps MCP servers, LLM clients and the compiled graph alive between cycles.
+    """
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+        self._build_lock: asyncio.Lock | None = None
+        self._fingerprint: str | None = None
+        self._resources: RuntimeResources | None = None
+        self._owner_task: asyncio.Task | None = None
+        self._stop_event: asyncio.Event | None = None
+
+    # --- Event loop ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._thread_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="agent-runtime", daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def run(self, coro):
+        """Runs a coroutine on the runtime loop and blocks until it is done."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def shutdown(self) -> None:
+        """Stops all resources and the runtime loop (e.g. on process exit)."""
+        with self._thread_lock:
+            loop, thread = self._loop, self._thread
+            if loop is None:
+                return
+            self._loop = None
+            self._thread = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop_resources(), loop).result()
+        except Exception as e:
+            logger.warning(f"Error while stopping agent runtime: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        self._build_lock = None
+
+    # --- Resources ---
+
+    @property
+    def resources(self) -> RuntimeResources | None:
+        return self._resources
+
+    async def get_graph(
+        self,
+        sys_config: dict,
+        system_def: dict,
+        repo_url: str,
+        agent_stack: str,
+        workspace: str,
+        checkpointer: BaseCheckpointSaver | None = None,
+    ) -> CompiledStateGraph:
+        """
+        Returns the compiled graph, reusing the warm resources if the
+        configuration is unchanged and the MCP servers are healthy.
+        """
+        if self._build_lock is None:
+            self._build_lock = asyncio.Lock()
+
+        fingerprint = _fingerprint(
+            sys_config, system_def, repo_url, agent_stack, workspace
+        )
+        start = time.monotonic()
+
+        async with self._build_lock:
+            if self._resources is not None:
+                if self._fingerprint != fingerprint:
+                    logger.info("Agent configuration changed. Rebuilding runtime.")
+                elif await self._is_healthy():
+                    logger.info(
+                        f"Reusing warm agent runtime ({time.monotonic() - start:.3f}s)."
+                    )
+                    return self._resources.graph
+                else:
+                    logger.warning("Agent runtime unhealthy. Rebuilding runtime.")
+                await self._stop_resources()
+
+            await self._start_resources(
+                sys_config, system_def, repo_url, agent_stack, workspace, checkpointer
+            )
+            self._fingerprint = fingerprint
+            logger.info(f"Agent runtime built in {time.monotonic() - start:.3f}s.")
+            return self._resources.graph
+
+    async def _is_healthy(self) -> bool:
+        if self._owner_task is None or self._owner_task.done():
+            return False
+        try:
+            async with asyncio.timeout(HEALTH_CHECK_TIMEOUT_SECONDS):
+                for mcp_client in self._resources.mcp_clients:
+                    await mcp_client.ping()
+            return True
+        except Exception as e:
+            logger.warning(f"MCP health check failed: {e}")
+            return False
+
+    async def _start_resources(
+        self,
+        sys_config: dict,
+        system_def: dict,
+        repo_url: str,
+        agent_stack: str,
+        workspace: str,
+        checkpointer: BaseCheckpointSaver | None,
+    ) -> None:
+        ready = asyncio.get_running_loop().create_future()
+        self._stop_event = asyncio.Event()
+        # The MCP contexts must be entered and exited in the same task,
+        # so a dedicated task owns them for their whole lifetime.
+        self._owner_task = asyncio.create_task(
+            self._own_resources(
+                ready,
+                self._stop_event,
+                sys_config,
+                system_def,
+                repo_url,
+                agent_stack,
+                workspace,
+                checkpointer,
+            ),
+            name="agent-runtime-resources",
+        )
+        self._resources = await ready
+
+    async def _stop_resources(self) -> None:
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._owner_task is not None:
+            try:
+                await self._owner_task
+            except Exception as e:
+                logger.warning(f"Error while closing agent runtime resources: {e}")
+        self._owner_task = None
+        self._stop_event = None
+        self._resources = None
+        self._fingerprint = None
+
+    async def _own_resources(
+        self,
+        ready: asyncio.Future,
+        stop_event: asyncio.Event,
+        sys_config: dict,
+        system_def: dict,
+        repo_url: str,
+        agent_stack: str,
+        workspace: str,
+        checkpointer: BaseCheckpointSaver | None,
+    ) -> None:
+        try:
+            async with AsyncExitStack() as stack:
+                task_env = os.environ.copy()
+                task_env.update(sys_config.get("env", {}))
+
+                # --- Start ALL MCP Servers ---
+                git_mcp = McpServerClient(
+                    command=sys.executable,
+                    args=["-m", "mcp_server_git", "--repository", workspace],
+                    env=os.environ.copy(),
+                )
+                task_mcp = McpServerClient(
+                    system_def["command"][0], system_def["command"][1:], env=task_env
+                )
+
+                await stack.enter_async_context(git_mcp)
+                await stack.enter_async_context(task_mcp)
+
+                git_tools = await git_mcp.get_langchain_tools()
+                task_tools = await task_mcp.get_langchain_tools()
+                logger.info(
+                    f"Loaded {len(git_tools)} Git tools and {len(task_tools)} Task tools."
+                )
+
+                # --- LLM and Graph Creation ---
+                llm_large: BaseChatModel = get_llm(sys_config, True)
+                llm_small: BaseChatModel = get_llm(sys_config, False)
+                workflow: StateGraph = create_workflow(
+                    llm_large,
+                    llm_small,
+                    git_tools,
+                    task_tools,
+                    repo_url,
+                    sys_config,
+                    agent_stack,
+                )
+
+                ready.set_result(
+                    RuntimeResources(
+                        graph=workflow.compile(checkpointer=checkpointer),
+                        llm_large=llm_large,
+                        llm_small=llm_small,
+                        git_tools=git_tools,
+                        task_tools=task_tools,
+                        mcp_clients=[git_mcp, task_mcp],
+                    )
+                )
+                await stop_event.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.error(f"Agent runtime resources failed: {e}", exc_info=True)
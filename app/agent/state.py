@@ -1,3 +1,4 @@
+import operator
 from typing import Annotated, Optional, TypedDict
 
 from langchain_core.messages import BaseMessage
@@ -8,9 +9,13 @@ class AgentState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
     next_step: str
     agent_stack: str  # Backend or Frontend
+    workspace: Optional[str]  # Arbeitsverzeichnis (Worktree) dieses Laufs
     retry_count: int  # Versuche, wie oft zwischen coder und tester gewechselt wurde
     test_result: Optional[str]
     error_log: Optional[str]  # Optional: Speichert den letzten Fehler explizit
+    trello_card: Optional[dict]  # Im Pre-Check des Workers bereits geladene Karte
     trello_card_id: Optional[str]
     trello_list_id: Optional[str]
     trello_in_progress: bool
+    # Summe der durch History-Kompaktierung eingesparten Tokens in diesem Lauf
+    history_tokens_saved: Annotated[int, operator.add]
@@ -0,0 +1,676 @@
+"""
+Outline index for the get_outline and find_symbol tools.
+
+For every Java and TypeScript/JavaScript file of a workspace the index keeps
+an outline: package, imports and the declared types, methods, constructors,
+fields and top-level functions with their line numbers and signatures. The
+parser is a lightweight scanner (comments and string literals are blanked,
+then declarations are recognised on brace/semicolon boundaries); it skips
+method bodies and does not need a compiler or language server.
+
+The outlines are cached per commit in the common git directory, shared by
+the base clone and all task worktrees: one JSON file per HEAD SHA (the last
+few are kept) maps every unmodified tracked file to its blob id and outline.
+A worktree of a revision that was already parsed only re-parses the files
+whose blob differs. Files changed in the working tree are re-parsed based on
+mtime and size, and write_to_file updates the written file right away.
+"""
+
+import bisect
+import glob
+import json
+import logging
+import os
+import re
+import threading
+from dataclasses import asdict, dataclass, field
+
+from agent.repo_index import clean_blob_ids, get_file_index, git_common_dir, git_output
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 2
+INDEX_FILE_PREFIX = "agent-outline-"
+MAX_CACHED_REVISIONS = 3
+MAX_PARSED_FILE_BYTES = 500_000
+MAX_SIGNATURE_CHARS = 160
+MAX_OUTLINE_CHARS = 15000
+MAX_SYMBOL_RESULTS = 50
+
+JAVA_EXTENSIONS = {".java"}
+TS_EXTENSIONS = {".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs"}
+
+IDENTIFIER = r"[A-Za-z_$][\w$]*"
+
+# Annotationen (Java) und Decorators (TS), eine Ebene verschachtelter Klammern
+ANNOTATION_RE = re.compile(r"@(?!interface\b)[\w$.]+(?:\s*\((?:[^()]|\([^()]*\))*\))?")
+JAVA_MODIFIER_RE = re.compile(
+    r"\b(?:public|protected|private|static|final|abstract|synchronized|native|"
+    r"transient|volatile|strictfp|default|sealed|non-sealed)\b"
+)
+TS_MODIFIER_RE = re.compile(
+    r"\b(?:export|default|declare|abstract|public|protected|private|static|"
+    r"readonly|async|override|accessor)\b(?!\s*[(:=?;,])"
+)
+
+JAVA_PACKAGE_RE = re.compile(r"^\s*package\s+([\w.]+)\s*;", re.MULTILINE)
+JAVA_IMPORT_RE = re.compile(r"^\s*import\s+(static\s+)?([\w.]+(?:\.\*)?)\s*;", re.MULTILINE)
+TS_IMPORT_RE = re.compile(
+    r"^\s*(?:import\s+(?:type\s+)?(?:[^;'\"]*?\s*from\s*)?"
+    r"|export\s+(?:type\s+)?(?:\*(?:\s+as\s+[\w$]+)?|\{[^}]*\})\s*from\s*)"
+    r"(['\"])([^'\"\n]+)\1\s*;?",
+    re.MULTILINE,
+)
+
+JAVA_TYPE_RE = re.compile(rf"\s*(class|interface|enum|record|@interface)\s+({IDENTIFIER})")
+JAVA_METHOD_RE = re.compile(
+    rf"\s*(?:<[^{{}};]*?>\s*)?(?:([\w$.<>\[\],?\s]+?)\s+)?({IDENTIFIER})\s*\("
+)
+JAVA_FIELD_RE = re.compile(
+    rf"\s*([\w$.<>\[\],?\s]+?)\s+({IDENTIFIER})\s*(?:\[\s*\]\s*)*(?:=|,|\Z)", re.DOTALL
+)
+JAVA_KEYWORDS = {
+    "return", "new", "throw", "if", "else", "for", "while", "do", "switch", "case",
+    "try", "catch", "finally", "synchronized", "assert", "yield", "this", "super",
+}
+
+TS_TYPE_RE = re.compile(rf"\s*(?:const\s+)?(class|interface|enum|namespace|module)\s+({IDENTIFIER})")
+TS_TYPE_ALIAS_RE = re.compile(rf"\s*type\s+({IDENTIFIER})\s*(?:<|=)")
+TS_FUNCTION_RE = re.compile(rf"\s*function\s*\*?\s*({IDENTIFIER})")
+TS_VARIABLE_RE = re.compile(rf"\s*(?:const|let|var)\s+({IDENTIFIER})")
+TS_ACCESSOR_RE = re.compile(rf"\s*(get|set)\s+(?=#?{IDENTIFIER}\s*\()")
+# Arrow-Function oder function-Ausdruck als Wert einer Variable/eines Feldes
+TS_FUNCTION_VALUE_RE = re.compile(
+    r"=\s*(?:async\s+)?(?:function\b|(?:\([^()]*\)|[\w$]+)\s*(?::[^=]+)?=>)"
+)
+TS_METHOD_RE = re.compile(rf"\s*(#?{IDENTIFIER})\s*[?!]?\s*(?:<[^()]*?>)?\s*\(")
+TS_FIELD_RE = re.compile(rf"\s*(#?{IDENTIFIER})\s*[?!]?\s*(?::|=|\Z)", re.DOTALL)
+
+# Zeilenumbrüche beenden in TS eine Deklaration nur, wenn nichts weiter folgt
+TS_CONTINUATION_END = tuple(",=:|&<(+-*/?.")
+TS_CONTINUATION_START = tuple(".=|&?:,)>+-*/")
+TS_CONTINUATION_WORDS = ("extends", "implements", "from", "as")
+
+
+@dataclass
+class Symbol:
+    name: str
+    kind: str
+    line: int
+    signature: str
+    container: str | None = None
+    depth: int = 0
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.container}.{self.name}" if self.container else self.name
+
+
+@dataclass
+class FileOutline:
+    path: str
+    language: str
+    line_count: int
+    package: str | None = None
+    imports: list[str] = field(default_factory=list)
+    symbols: list[Symbol] = field(default_factory=list)
+
+
+@dataclass
+class _Context:
+    kind: str  # "file", "type" oder "body" (Methodenrumpf, Initializer, Objekt)
+    symbol: Symbol | None = None
+    braces: int = 0
+    enum_constants_done: bool = False
+
+
+def _blank(chars: list[str], start: int, end: int) -> None:
+    for i in range(start, end):
+        if chars[i] != "\n":
+            chars[i] = " "
+
+
+def _mask(match: re.Match) -> str:
+    return re.sub(r"[^\n]", " ", match.group())
+
+
+def _strip_comments_and_strings(text: str, language: str) -> tuple[str, str]:
+    """
+    Returns (code, structure): 'code' has the comments blanked, 'structure'
+    additionally the contents of string literals. Offsets stay unchanged.
+    """
+    code = list(text)
+    structure = list(text)
+    quotes = "\"'`" if language == "typescript" else "\"'"
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            end = n if end == -1 else end
+            _blank(code, i, end)
+            _blank(structure, i, end)
+            i = end
+        elif ch == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            _blank(code, i, end)
+            _blank(structure, i, end)
+            i = end
+        elif ch in quotes:
+            if language == "java" and text.startswith('"""', i):
+                end = text.find('"""', i + 3)
+                end = n if end == -1 else end + 3
+                _blank(structure, i + 3, max(i + 3, end - 3))
+                i = end
+                continue
+            j = i + 1
+            while j < n and text[j] != ch:
+                if text[j] == "\\":
+                    j += 2
+                    continue
+                if text[j] == "\n" and ch != "`":
+                    break
+                j += 1
+            _blank(structure, i + 1, min(j, n))
+            i = j + 1
+        else:
+            i += 1
+    return "".join(code), "".join(structure)
+
+
+def _signature(text: str) -> str:
+    signature = " ".join(text.split())
+    if len(signature) > MAX_SIGNATURE_CHARS:
+        signature = signature[:MAX_SIGNATURE_CHARS] + " ..."
+    return signature
+
+
+def _split_top_level(text: str, separator: str = ",") -> list[tuple[int, str]]:
+    """Splits at separators outside of parentheses; returns (offset, part)."""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch in "([<":
+            depth += 1
+        elif ch in ")]>":
+            depth = max(0, depth - 1)
+        elif ch == separator and depth == 0:
+            parts.append((start, text[start:i]))
+            start = i + 1
+    parts.append((start, text[start:]))
+    return parts
+
+
+class _OutlineParser:
+    def __init__(self, path: str, text: str, language: str):
+        self.language = language
+        self.text = text
+        self.code, self.structure = _strip_comments_and_strings(text, language)
+        self.line_starts = [0] + [i + 1 for i, ch in enumerate(text) if ch == "\n"]
+        self.outline = FileOutline(path=path, language=language, line_count=len(self.line_starts))
+        self.stack = [_Context("file")]
+
+    def line_of(self, offset: int) -> int:
+        return bisect.bisect_right(self.line_starts, offset)
+
+    def parse(self) -> FileOutline:
+        self._extract_imports()
+        structure = self.structure
+        paren = 0
+        segment_start = 0
+        for i, ch in enumerate(structure):
+            context = self.stack[-1]
+            if context.kind == "body":
+                if ch == "{":
+                    context.braces += 1
+                elif ch == "}":
+                    if context.braces == 0:
+                        self.stack.pop()
+                        segment_start = i + 1
+                        paren = 0
+                    else:
+                        context.braces -= 1
+                continue
+
+            if ch in "([":
+                paren += 1
+            elif ch in ")]":
+                paren = max(0, paren - 1)
+            elif paren == 0 and ch in "{;}":
+                symbol = self._handle_segment(segment_start, i, ch)
+                if ch == "{":
+                    if symbol is not None and symbol.kind in (
+                        "class", "interface", "enum", "record", "annotation", "namespace", "module"
+                    ):
+                        self.stack.append(_Context("type", symbol))
+                    else:
+                        self.stack.append(_Context("body"))
+                elif ch == "}" and len(self.stack) > 1:
+                    self.stack.pop()
+                segment_start = i + 1
+            elif ch == "\n" and paren == 0 and self.language == "typescript":
+                if self._ts_statement_ends(segment_start, i):
+                    self._handle_segment(segment_start, i, "\n")
+                    segment_start = i + 1
+        return self.outline
+
+    def _extract_imports(self) -> None:
+        """Collects package and imports and blanks them for the scanner."""
+        code, structure = list(self.code), list(self.structure)
+        spans = []
+        if self.language == "java":
+            package = JAVA_PACKAGE_RE.search(self.code)
+            if package:
+                self.outline.package = package.group(1)
+                spans.append(package.span())
+            for match in JAVA_IMPORT_RE.finditer(self.code):
+                prefix = "static " if match.group(1) else ""
+                self.outline.imports.append(prefix + match.group(2))
+                spans.append(match.span())
+        else:
+            for match in TS_IMPORT_RE.finditer(self.code):
+                if match.group(2) not in self.outline.imports:
+                    self.outline.imports.append(match.group(2))
+                spans.append(match.span())
+        for start, end in spans:
+            _blank(code, start, end)
+            _blank(structure, start, end)
+        self.code, self.structure = "".join(code), "".join(structure)
+
+    def _ts_statement_ends(self, start: int, end: int) -> bool:
+        segment = self.structure[start:end]
+        stripped = ANNOTATION_RE.sub(_mask, segment).strip()
+        if not stripped or stripped.endswith(TS_CONTINUATION_END):
+            return False
+        following = self.structure[end:].lstrip()
+        if following.startswith(TS_CONTINUATION_START):
+            return False
+        next_word = re.match(r"[\w$]+", following)
+        return not (next_word and next_word.group() in TS_CONTINUATION_WORDS)
+
+    def _add_symbol(self, name: str, kind: str, offset: int, start: int, end: int) -> Symbol:
+        container = self.stack[-1].symbol
+        depth = sum(1 for context in self.stack if context.kind == "type")
+        symbol = Symbol(
+            name=name,
+            kind=kind,
+            line=self.line_of(offset),
+            signature=_signature(self.code[start:end]),
+            container=container.qualified_name if container else None,
+            depth=depth,
+        )
+        self.outline.symbols.append(symbol)
+        return symbol
+
+    def _handle_segment(self, start: int, end: int, delimiter: str) -> Symbol | None:
+        segment = self.structure[start:end]
+        if not segment.strip():
+            return None
+        masked = ANNOTATION_RE.sub(_mask, segment)
+        modifier_re = JAVA_MODIFIER_RE if self.language == "java" else TS_MODIFIER_RE
+        header = modifier_re.sub(_mask, masked).rstrip()
+        if not header.strip():
+            return None
+
+        context = self.stack[-1]
+        container = context.symbol
+        if container is not None and container.kind == "enum" and not context.enum_constants_done:
+            if self.language == "java" and delimiter == ";":
+                context.enum_constants_done = True
+            if self.language == "typescript" or not JAVA_TYPE_RE.match(header):
+                self._add_enum_constants(header, start, end)
+                return None
+
+        if self.language == "java":
+            return self._handle_java(header, start, end, delimiter)
+        return self._handle_typescript(header, start, end, delimiter)
+
+    def _add_enum_constants(self, header: str, start: int, end: int) -> None:
+        for offset, part in _split_top_level(header):
+            match = re.match(rf"\s*({IDENTIFIER})", part)
+            if match:
+                name_offset = start + offset + match.start(1)
+                part_end = start + offset + len(part.rstrip())
+                self._add_symbol(match.group(1), "constant", name_offset, start + offset, part_end)
+
+    def _handle_java(self, header: str, start: int, end: int, delimiter: str) -> Symbol | None:
+        context = self.stack[-1]
+        match = JAVA_TYPE_RE.match(header)
+        if match:
+            kind = "annotation" if match.group(1) == "@interface" else match.group(1)
+            return self._add_symbol(match.group(2), kind, start + match.start(2), start, end)
+        if context.kind != "type":
+            return None
+
+        match = JAVA_METHOD_RE.match(header)
+        if match and "=" not in header[: match.end()]:
+            return_type, name = match.group(1), match.group(2)
+            if return_type is None:
+                if name != context.symbol.name:
+                    return None
+                kind = "constructor"
+            elif name in JAVA_KEYWORDS or return_type.strip() in JAVA_KEYWORDS:
+                return None
+            else:
+                kind = "method"
+            return self._add_symbol(name, kind, start + match.start(2), start, end)
+
+        if delimiter == ";" or "=" in header:
+            match = JAVA_FIELD_RE.match(header)
+            if match and match.group(1).strip() not in JAVA_KEYWORDS:
+                field_end = start + header.index("=") if "=" in header else end
+                return self._add_symbol(match.group(2), "field", start + match.start(2), start, field_end)
+        return None
+
+    def _handle_typescript(self, header: str, start: int, end: int, delimiter: str) -> Symbol | None:
+        context = self.stack[-1]
+        match = TS_TYPE_RE.match(header)
+        if match:
+            return self._add_symbol(match.group(2), match.group(1), start + match.start(2), start, end)
+        match = TS_TYPE_ALIAS_RE.match(header)
+        if match:
+            return self._add_symbol(match.group(1), "type", start + match.start(1), start, end)
+
+        in_module = context.kind == "file" or (
+            context.symbol is not None and context.symbol.kind in ("namespace", "module")
+        )
+        if in_module:
+            match = TS_FUNCTION_RE.match(header)
+            if match:
+                return self._add_symbol(match.group(1), "function", start + match.start(1), start, end)
+            match = TS_VARIABLE_RE.match(header)
+            if match:
+                kind = "function" if TS_FUNCTION_VALUE_RE.search(header) else "variable"
+                return self._add_symbol(match.group(1), kind, start + match.start(1), start, end)
+            return None
+
+        accessor = TS_ACCESSOR_RE.match(header)
+        member_header = header[accessor.end():] if accessor else header
+        member_offset = start + (accessor.end() if accessor else 0)
+        match = TS_METHOD_RE.match(member_header)
+        if match:
+            name = match.group(1)
+            kind = "constructor" if name == "constructor" else "method"
+            if accessor:
+                kind = "getter" if accessor.group(1) == "get" else "setter"
+            return self._add_symbol(name, kind, member_offset + match.start(1), start, end)
+        match = TS_FIELD_RE.match(member_header)
+        if match:
+            kind = "method" if TS_FUNCTION_VALUE_RE.search(member_header) else "field"
+            return self._add_symbol(match.group(1), kind, member_offset + match.start(1), start, end)
+        return None
+
+
+def _language_of(path: str) -> str | None:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in JAVA_EXTENSIONS:
+        return "java"
+    if extension in TS_EXTENSIONS:
+        return "typescript"
+    return None
+
+
+def parse_outline(path: str, text: str) -> FileOutline | None:
+    """Parses the outline of a Java or TypeScript/JavaScript source."""
+    language = _language_of(path)
+    if language is None:
+        return None
+    return _OutlineParser(path, text, language).parse()
+
+
+@dataclass
+class _OutlineEntry:
+    mtime: float
+    size: int
+    outline: FileOutline | None
+
+
+def _outline_from_dict(data: dict | None) -> FileOutline | None:
+    if data is None:
+        return None
+    return FileOutline(
+        **{
+            **data,
+            "imports": [str(name) for name in data.get("imports", [])],
+            "symbols": [Symbol(**symbol) for symbol in data.get("symbols", [])],
+        }
+    )
+
+
+class OutlineIndex:
+    """Outline index of one workspace."""
+
+    def __init__(self, workspace: str):
+        self.workspace = workspace
+        self.head: str | None = None
+        self._files: dict[str, _OutlineEntry] = {}
+        self._lock = threading.Lock()
+        self._cache_dir = git_common_dir(workspace)
+
+    # --- Persistence ---
+
+    def _cache_file(self, head: str | None) -> str | None:
+        if not self._cache_dir or not head:
+            return None
+        return os.path.join(self._cache_dir, f"{INDEX_FILE_PREFIX}{head}.json")
+
+    def _load(self, head: str) -> dict[str, tuple[str, FileOutline | None]]:
+        """Cached outlines of a commit: path -> (blob id, outline)."""
+        cache_file = self._cache_file(head)
+        if not cache_file or not os.path.exists(cache_file):
+            return {}
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return {}
+            return {
+                path: (str(entry["blob"]), _outline_from_dict(entry["outline"]))
+                for path, entry in data["files"].items()
+            }
+        except Exception as e:
+            logger.warning(f"Could not load outline cache {cache_file}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        cache_file = self._cache_file(self.head)
+        if not cache_file:
+            return
+        # Nur unveränderte Dateien, der Cache gilt für alle Worktrees des Commits
+        blobs = clean_blob_ids(self.workspace)
+        files = {
+            path: {
+                "blob": blobs[path],
+                "outline": asdict(entry.outline) if entry.outline else None,
+            }
+            for path, entry in self._files.items()
+            if path in blobs
+        }
+        try:
+            # Einträge anderer Worktrees desselben Commits behalten
+            with open(cache_file, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+            if existing.get("version") == INDEX_VERSION:
+                files = {**existing["files"], **files}
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        tmp_file = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump({"version": INDEX_VERSION, "files": files}, f)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            logger.warning(f"Could not save outline cache {cache_file}: {e}")
+            return
+
+        # Nur die letzten Revisionen behalten
+        cached = sorted(
+            glob.glob(os.path.join(self._cache_dir, f"{INDEX_FILE_PREFIX}*.json")),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for old_file in cached[MAX_CACHED_REVISIONS:]:
+            try:
+                os.remove(old_file)
+            except OSError:
+                pass
+
+    # --- Maintenance ---
+
+    def _parse_file(self, path: str) -> None:
+        full_path = os.path.join(self.workspace, path)
+        try:
+            stat = os.stat(full_path)
+            outline = None
+            if stat.st_size <= MAX_PARSED_FILE_BYTES:
+                with open(full_path, "r", encoding="utf-8", errors="replace") as f:
+                    outline = parse_outline(path, f.read())
+        except OSError:
+            self._files.pop(path, None)
+            return
+        except Exception as e:
+            logger.warning(f"Could not parse outline of {path}: {e}")
+            outline = None
+        self._files[path] = _OutlineEntry(stat.st_mtime, stat.st_size, outline)
+
+    def refresh(self) -> int:
+        """Takes unchanged files from the commit cache and re-parses the others."""
+        with self._lock:
+            head = (git_output(self.workspace, "rev-parse", "HEAD") or "").strip() or None
+            cached = {}
+            if head != self.head:
+                self.head = head
+                cached = self._load(head) if head else {}
+            blobs = None
+
+            current = {path for path in get_file_index(self.workspace) if _language_of(path)}
+            changes = parsed = 0
+            for path in list(self._files):
+                if path not in current:
+                    del self._files[path]
+                    changes += 1
+            for path in current:
+                entry = self._files.get(path)
+                try:
+                    stat = os.stat(os.path.join(self.workspace, path))
+                except OSError:
+                    continue
+                if entry and entry.mtime == stat.st_mtime and entry.size == stat.st_size:
+                    continue
+                changes += 1
+                if path in cached:
+                    if blobs is None:
+                        blobs = clean_blob_ids(self.workspace)
+                    blob, outline = cached[path]
+                    if blobs.get(path) == blob:
+                        self._files[path] = _OutlineEntry(stat.st_mtime, stat.st_size, outline)
+                        continue
+                self._parse_file(path)
+                parsed += 1
+
+            cache_file = self._cache_file(head)
+            if parsed or (cache_file and not os.path.exists(cache_file)):
+                self._save()
+            if changes:
+                logger.info(
+                    f"Outline index of {self.workspace} @ {head or 'no commit'}: "
+                    f"{changes - parsed} files from cache, {parsed} parsed"
+                )
+            return changes
+
+    def update_file(self, path: str) -> None:
+        """Re-parses one file right after it was written."""
+        if not _language_of(path):
+            return
+        with self._lock:
+            self._parse_file(path)
+
+    # --- Query ---
+
+    def outlines(self, prefix: str = "") -> list[FileOutline]:
+        with self._lock:
+            return [
+                entry.outline
+                for path, entry in sorted(self._files.items())
+                if entry.outline is not None and path.startswith(prefix)
+            ]
+
+    def get(self, path: str) -> FileOutline | None:
+        with self._lock:
+            entry = self._files.get(path)
+            return entry.outline if entry else None
+
+    def find(self, name: str, kind: str | None = None) -> list[tuple[str, Symbol]]:
+        """
+        Symbols named 'name' (or 'Container.name'). Falls back to a
+        case-insensitive and then to a substring match.
+        """
+        container, _, simple_name = name.rpartition(".")
+        symbols = [
+            (outline.path, symbol)
+            for outline in self.outlines()
+            for symbol in outline.symbols
+            if kind is None or symbol.kind == kind
+        ]
+
+        def _container_matches(symbol: Symbol, lower: bool) -> bool:
+            if not container:
+                return True
+            actual = symbol.container or ""
+            if lower:
+                return actual.lower().endswith(container.lower())
+            return actual == container or actual.endswith(f".{container}")
+
+        for matches in (
+            lambda s: s.name == simple_name and _container_matches(s, False),
+            lambda s: s.name.lower() == simple_name.lower() and _container_matches(s, True),
+            lambda s: simple_name.lower() in s.name.lower() and _container_matches(s, True),
+        ):
+            found = [(path, symbol) for path, symbol in symbols if matches(symbol)]
+            if found:
+                return found
+        return []
+
+
+_indexes: dict[str, OutlineIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_outline_index(workspace: str, refresh: bool = True) -> OutlineIndex:
+    """Returns the (refreshed) outline index of a workspace."""
+    with _indexes_lock:
+        index = _indexes.get(workspace)
+        if index is None:
+            index = _indexes[workspace] = OutlineIndex(workspace)
+    if refresh:
+        index.refresh()
+    return index
+
+
+def update_outline_index(workspace: str, path: str) -> None:
+    """Updates a single file, if the workspace already has an index in memory."""
+    index = _indexes.get(workspace)
+    if index is not None:
+        index.update_file(path)
+
+
+def render_outline(outline: FileOutline, with_imports: bool = True) -> str:
+    lines = [f"{outline.path} ({outline.language}, {outline.line_count} lines)"]
+    if outline.package:
+        lines.append(f"package {outline.package}")
+    if with_imports and outline.imports:
+        lines.append(f"imports ({len(outline.imports)}): {', '.join(outline.imports)}")
+    for symbol in outline.symbols:
+        indent = "  " * (symbol.depth + 1)
+        lines.append(f"{indent}L{symbol.line} {symbol.kind} {symbol.signature}")
+    return "\n".join(lines)
+
+
+def render_symbols(matches: list[tuple[str, Symbol]]) -> str:
+    lines = [
+        f"{path}:{symbol.line}: {symbol.kind} {symbol.qualified_name} | {symbol.signature}"
+        for path, symbol in matches[:MAX_SYMBOL_RESULTS]
+    ]
+    if len(matches) > MAX_SYMBOL_RESULTS:
+        lines.append(f"[{len(matches) - MAX_SYMBOL_RESULTS} more matches not shown]")
+    return "\n".join(lines)
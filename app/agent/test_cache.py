@@ -0,0 +1,89 @@
+"""
+Cache of build/test results keyed by the source tree.
+
+A test run is determined by the code and the command, so the key is the git
+tree hash of the working tree (see incremental_build.working_tree_hash,
+build output excluded), the workbench and the normalised command. When the
+tester re-runs a command on an identical tree (nothing relevant changed
+since the last run, or a retry) the stored result is returned instantly
+instead of building again. The cache lives in memory, is shared by all
+workspaces (identical trees give identical results), holds at most
+TEST_RESULT_CACHE_SIZE entries with LRU eviction and skips oversized
+outputs. Tools offer a bypass flag, e.g. for suspected flaky tests.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+TEST_RESULT_CACHE_SIZE = int(os.environ.get("TEST_RESULT_CACHE_SIZE", "64"))
+MAX_CACHED_OUTPUT_CHARS = 30000
+# Nur Prüfbefehle, deren Ergebnis allein vom Code abhängt. Nicht install/package/
+# build: deren Artefakte (node_modules, Jars, ~/.m2) werden danach noch gebraucht.
+CACHEABLE_COMMAND_PATTERN = re.compile(
+    r"^(mvnd?|\./mvnw|npm|npx|yarn|pnpm)\b.*\b(test|test-compile|compile|verify|jest|vitest|lint)\b"
+)
+
+
+@dataclass
+class CachedResult:
+    exit_code: int
+    output: str
+    created_at: float
+    hits: int = 0
+
+
+def is_cacheable_command(command: str) -> bool:
+    return bool(CACHEABLE_COMMAND_PATTERN.match(command.strip()))
+
+
+def make_cache_key(tree_hash: str, workbench: str, command: str) -> tuple[str, str, str]:
+    return tree_hash, workbench, " ".join(command.split())
+
+
+class TestResultCache:
+    """Thread-safe LRU cache of build/test results."""
+
+    def __init__(self, max_entries: int = TEST_RESULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, CachedResult] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> CachedResult | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, exit_code: int, output: str) -> None:
+        if self.max_entries <= 0 or len(output) > MAX_CACHED_OUTPUT_CHARS:
+            return
+        with self._lock:
+            self._entries[key] = CachedResult(exit_code, output, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+test_result_cache = TestResultCache()
@@ -1,9 +1,68 @@
+import asyncio
+import importlib.util
 import logging
+import os
+import time
+import weakref
 
 import httpx
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_TRELLO_BASE_URL = "https://api.trello.com/1"
+TRELLO_TIMEOUT_SECONDS = float(os.environ.get("TRELLO_TIMEOUT_SECONDS", "15"))
+TRELLO_MAX_RETRIES = int(os.environ.get("TRELLO_MAX_RETRIES", "3"))
+TRELLO_RETRY_BACKOFF_SECONDS = float(
+    os.environ.get("TRELLO_RETRY_BACKOFF_SECONDS", "1")
+)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+TRELLO_LISTS_CACHE_TTL_SECONDS = float(
+    os.environ.get("TRELLO_LISTS_CACHE_TTL_SECONDS", "300")
+)
+
+# Board-Metadaten: board id -> (Zeitpunkt, Listen)
+_board_lists_cache: dict[str, tuple[float, list[dict]]] = {}
+
+# Ein gepoolter Keep-Alive Client pro Event Loop (httpx Clients sind an den Loop gebunden)
+_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def get_trello_client() -> httpx.AsyncClient:
+    """
+    Liefert den geteilten AsyncClient für den laufenden Event Loop.
+    HTTP/2 wird genutzt, wenn das optionale Paket 'h2' installiert ist.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            timeout=httpx.Timeout(TRELLO_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            headers={"Accept": "application/json"},
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_trello_client() -> None:
+    """Schließt den Client des laufenden Event Loops (z.B. beim Shutdown)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def get_trello_base_url(sys_config: dict) -> str:
+    """
+    TRELLO_BASE_URL aus der Konfiguration, normalisiert auf die API-Version
+    (z.B. "https://api.trello.com" -> "https://api.trello.com/1").
+    """
+    env = sys_config.get("env") or {}
+    base_url = (env.get("TRELLO_BASE_URL") or DEFAULT_TRELLO_BASE_URL).rstrip("/")
+    if not base_url.endswith("/1"):
+        base_url += "/1"
+    return base_url
+
 
 def get_safe_url(url: str, params: dict) -> str:
     """
@@ -25,18 +84,71 @@ def get_safe_url(url: str, params: dict) -> str:
     return str(parsed_url.copy_with(params=new_query_params))
 
 
-async def get_all_trello_lists(sys_config: dict) -> list[dict]:
+def _retry_delay(response: httpx.Response | None, attempt: int) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return TRELLO_RETRY_BACKOFF_SECONDS * (2**attempt)
+
+
+async def trello_request(
+    method: str, path: str, sys_config: dict, params: dict | None = None
+) -> httpx.Response:
+    """
+    Führt einen Trello API Request über den geteilten Client aus.
+    Bei 429/5xx und Netzwerkfehlern wird mit exponentiellem Backoff wiederholt.
+    """
     env = sys_config.get("env")
     if not env:
         raise ValueError("Environment not found in sys_config")
 
-    url = f"https://api.trello.com/1/boards/{sys_config.get('trello_board_id')}/lists"
-    headers = {"Accept": "application/json"}
-    query = {"key": env.get("TRELLO_API_KEY"), "token": env.get("TRELLO_TOKEN")}
+    url = f"{get_trello_base_url(sys_config)}{path}"
+    query = {
+        **(params or {}),
+        "key": env.get("TRELLO_API_KEY"),
+        "token": env.get("TRELLO_TOKEN"),
+    }
+
+    logger.info(f"Trello {method}: {get_safe_url(url, query)}")
+    client = get_trello_client()
+
+    # POST (Kommentar) ist nicht idempotent: nur wiederholen, wenn Trello ihn sicher
+    # nicht verarbeitet hat (429 oder keine Verbindung)
+    idempotent = method != "POST"
+    retry_status_codes = RETRY_STATUS_CODES if idempotent else {429}
+    retry_errors = httpx.TransportError if idempotent else httpx.ConnectError
+
+    for attempt in range(TRELLO_MAX_RETRIES + 1):
+        response = None
+        try:
+            response = await client.request(method, url, params=query)
+            if response.status_code not in retry_status_codes:
+                return response
+            reason = f"HTTP {response.status_code}"
+        except retry_errors as e:
+            if attempt == TRELLO_MAX_RETRIES:
+                raise
+            reason = repr(e)
+
+        if attempt == TRELLO_MAX_RETRIES:
+            return response
+
+        delay = _retry_delay(response, attempt)
+        logger.warning(
+            f"Trello {method} failed ({reason}), "
+            f"retry {attempt + 1}/{TRELLO_MAX_RETRIES} in {delay:.1f}s"
+        )
+        await asyncio.sleep(delay)
+
 
-    logger.info(f"Trello GET: {get_safe_url(url, query)}")
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=query)
+async def get_all_trello_lists(sys_config: dict) -> list[dict]:
+    response = await trello_request(
+        "GET", f"/boards/{sys_config.get('trello_board_id')}/lists", sys_config
+    )
 
     if response.status_code != 200:
         raise Exception(f"Failed to fetch lists: {response.text}")
@@ -46,17 +158,7 @@ async def get_all_trello_lists(sys_config: dict) -> list[dict]:
 
 
 async def get_all_trello_cards(list_id: str, sys_config: dict) -> list[dict]:
-    env = sys_config.get("env")
-    if not env:
-        raise ValueError("Environment not found in sys_config")
-
-    url = f"https://api.trello.com/1/lists/{list_id}/cards"
-    headers = {"Accept": "application/json"}
-    query = {"key": env.get("TRELLO_API_KEY"), "token": env.get("TRELLO_TOKEN")}
-
-    logger.info(f"Trello GET: {get_safe_url(url, query)}")
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=query)
+    response = await trello_request("GET", f"/lists/{list_id}/cards", sys_config)
 
     if response.status_code != 200:
         raise Exception(f"Failed to fetch cards: {response.text}")
@@ -67,22 +169,79 @@ async def get_all_trello_cards(list_id: str, sys_config: dict) -> list[dict]:
     ]
 
 
-async def move_trello_card_to_list(card_id: str, list_id: str, sys_config: dict):
-    env = sys_config.get("env")
-    if not env:
-        raise ValueError("Environment not found in sys_config")
+def invalidate_trello_lists_cache(board_id: str | None = None) -> None:
+    """Verwirft die gecachten Listen eines Boards (oder aller Boards)."""
+    if board_id is None:
+        _board_lists_cache.clear()
+    else:
+        _board_lists_cache.pop(board_id, None)
 
-    url = f"https://api.trello.com/1/cards/{card_id}"
-    headers = {"Accept": "application/json"}
-    query = {
-        "idList": list_id,
-        "key": env.get("TRELLO_API_KEY"),
-        "token": env.get("TRELLO_TOKEN"),
-    }
 
-    logger.info(f"Trello PUT: {get_safe_url(url, query)}")
-    async with httpx.AsyncClient() as client:
-        response = await client.put(url, headers=headers, params=query)
+async def get_cached_trello_lists(
+    sys_config: dict, max_age: float = TRELLO_LISTS_CACHE_TTL_SECONDS
+) -> list[dict]:
+    """
+    Like get_all_trello_lists, but served from a per-board cache while the
+    entry is younger than max_age seconds.
+    """
+    board_id = sys_config.get("trello_board_id")
+    cached = _board_lists_cache.get(board_id)
+    if cached and time.monotonic() - cached[0] < max_age:
+        return cached[1]
+
+    trello_lists = await get_all_trello_lists(sys_config)
+    _board_lists_cache[board_id] = (time.monotonic(), trello_lists)
+    return trello_lists
+
+
+async def resolve_trello_list_id(list_name: str, sys_config: dict) -> str | None:
+    """
+    Resolves a list name to its ID using the board cache. On a miss the cache
+    is invalidated and the lists are fetched once more (list renamed/created).
+    """
+    trello_lists = await get_cached_trello_lists(sys_config)
+    target_list = next((data for data in trello_lists if data["name"] == list_name), None)
+
+    if not target_list:
+        invalidate_trello_lists_cache(sys_config.get("trello_board_id"))
+        trello_lists = await get_cached_trello_lists(sys_config)
+        target_list = next(
+            (data for data in trello_lists if data["name"] == list_name), None
+        )
+
+    if not target_list:
+        return None
+
+    logger.info(f"Found {list_name} list id: {target_list['id']}")
+    return target_list["id"]
+
+
+async def get_trello_cards_from_named_list(
+    list_name: str, sys_config: dict
+) -> tuple[str | None, list[dict]]:
+    """
+    Helper that resolves the Trello list ID by name and returns it together
+    with the cards of that list. Returns (None, []) if the list does not exist.
+    """
+    source_list_id = await resolve_trello_list_id(list_name, sys_config)
+
+    if not source_list_id:
+        logger.warning(f"{list_name} list not found")
+        return None, []
+
+    try:
+        cards = await get_all_trello_cards(source_list_id, sys_config)
+    except Exception:
+        # Gecachte ID könnte veraltet sein (Liste gelöscht/archiviert)
+        invalidate_trello_lists_cache(sys_config.get("trello_board_id"))
+        raise
+    return source_list_id, cards
+
+
+async def move_trello_card_to_list(card_id: str, list_id: str, sys_config: dict):
+    response = await trello_request(
+        "PUT", f"/cards/{card_id}", sys_config, {"idList": list_id}
+    )
 
     if response.status_code != 200:
         raise Exception(
@@ -97,35 +256,46 @@ async def move_trello_card_to_named_list(
     Helper that resolves the Trello list ID by name and moves the
     given card to that list. Returns the resolved list ID.
     """
-    trello_lists = await get_all_trello_lists(sys_config)
-    target_list = next((data for data in trello_lists if data["name"] == list_name), None)
+    target_list_id = await resolve_trello_list_id(list_name, sys_config)
 
-    if not target_list:
+    if not target_list_id:
         raise ValueError(f"Trello list '{list_name}' not found on configured board")
 
-    target_list_id = target_list["id"]
-    logger.info(f"Found {list_name} list id: {target_list_id}")
-    await move_trello_card_to_list(card_id, target_list_id, sys_config)
+    try:
+        await move_trello_card_to_list(card_id, target_list_id, sys_config)
+    except Exception:
+        invalidate_trello_lists_cache(sys_config.get("trello_board_id"))
+        raise
 
     return target_list_id
 
 
 async def add_comment_to_trello_card(card_id: str, comment: str, sys_config: dict):
-    env = sys_config.get("env")
-    if not env:
-        raise ValueError("Environment not found in sys_config")
+    response = await trello_request(
+        "POST", f"/cards/{card_id}/actions/comments", sys_config, {"text": comment}
+    )
 
-    url = f"https://api.trello.com/1/cards/{card_id}/actions/comments"
-    headers = {"Accept": "application/json"}
-    query = {
-        "text": comment,
-        "key": env.get("TRELLO_API_KEY"),
-        "token": env.get("TRELLO_TOKEN"),
-    }
+    if response.status_code != 200:
+        raise Exception(f"Failed to add a comment to card {card_id}: {response.text}")
 
-    logger.info(f"Trello POST: {get_safe_url(url, query)}")
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, params=query)
+
+async def register_trello_webhook(callback_url: str, sys_config: dict) -> dict:
+    """
+    Registers a webhook for the configured board. Trello verifies the
+    callback URL with a HEAD request before it accepts the webhook.
+    """
+    response = await trello_request(
+        "POST",
+        "/webhooks",
+        sys_config,
+        {
+            "callbackURL": callback_url,
+            "idModel": sys_config.get("trello_board_id"),
+            "description": "AI Coding Agent task intake",
+        },
+    )
 
     if response.status_code != 200:
-        raise Exception(f"Failed to add a comment to card {card_id}: {response.text}")
+        raise Exception(f"Failed to register webhook: {response.text}")
+
+    return response.json()
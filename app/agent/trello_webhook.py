@@ -0,0 +1,69 @@
+"""
+Helpers for the Trello webhook intake (see /webhooks/trello in webapp.py).
+
+Trello posts an action payload for every change on the watched board. We only
+react to cards that are created in or moved into the read-from list, and we
+drop cached board lists when lists change.
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+
+from agent.trello_client import invalidate_trello_lists_cache
+
+logger = logging.getLogger(__name__)
+
+LIST_ACTION_TYPES = {"createList", "updateList", "moveListToBoard", "moveListFromBoard"}
+
+
+def sign_trello_payload(body: bytes, callback_url: str, secret: str) -> str:
+    """X-Trello-Webhook header value: base64(HMAC-SHA1(secret, body + callbackURL))."""
+    digest = hmac.new(
+        secret.encode(), body + callback_url.encode(), hashlib.sha1
+    ).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_trello_signature(
+    body: bytes, signature: str | None, callback_url: str, secret: str
+) -> bool:
+    """Checks the X-Trello-Webhook header of a webhook request."""
+    if not signature:
+        return False
+    return hmac.compare_digest(
+        sign_trello_payload(body, callback_url, secret), signature
+    )
+
+
+def is_new_task_event(payload: dict, sys_config: dict) -> bool:
+    """
+    True if the action created a card in, or moved a card into, the configured
+    read-from list. Side effect: list changes invalidate the board list cache.
+    """
+    action = payload.get("action") or {}
+    action_type = action.get("type")
+    data = action.get("data") or {}
+
+    if action_type in LIST_ACTION_TYPES:
+        board_id = (data.get("board") or {}).get("id")
+        invalidate_trello_lists_cache(board_id)
+        return False
+
+    readfrom_list = sys_config.get("trello_readfrom_list")
+    if action_type == "createCard":
+        target_list = data.get("list") or {}
+    elif action_type == "updateCard" and "listAfter" in data:
+        target_list = data.get("listAfter") or {}
+    else:
+        return False
+
+    if target_list.get("name") != readfrom_list:
+        return False
+
+    card = data.get("card") or {}
+    logger.info(
+        f"Webhook: card {card.get('id')} arrived in {readfrom_list} ({action_type})"
+    )
+    return True
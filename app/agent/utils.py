@@ -2,17 +2,50 @@ import logging
 import os
 import re
 import shutil
+import tempfile
+from contextlib import contextmanager
+from contextvars import ContextVar
 
-from git import Repo
+from git import GitCommandError, InvalidGitRepositoryError, NoSuchPathError, Repo
 from langchain_core.messages import AIMessage
 
+from agent.repo_index import invalidate_file_index
+
 logger = logging.getLogger(__name__)
 
+# Unterverzeichnis im WORKSPACE für die isolierten Workspaces paralleler Aufgaben
+TASK_WORKSPACES_DIR = ".tasks"
+# Checkout von app/benchmark_build.py, liegt wie .tasks neben dem Basis-Clone
+BENCHMARK_WORKSPACE_DIR = ".benchmark"
+# Verzeichnisse im WORKSPACE, die nicht zum Basis-Clone gehören
+AGENT_DIRS = (TASK_WORKSPACES_DIR, BENCHMARK_WORKSPACE_DIR)
+
+# Workspace des aktuellen Tool-Aufrufs (pro asyncio Task / Tool-Thread isoliert).
+# Wird von den Tool-Nodes aus state["workspace"] gesetzt.
+_current_workspace: ContextVar[str | None] = ContextVar(
+    "current_workspace", default=None
+)
+
 
 # Hilfsfunktion, um Redundanz zu vermeiden
 def get_workspace():
-    # Holt den Pfad aus der Env-Var, die wir im Docker-Compose gesetzt haben
-    return os.environ.get("WORKSPACE", "/coding-agent-workspace")
+    # Workspace des aktuellen Laufs, sonst der Pfad aus der Env-Var aus dem Docker-Compose
+    return _current_workspace.get() or os.environ.get(
+        "WORKSPACE", "/coding-agent-workspace"
+    )
+
+
+@contextmanager
+def use_workspace(path: str):
+    """
+    Setzt den Workspace für den aktuellen Kontext (z.B. einen Graph-Lauf).
+    Tools, die get_workspace() nutzen, arbeiten dann in diesem Verzeichnis.
+    """
+    token = _current_workspace.set(path)
+    try:
+        yield path
+    finally:
+        _current_workspace.reset(token)
 
 
 def get_workbench():
@@ -20,22 +53,36 @@ def get_workbench():
     return os.environ.get("WORKBENCH", "")
 
 
+# workbench/ liegt im Repo-Root, unabhängig vom Arbeitsverzeichnis des Prozesses
+PROMPTS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "workbench",
+)
+_system_prompts: dict[tuple[str, str], str] = {}
+
+
 def load_system_prompt(stack: str, role: str) -> str:
     """
     Lädt den System-Prompt basierend auf Stack und Rolle.
     z.B. stack="backend", role="coder" -> liest workbench/backend/systemprompt_coder.md
+    Gelesene Prompts werden pro Prozess gecacht, der Fallback nicht.
     """
+    cached = _system_prompts.get((stack, role))
+    if cached is not None:
+        return cached
 
-    file_path = os.path.join("workbench", stack, f"systemprompt_{role}.md")
+    file_path = os.path.join(PROMPTS_DIR, stack, f"systemprompt_{role}.md")
 
     logger.info(f"Loading system prompt: {file_path}")
     try:
         with open(file_path, "r", encoding="utf-8") as f:
-            return f.read()
+            prompt = f.read()
     except FileNotFoundError:
         # Fallback, falls Datei fehlt (wichtig für Robustheit!)
         logger.warning(f"WARNUNG: System Prompt not found: {file_path}")
         return "You are a helpful coding assistent."
+    _system_prompts[(stack, role)] = prompt
+    return prompt
 
 
 def sanitize_response(response: AIMessage) -> AIMessage:
@@ -64,34 +111,37 @@ def sanitize_response(response: AIMessage) -> AIMessage:
     return response
 
 
-def save_graph_as_png(graph):
-    # 1. Die Bilddaten in einer Variable speichern (es sind Bytes)
-    png_bytes = graph.get_graph().draw_mermaid_png()
-
-    # 2. Datei im 'write binary' Modus ("wb") öffnen und speichern
-    with open("workflow_graph.png", "wb") as f:
-        f.write(png_bytes)
-
-    print("Graph wurde als 'workflow_graph.png' gespeichert.")
+GIT_CLONE_MODE_FULL = "full"
+GIT_CLONE_MODE_SHALLOW = "shallow"
+GIT_CLONE_MODE_PARTIAL = "partial"
 
 
-def save_graph_as_mermaid(graph):
-    # 1. Die Bilddaten in einer Variable speichern (es sind Bytes)
-    mermaid_code = graph.get_graph().draw_mermaid()
+def _get_clone_options() -> dict:
+    """
+    Liest den Clone-Modus aus der Env-Var GIT_CLONE_MODE.
+    full (Default), shallow (GIT_CLONE_DEPTH, Default 1) oder partial (blob:none).
+    """
+    mode = os.environ.get("GIT_CLONE_MODE", GIT_CLONE_MODE_FULL).lower()
+    if mode == GIT_CLONE_MODE_SHALLOW:
+        return {"depth": int(os.environ.get("GIT_CLONE_DEPTH", "1"))}
+    if mode == GIT_CLONE_MODE_PARTIAL:
+        return {"filter": "blob:none"}
+    if mode != GIT_CLONE_MODE_FULL:
+        logger.warning(f"Unknown GIT_CLONE_MODE '{mode}', using full clone.")
+    return {}
 
-    # 2. Datei im 'write binary' Modus ("wb") öffnen und speichern
-    with open("workflow_graph.mmd", "w") as f:
-        f.write(mermaid_code)
 
-    print("Graph wurde als 'workflow_graph.mmd' gespeichert.")
+def _normalize_repo_url(url: str) -> str:
+    """Entfernt Credentials (z.B. Token nach git_push_origin) und '.git' für den Vergleich."""
+    url = re.sub(r"^(https?://)[^@/]+@", r"\1", url.strip())
+    return url.rstrip("/").removesuffix(".git")
 
 
-def ensure_repository_exists(repo_url, work_dir):
-    """
-    Stellt sicher, dass work_dir ein valides Git-Repo ist.
-    """
-    # 1. Inhalt löschen, aber NICHT den Ordner selbst (wegen Mount)
+def _clear_directory(work_dir: str, keep: tuple[str, ...] = ()) -> None:
+    # Inhalt löschen, aber NICHT den Ordner selbst (wegen Mount)
     for filename in os.listdir(work_dir):
+        if filename in keep:
+            continue
         file_path = os.path.join(work_dir, filename)
         try:
             if os.path.isfile(file_path) or os.path.islink(file_path):
@@ -99,9 +149,128 @@ def ensure_repository_exists(repo_url, work_dir):
             elif os.path.isdir(file_path):
                 shutil.rmtree(file_path)
         except Exception as e:
-            print(f"Failed to delete {file_path}. Reason: {e}")
+            logger.warning(f"Failed to delete {file_path}. Reason: {e}")
+
+
+def _open_cached_repository(repo_url: str, work_dir: str) -> Repo | None:
+    """
+    Öffnet den vorhandenen Clone in work_dir, falls er zur repo_url passt und intakt ist.
+    """
+    try:
+        repo = Repo(work_dir)
+        if repo.bare:
+            return None
+        origin_url = repo.remotes.origin.url
+        if _normalize_repo_url(origin_url) != _normalize_repo_url(repo_url):
+            logger.info(f"Repository URL changed ({origin_url} -> {repo_url}).")
+            return None
+        repo.git.rev_parse("--verify", "HEAD")
+        return repo
+    except (InvalidGitRepositoryError, NoSuchPathError, AttributeError, ValueError):
+        return None
+    except GitCommandError as e:
+        logger.warning(f"Cached repository in {work_dir} is corrupt: {e}")
+        return None
+
+
+def get_default_branch(repo: Repo) -> str:
+    try:
+        ref = repo.git.symbolic_ref("refs/remotes/origin/HEAD")
+    except GitCommandError:
+        # origin/HEAD fehlt (z.B. bei alten Clones) -> einmalig vom Remote ermitteln
+        repo.git.remote("set-head", "origin", "--auto")
+        ref = repo.git.symbolic_ref("refs/remotes/origin/HEAD")
+    return ref.removeprefix("refs/remotes/origin/")
+
+
+def _sync_repository(repo: Repo, clone_options: dict) -> str:
+    """
+    Bringt den Clone inkrementell auf den Stand von origin/<default branch>:
+    fetch --prune, checkout/reset --hard, clean und Löschen aller lokalen Feature-Branches.
+    """
+    fetch_options = {"prune": True}
+    if "depth" in clone_options:
+        fetch_options["depth"] = clone_options["depth"]
+    repo.git.fetch("origin", **fetch_options)
+
+    default_branch = get_default_branch(repo)
+    remote_ref = f"origin/{default_branch}"
+    repo.git.checkout("-B", default_branch, remote_ref, force=True)
+    repo.git.reset("--hard", remote_ref)
+    repo.git.clean("-ffdx", *(f"--exclude={name}" for name in AGENT_DIRS))
+
+    # Branches, die in einem Task-Worktree ausgecheckt sind (laufende oder
+    # unterbrochene Läufe), gehören dem Worktree und bleiben stehen
+    checked_out = _worktree_branches(repo)
+    for head in repo.heads:
+        if head.name != default_branch and head.path not in checked_out:
+            repo.delete_head(head, force=True)
+
+    return default_branch
+
+
+def _exclude_agent_dirs(repo: Repo) -> None:
+    # Hält .tasks/ und .benchmark/ aus 'git status' und 'git add .' im Basis-Clone heraus
+    exclude_file = os.path.join(repo.git_dir, "info", "exclude")
+    os.makedirs(os.path.dirname(exclude_file), exist_ok=True)
+    existing = []
+    if os.path.exists(exclude_file):
+        with open(exclude_file, "r", encoding="utf-8") as f:
+            existing = f.read().splitlines()
+    missing = [f"/{name}/" for name in AGENT_DIRS if f"/{name}/" not in existing]
+    if missing:
+        with open(exclude_file, "a", encoding="utf-8") as f:
+            f.write("\n" + "\n".join(missing) + "\n")
+
+
+def _worktree_branches(repo: Repo) -> set[str]:
+    """Refs (refs/heads/...) that are checked out in a linked worktree."""
+    branches = set()
+    for line in repo.git.worktree("list", "--porcelain").splitlines():
+        if line.startswith("branch "):
+            branches.add(line.removeprefix("branch "))
+    return branches
+
+
+def _clone_into(repo_url: str, work_dir: str, clone_options: dict) -> None:
+    """
+    Clones into work_dir, which may only contain the task worktrees (.tasks).
+    git clone needs an empty target, so it clones next to them and moves the
+    result into place.
+    """
+    clone_dir = tempfile.mkdtemp(prefix=".clone-", dir=work_dir)
+    try:
+        Repo.clone_from(repo_url, clone_dir, **clone_options)
+        for name in os.listdir(clone_dir):
+            os.rename(os.path.join(clone_dir, name), os.path.join(work_dir, name))
+    finally:
+        shutil.rmtree(clone_dir, ignore_errors=True)
+
+
+def ensure_repository_exists(repo_url, work_dir):
+    """
+    Stellt sicher, dass work_dir ein valides Git-Repo auf dem Stand des Default-Branches ist.
+    Der Clone in work_dir bleibt zwischen den Zyklen erhalten und wird nur per fetch/reset
+    aktualisiert. Neu geklont wird nur, wenn sich die URL geändert hat oder der Clone defekt ist.
+    """
+    clone_options = _get_clone_options()
+    invalidate_file_index(work_dir)
+
+    repo = _open_cached_repository(repo_url, work_dir)
+    if repo is not None:
+        try:
+            default_branch = _sync_repository(repo, clone_options)
+            logger.info(f"Synced cached repository {repo_url} to origin/{default_branch}")
+            _exclude_agent_dirs(repo)
+            return
+        except GitCommandError as e:
+            logger.warning(f"Incremental sync failed, falling back to fresh clone: {e}")
+
+    # Die Task-Worktrees bleiben liegen: ohne ihren Clone sind sie zwar nicht
+    # mehr fortsetzbar, aber das räumt der WorkspaceManager selbst auf
+    _clear_directory(work_dir, keep=AGENT_DIRS)
+
+    logger.info(f"Cloning repository {repo_url} into {work_dir} {clone_options}")
+    _clone_into(repo_url, work_dir, clone_options)
+    _exclude_agent_dirs(Repo(work_dir))
 
-    # 2. In das nun leere Verzeichnis klonen
-    # Der Punkt '.' ist wichtig, damit git nicht einen Unterordner erstellt
-    logger.info(f"Cloning repository {repo_url} into {work_dir}")
-    Repo.clone_from(repo_url, work_dir)
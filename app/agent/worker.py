@@ -1,30 +1,283 @@
 import asyncio
+import atexit
 import json
 import logging
 import os
-import sys
-from contextlib import AsyncExitStack
+import threading
+import uuid
 
 from cryptography.fernet import Fernet
-from flask import Flask
-from langchain.chat_models import BaseChatModel
-from langgraph.graph import StateGraph
+from flask import Flask, current_app
+from langgraph.graph.state import CompiledStateGraph
+from extensions import scheduler
 from models import AgentConfig
 
-from agent.graph import create_workflow
-from agent.llm_factory import get_llm
-from agent.mcp_adapter import McpServerClient
-from agent.system_mappings import SYSTEM_DEFINITIONS
-from agent.utils import (
-    ensure_repository_exists,
-    get_workbench,
-    get_workspace,
-    save_graph_as_mermaid,
-    save_graph_as_png,
+from agent.checkpointing import (
+    RESUME_MAX_ATTEMPTS,
+    fail_graph_run,
+    get_checkpointer,
+    get_interrupted_runs,
+    remove_graph_run,
+    start_graph_run,
 )
+from agent.code_search import get_search_index
+from agent.local_tools import start_build_daemon_warmup
+from agent.metrics import RunMetricsCollector, save_run_metrics
+from agent.run_events import stream_graph_run
+from agent.runtime import AgentRuntime
+from agent.symbol_index import get_outline_index
+from agent.system_mappings import SYSTEM_DEFINITIONS
+from agent.trello_client import close_trello_client, get_trello_cards_from_named_list
+from agent.utils import ensure_repository_exists, get_workbench, get_workspace
+from agent.workspace_manager import WorkspaceManager, get_workspace_manager
 
 logger = logging.getLogger(__name__)
 
+# Lebt über alle Scheduler-Ticks hinweg und hält MCP Server, LLMs und Graph warm.
+runtime = AgentRuntime()
+
+# Mit Webhook dient das Polling nur noch als Abgleich für verpasste Events
+WEBHOOK_POLLING_INTERVAL_SECONDS = int(
+    os.environ.get("WEBHOOK_POLLING_INTERVAL_SECONDS", "900")
+)
+
+# Serialisiert die Zyklen aus Interval-Job und Webhook
+_cycle_lock = threading.Lock()
+_cycle_requested = threading.Event()
+
+
+def shutdown_runtime() -> None:
+    try:
+        runtime.run(close_trello_client())
+    except Exception as e:
+        logger.warning(f"Error while closing Trello client: {e}")
+    runtime.shutdown()
+
+
+atexit.register(shutdown_runtime)
+
+
+def get_polling_interval_seconds(config: AgentConfig | None) -> int:
+    """
+    Interval of the agent job. With a Trello webhook (TRELLO_WEBHOOK_CALLBACK_URL
+    set) new cards start a cycle right away, so polling only reconciles missed
+    events and runs at least every WEBHOOK_POLLING_INTERVAL_SECONDS.
+    """
+    interval = config.polling_interval_seconds if config else 60
+    if (
+        config
+        and config.task_system_type == "TRELLO"
+        and os.environ.get("TRELLO_WEBHOOK_CALLBACK_URL")
+    ):
+        return max(interval, WEBHOOK_POLLING_INTERVAL_SECONDS)
+    return interval
+
+
+def reschedule_agent_job(config: AgentConfig | None) -> None:
+    if scheduler.get_job("agent_job"):
+        interval = get_polling_interval_seconds(config)
+        scheduler.scheduler.reschedule_job(
+            "agent_job", trigger="interval", seconds=interval
+        )
+        logger.info(f"Agent job polls every {interval} seconds.")
+
+
+def get_max_parallel_tasks(sys_config: dict) -> int:
+    try:
+        return max(1, int(sys_config.get("max_parallel_tasks") or 1))
+    except (TypeError, ValueError):
+        return 1
+
+
+async def find_open_tasks(
+    task_system_type: str,
+    sys_config: dict,
+    limit: int,
+    exclude_ids: set[str] | None = None,
+) -> list[dict]:
+    """
+    Lightweight pre-check that looks for open tasks before any heavy setup
+    (clone, MCP servers, LLM clients, graph). Returns the initial graph state
+    for up to `limit` tasks, or an empty list if there is nothing to do.
+    """
+    if task_system_type != "TRELLO":
+        # No pre-check available for this system, let the graph decide.
+        return [{}]
+
+    list_id, cards = await get_trello_cards_from_named_list(
+        sys_config["trello_readfrom_list"], sys_config
+    )
+    cards = [card for card in cards if card["id"] not in (exclude_ids or set())]
+
+    return [{"trello_card": card, "trello_list_id": list_id} for card in cards[:limit]]
+
+
+async def run_task(
+    app_graph: CompiledStateGraph,
+    open_task: dict,
+    agent_stack: str,
+    workspace_manager: WorkspaceManager,
+) -> None:
+    """
+    Runs the graph for one task. Tasks with a card get their own git worktree,
+    so several runs can share the warm graph without touching each other's files.
+    The workspace path flows through the graph state to the tool nodes, the
+    progress goes to the live run view (see run_events). Card runs are
+    checkpointed under the card id: an interrupted run keeps its worktree and
+    checkpoints and continues from the last completed node.
+    """
+    app = current_app._get_current_object()
+    open_task = dict(open_task)
+    resume_workspace = open_task.pop("resume_workspace", None)
+    card = open_task.get("trello_card")
+    # Ohne Vorab-Karte ist die Karten-ID noch unbekannt: Checkpoints nur für diesen Lauf
+    thread_id = card["id"] if card else f"run-{uuid.uuid4()}"
+    task_label = card["id"] if card else "task"
+    task_workspace = workspace_manager.base_dir
+    metrics = RunMetricsCollector(
+        card["id"] if card else None, card.get("name") if card else None
+    )
+    run_config = {
+        "configurable": {"thread_id": thread_id},
+        "recursion_limit": 80,
+        "callbacks": [metrics],
+    }
+
+    resumed = False
+    if resume_workspace and await asyncio.to_thread(
+        workspace_manager.adopt, thread_id, resume_workspace
+    ):
+        snapshot = await app_graph.aget_state(run_config)
+        if snapshot.next:
+            resumed = True
+            task_workspace = resume_workspace
+        elif snapshot.values:
+            # Lauf war schon fertig, nur das Aufräumen fehlte (z.B. Neustart)
+            logger.info(f"Graph run for {task_label} already finished. Cleaning up.")
+            await asyncio.to_thread(remove_graph_run, app, thread_id)
+            await asyncio.to_thread(workspace_manager.release, resume_workspace)
+            return
+        else:
+            await asyncio.to_thread(workspace_manager.release, resume_workspace)
+
+    graph_input = None
+    if not resumed:
+        if resume_workspace:
+            logger.warning(f"Cannot resume {task_label} from its checkpoint. Starting over.")
+        if card:
+            await app_graph.checkpointer.adelete_thread(thread_id)
+            task_workspace = await asyncio.to_thread(workspace_manager.acquire, card["id"])
+        graph_input = {
+            "messages": [],
+            "next_step": "",
+            "trello_card_id": None,
+            "trello_list_id": None,
+            "agent_stack": agent_stack,
+            "workspace": task_workspace,
+            "history_tokens_saved": 0,
+            **open_task,
+        }
+
+    final_state = {}
+    failed = True
+    try:
+        if card:
+            # Indizes des Task-Worktrees, starten vom Stand des Basis-Clones
+            await asyncio.to_thread(get_search_index, task_workspace)
+            await asyncio.to_thread(get_outline_index, task_workspace)
+            attempt = await asyncio.to_thread(
+                start_graph_run,
+                app,
+                thread_id,
+                card,
+                open_task.get("trello_list_id"),
+                task_workspace,
+            )
+            if resumed:
+                logger.info(
+                    f"Resuming graph for {task_label} before {', '.join(snapshot.next)} "
+                    f"(attempt {attempt}/{RESUME_MAX_ATTEMPTS})."
+                )
+        logger.info(f"Executing graph for {task_label} in {task_workspace}...")
+        final_state = await stream_graph_run(
+            app_graph,
+            graph_input,
+            run_config,
+            metrics.run_id,
+            card.get("name", task_label) if card else task_label,
+        )
+        failed = False
+        logger.info(
+            f"Graph finished for {task_label}. History compaction saved "
+            f"~{final_state.get('history_tokens_saved', 0)} prompt tokens."
+        )
+    except Exception as e:
+        logger.error(f"Graph run for {task_label} failed: {e}", exc_info=True)
+        if card:
+            await asyncio.to_thread(fail_graph_run, app, thread_id, str(e))
+    finally:
+        metrics.finish_run(failed)
+        metrics.log_summary()
+        if not metrics.card_id:
+            # Ohne Vorab-Karte setzt erst der Graph die Karten-ID
+            metrics.card_id = final_state.get("trello_card_id")
+        await asyncio.to_thread(save_run_metrics, app, metrics)
+        if not card:
+            await app_graph.checkpointer.adelete_thread(thread_id)
+        elif failed:
+            # Worktree und Checkpoints bleiben, der nächste Zyklus setzt fort
+            await asyncio.to_thread(workspace_manager.suspend, task_workspace)
+        else:
+            await asyncio.to_thread(remove_graph_run, app, thread_id)
+            await asyncio.to_thread(workspace_manager.release, task_workspace)
+
+
+async def run_task_pool(
+    app_graph: CompiledStateGraph,
+    open_tasks: list[dict],
+    task_system_type: str,
+    sys_config: dict,
+    agent_stack: str,
+    workspace_manager: WorkspaceManager,
+    max_parallel: int,
+) -> None:
+    """
+    Bounded worker pool: runs up to `max_parallel` tasks at once and refills
+    free slots with newly found tasks until the list is empty.
+    """
+    running: set[asyncio.Task] = set()
+    seen_ids: set[str] = set()
+    refill = True
+
+    while True:
+        for open_task in open_tasks:
+            card = open_task.get("trello_card")
+            if card:
+                seen_ids.add(card["id"])
+            else:
+                # The graph fetches its own task, so there is nothing to refill with.
+                refill = False
+            running.add(
+                asyncio.create_task(
+                    run_task(app_graph, open_task, agent_stack, workspace_manager)
+                )
+            )
+
+        if not running:
+            break
+
+        _, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+        open_tasks = []
+        free_slots = max_parallel - len(running)
+        if refill and free_slots > 0:
+            try:
+                open_tasks = await find_open_tasks(
+                    task_system_type, sys_config, free_slots, seen_ids
+                )
+            except Exception as e:
+                logger.error(f"Fetching further open tasks failed: {e}")
+
 
 async def run_agent_cycle_async(app: Flask, encryption_key: Fernet) -> None:
     with app.app_context():
@@ -52,70 +305,100 @@ async def run_agent_cycle_async(app: Flask, encryption_key: Fernet) -> None:
             logger.error("Could not parse or decrypt existing configuration.")
             return
 
-        task_env = os.environ.copy()
-        task_env.update(sys_config.get("env", {}))
+        # --- Pre-Check: is there anything to do? ---
+        max_parallel = get_max_parallel_tasks(sys_config)
+        # Unterbrochene Läufe früherer Zyklen zuerst fortsetzen
+        interrupted = await asyncio.to_thread(get_interrupted_runs, app)
+        open_tasks = interrupted[:max_parallel]
+        try:
+            if len(open_tasks) < max_parallel:
+                open_tasks += await find_open_tasks(
+                    config.task_system_type,
+                    sys_config,
+                    max_parallel - len(open_tasks),
+                    {task["trello_card"]["id"] for task in interrupted},
+                )
+        except Exception as e:
+            logger.error(f"Pre-check for open tasks failed: {e}")
+            if not open_tasks:
+                return
+        if not open_tasks:
+            logger.info("No open tasks found. Skipping cycle.")
+            return
 
         repo_url: str = (
             config.github_repo_url or "https://github.com/tom-test-user/test-repo.git"
         )
-        ensure_repository_exists(repo_url, WORKSPACE)
-
-        async with AsyncExitStack() as stack:
-            # --- Start ALL MCP Servers ---
-            git_mcp = McpServerClient(
-                command=sys.executable,
-                args=["-m", "mcp_server_git", "--repository", WORKSPACE],
-                env=os.environ.copy(),
-            )
-            task_mcp = McpServerClient(
-                system_def["command"][0], system_def["command"][1:], env=task_env
-            )
-
-            await stack.enter_async_context(git_mcp)
-            await stack.enter_async_context(task_mcp)
+        workspace_manager = get_workspace_manager(WORKSPACE)
+        workspace_manager.max_idle = max_parallel
+        await asyncio.to_thread(
+            workspace_manager.collect_garbage,
+            {task["resume_workspace"] for task in interrupted},
+        )
+        await asyncio.to_thread(ensure_repository_exists, repo_url, WORKSPACE)
+        # Such- und Outline-Index nach dem Sync aktualisieren (inkrementell). Sie
+        # sind der Startpunkt für die Indizes der Task-Worktrees.
+        await asyncio.to_thread(get_search_index, WORKSPACE)
+        await asyncio.to_thread(get_outline_index, WORKSPACE)
 
-            git_tools = await git_mcp.get_langchain_tools()
-            task_tools = await task_mcp.get_langchain_tools()
-            logger.info(
-                f"Loaded {len(git_tools)} Git tools and {len(task_tools)} Task tools."
-            )
+        # --- Agent Stack ---
+        WORKBENCH = get_workbench()
+        agent_stack = "backend" if WORKBENCH == "workbench-backend" else "frontend"
+        if agent_stack == "backend":
+            # Opt-in (WARM_BUILD_MODE=mvnd): Maven Daemon parallel zum Coder aufwärmen
+            start_build_daemon_warmup()
 
-            # --- Agent Stack ---
-            WORKBENCH = get_workbench()
-            agent_stack = "backend" if WORKBENCH == "workbench-backend" else "frontend"
-
-            # --- LLM and Graph Creation ---
-            llm_large: BaseChatModel = get_llm(sys_config, True)
-            llm_small: BaseChatModel = get_llm(sys_config, False)
-            workflow: StateGraph = create_workflow(
-                llm_large,
-                llm_small,
-                git_tools,
-                task_tools,
-                repo_url,
-                sys_config,
-                agent_stack,
-            )
+        # --- Warm Runtime (MCP Servers, LLMs, compiled Graph) ---
+        app_graph = await runtime.get_graph(
+            sys_config,
+            system_def,
+            repo_url,
+            agent_stack,
+            WORKSPACE,
+            get_checkpointer(app),
+        )
 
-            # --- Graph Execution ---
-            app_graph = workflow.compile()
-            save_graph_as_png(app_graph)
-            save_graph_as_mermaid(app_graph)
-            logger.info("Executing graph...")
-            final_state = await app_graph.ainvoke(
-                {
-                    "messages": [],
-                    "next_step": "",
-                    "trello_card_id": None,
-                    "trello_list_id": None,
-                    "agent_stack": agent_stack,
-                },
-                {"recursion_limit": 80},
-            )
+        # --- Graph Execution (bounded worker pool) ---
+        logger.info(f"Processing open tasks with max parallelism {max_parallel}.")
+        await run_task_pool(
+            app_graph,
+            open_tasks,
+            config.task_system_type,
+            sys_config,
+            agent_stack,
+            workspace_manager,
+            max_parallel,
+        )
 
 
 def run_agent_cycle(app: Flask, encryption_key: Fernet) -> None:
-    try:
-        asyncio.run(run_agent_cycle_async(app, encryption_key))
-    except Exception as e:
-        logger.error(f"Critical error in agent cycle: {e}", exc_info=True)
+    """
+    Runs agent cycles one at a time. A request that arrives while a cycle is
+    running (interval job or webhook) makes the running cycle do one more pass
+    instead of starting a second, overlapping cycle.
+    """
+    _cycle_requested.set()
+    while _cycle_requested.is_set():
+        if not _cycle_lock.acquire(blocking=False):
+            logger.info("Agent cycle already running. Request queued.")
+            return
+        try:
+            while _cycle_requested.is_set():
+                _cycle_requested.clear()
+                try:
+                    runtime.run(run_agent_cycle_async(app, encryption_key))
+                except Exception as e:
+                    logger.error(f"Critical error in agent cycle: {e}", exc_info=True)
+        finally:
+            _cycle_lock.release()
+
+
+def trigger_agent_cycle(app: Flask, encryption_key: Fernet) -> None:
+    """Starts an agent cycle right away (e.g. from a webhook), off the request thread."""
+    scheduler.add_job(
+        id="agent_job_trigger",
+        func=run_agent_cycle,
+        trigger="date",
+        replace_existing=True,
+        args=[app, encryption_key],
+    )
@@ -0,0 +1,187 @@
+"""
+Per-task workspaces as git worktrees.
+
+All worktrees share the object store of the synced base clone in WORKSPACE
+and live in <WORKSPACE>/.tasks, so the workbench container sees them under
+the same path. Released worktrees are reset and kept for reuse; anything
+above the idle limit, or left over from a crash, is removed. Worktrees of
+interrupted runs are suspended as they are and adopted again on resume.
+"""
+
+import logging
+import os
+import shutil
+import threading
+
+from git import GitCommandError, InvalidGitRepositoryError, NoSuchPathError, Repo
+
+from agent.repo_index import invalidate_file_index
+from agent.utils import TASK_WORKSPACES_DIR, _exclude_agent_dirs, get_default_branch
+
+logger = logging.getLogger(__name__)
+
+_GIT_ERRORS = (GitCommandError, InvalidGitRepositoryError, NoSuchPathError)
+
+
+class WorkspaceManager:
+    """
+    Hands out one git worktree per graph run and recycles it afterwards.
+    """
+
+    def __init__(self, base_dir: str, max_idle: int = 1):
+        self.base_dir = base_dir
+        self.max_idle = max_idle
+        self._root = os.path.join(base_dir, TASK_WORKSPACES_DIR)
+        self._lock = threading.Lock()
+        self._idle: list[str] = []
+        self._in_use: dict[str, str] = {}  # worktree path -> task id
+        self._counter = 0
+
+    def acquire(self, task_id: str) -> str:
+        """Returns a clean worktree on the default branch for the given task."""
+        with self._lock:
+            base_repo = Repo(self.base_dir)
+            default_branch = get_default_branch(base_repo)
+
+            task_dir = None
+            while self._idle and task_dir is None:
+                candidate = self._idle.pop()
+                try:
+                    self._reset_worktree(candidate, default_branch)
+                    task_dir = candidate
+                except _GIT_ERRORS as e:
+                    logger.warning(f"Discarding broken worktree {candidate}: {e}")
+                    self._remove_worktree(base_repo, candidate)
+
+            if task_dir is None:
+                _exclude_agent_dirs(base_repo)
+                task_dir = self._next_worktree_path()
+                base_repo.git.worktree("add", "--detach", task_dir, default_branch)
+                logger.info(f"Created worktree {task_dir}")
+
+            self._in_use[task_dir] = task_id
+            logger.info(f"Task {task_id} uses workspace {task_dir}")
+            return task_dir
+
+    def release(self, task_dir: str) -> None:
+        """
+        Resets the worktree after the task is done (incl. deleting the local
+        task branch) and keeps it for reuse, or removes it above the idle limit.
+        """
+        with self._lock:
+            task_id = self._in_use.pop(task_dir, None)
+            try:
+                base_repo = Repo(self.base_dir)
+            except _GIT_ERRORS:
+                # Base clone was re-created, the worktree is gone with it
+                shutil.rmtree(task_dir, ignore_errors=True)
+                return
+
+            if len(self._idle) < self.max_idle:
+                try:
+                    self._reset_worktree(task_dir, get_default_branch(base_repo))
+                    self._idle.append(task_dir)
+                    logger.info(f"Recycled workspace {task_dir} of task {task_id}")
+                    return
+                except _GIT_ERRORS as e:
+                    logger.warning(f"Could not reset worktree {task_dir}: {e}")
+
+            self._remove_worktree(base_repo, task_dir)
+
+    def suspend(self, task_dir: str) -> None:
+        """
+        Gives the worktree of an interrupted run back without resetting it, so
+        the run can be resumed on its files (see adopt). It is not reused for
+        other tasks.
+        """
+        with self._lock:
+            task_id = self._in_use.pop(task_dir, None)
+            logger.info(f"Keeping workspace {task_dir} of task {task_id} for resuming")
+
+    def adopt(self, task_id: str, task_dir: str) -> bool:
+        """
+        Takes a suspended worktree (also from before a restart) into use again
+        as it is. Returns False if it is gone or no longer a valid worktree.
+        """
+        with self._lock:
+            if os.path.dirname(task_dir) != self._root or task_dir in self._in_use:
+                return False
+            try:
+                Repo(task_dir)
+            except _GIT_ERRORS:
+                return False
+            if task_dir in self._idle:
+                self._idle.remove(task_dir)
+            self._in_use[task_dir] = task_id
+            logger.info(f"Task {task_id} resumes in workspace {task_dir}")
+            return True
+
+    def collect_garbage(self, keep: set[str] | None = None) -> None:
+        """
+        Removes worktrees that are neither idle, in use nor listed in `keep`
+        (worktrees of interrupted runs), e.g. after a crash or restart, and
+        prunes stale worktree metadata. Call this before the base clone is synced.
+        """
+        with self._lock:
+            try:
+                base_repo = Repo(self.base_dir)
+            except _GIT_ERRORS:
+                return
+
+            known = set(self._idle) | set(self._in_use) | (keep or set())
+            if os.path.isdir(self._root):
+                for name in os.listdir(self._root):
+                    task_dir = os.path.join(self._root, name)
+                    if task_dir not in known:
+                        logger.info(f"Removing orphaned workspace {task_dir}")
+                        self._remove_worktree(base_repo, task_dir)
+
+            while len(self._idle) > self.max_idle:
+                self._remove_worktree(base_repo, self._idle.pop())
+
+            try:
+                base_repo.git.worktree("prune")
+            except GitCommandError as e:
+                logger.warning(f"git worktree prune failed: {e}")
+
+    def _next_worktree_path(self) -> str:
+        while True:
+            self._counter += 1
+            task_dir = os.path.join(self._root, f"wt-{self._counter}")
+            if not os.path.exists(task_dir):
+                return task_dir
+
+    @staticmethod
+    def _reset_worktree(task_dir: str, default_branch: str) -> None:
+        worktree = Repo(task_dir)
+        task_branch = None if worktree.head.is_detached else worktree.active_branch.name
+
+        worktree.git.checkout("--force", "--detach", default_branch)
+        worktree.git.clean("-ffdx")
+        invalidate_file_index(task_dir)
+
+        if task_branch and task_branch != default_branch:
+            worktree.git.branch("-D", task_branch)
+
+    @staticmethod
+    def _remove_worktree(base_repo: Repo, task_dir: str) -> None:
+        invalidate_file_index(task_dir)
+        try:
+            base_repo.git.worktree("remove", "--force", task_dir)
+        except GitCommandError:
+            shutil.rmtree(task_dir, ignore_errors=True)
+            try:
+                base_repo.git.worktree("prune")
+            except GitCommandError as e:
+                logger.warning(f"git worktree prune failed: {e}")
+        logger.info(f"Removed workspace {task_dir}")
+
+
+_workspace_managers: dict[str, WorkspaceManager] = {}
+
+
+def get_workspace_manager(base_dir: str) -> WorkspaceManager:
+    """Returns the process-wide WorkspaceManager for a base workspace."""
+    if base_dir not in _workspace_managers:
+        _workspace_managers[base_dir] = WorkspaceManager(base_dir)
+    return _workspace_managers[base_dir]
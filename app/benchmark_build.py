@@ -0,0 +1,85 @@
+"""
+Build latency benchmark for the backend workbench: fresh Maven JVM per
+command (mvn) versus the resident Maven daemon (mvnd).
+
+Clones the sample calculator repository into the shared workspace and runs
+the same Maven command several times with both variants through the docker
+exec channel the agent uses. The first mvnd run after 'mvnd --stop' is
+reported separately (daemon start), the rest are warm runs.
+
+    docker compose exec ai-coding-agent uv run python app/benchmark_build.py
+    docker compose exec ai-coding-agent uv run python app/benchmark_build.py \
+        --goals "test -Dtest=CalculatorServiceTest" --iterations 10
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+from agent.local_tools import _run_workbench_command, client
+from agent.utils import (
+    BENCHMARK_WORKSPACE_DIR,
+    ensure_repository_exists,
+    get_workspace,
+    use_workspace,
+)
+
+SAMPLE_REPO_URL = "https://github.com/tomwey2/calculator-spring-docker-jenkins.git"
+
+
+async def _timed(command: str) -> float:
+    started = time.monotonic()
+    exit_code, output = await _run_workbench_command(command)
+    seconds = time.monotonic() - started
+    if exit_code != 0:
+        raise RuntimeError(f"'{command}' failed (Exit Code {exit_code}):\n{output[-2000:]}")
+    return seconds
+
+
+def _format(label: str, samples: list[float]) -> str:
+    return (
+        f"{label:<14} n={len(samples):<3} min={min(samples):6.1f}s "
+        f"median={statistics.median(samples):6.1f}s max={max(samples):6.1f}s"
+    )
+
+
+async def run_benchmark(goals: str, iterations: int) -> None:
+    # Einmal ohne Messung: Abhängigkeiten ins lokale Maven-Repository laden
+    await _timed(f"mvn -B -q {goals}")
+
+    mvn_samples = [await _timed(f"mvn -B {goals}") for _ in range(iterations)]
+    print(_format("mvn", mvn_samples))
+
+    await _run_workbench_command("mvnd --stop")
+    daemon_start = await _timed(f"mvnd -B {goals}")
+    mvnd_samples = [await _timed(f"mvnd -B {goals}") for _ in range(iterations)]
+    print(_format("mvnd (start)", [daemon_start]))
+    print(_format("mvnd (warm)", mvnd_samples))
+    speedup = statistics.median(mvn_samples) / statistics.median(mvnd_samples)
+    print(f"median speedup warm mvnd vs. mvn: {speedup:.1f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repo", default=SAMPLE_REPO_URL)
+    parser.add_argument("--goals", default="test", help="Maven goals and options")
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if not client:
+        raise SystemExit("No docker connection. Run this inside the ai-coding-agent container.")
+
+    # Nicht unter .tasks: das räumt der WorkspaceManager als verwaist ab
+    bench_dir = os.path.join(get_workspace(), BENCHMARK_WORKSPACE_DIR)
+    os.makedirs(bench_dir, exist_ok=True)
+    ensure_repository_exists(args.repo, bench_dir)
+    with use_workspace(bench_dir):
+        asyncio.run(run_benchmark(args.goals, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,10 @@
 import os
 
-from agent.worker import run_agent_cycle
+from agent.worker import get_polling_interval_seconds, run_agent_cycle
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 from extensions import db, scheduler
-from models import AgentConfig
+from models import AgentConfig, add_missing_columns
 from webapp import create_app
 
 load_dotenv()
@@ -66,10 +66,11 @@ if __name__ == "__main__":
 
     with app.app_context():
         db.create_all()
+        add_missing_columns()
 
         # Get polling interval from DB or use default
         config = AgentConfig.query.first()
-        interval_seconds = config.polling_interval_seconds if config else 60
+        interval_seconds = get_polling_interval_seconds(config)
 
         # Add the agent job to the scheduler if it doesn't exist
         if not scheduler.get_job("agent_job"):
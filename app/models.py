@@ -1,5 +1,13 @@
+from sqlalchemy import inspect, text
+
 from extensions import db
 
+# db.create_all() legt nur fehlende Tabellen an. Spalten, die einer bestehenden
+# Tabelle später hinzugefügt wurden, zieht add_missing_columns() nach.
+ADDED_COLUMNS = {
+    "run_metric": {"cached_prompt_tokens": "INTEGER NOT NULL DEFAULT 0"},
+}
+
 
 class AgentConfig(db.Model):
     __tablename__ = "agent_config"
@@ -29,3 +37,113 @@ class AgentConfig(db.Model):
 
     def __repr__(self):
         return f"<AgentConfig {self.id}>"
+
+
+class RunMetric(db.Model):
+    """
+    Aggregated measurements of one graph run: one row per LLM node, per tool
+    and one row for the whole run (kind "run").
+    """
+
+    __tablename__ = "run_metric"
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.String(36), nullable=False, index=True)
+    card_id = db.Column(db.String(64), nullable=True, index=True)
+    card_name = db.Column(db.String(200), nullable=True)
+    started_at = db.Column(db.DateTime, nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # "run", "node" or "tool"
+    name = db.Column(db.String(100), nullable=False)  # node or tool name
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    retries = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    # Anteil der Prompt Tokens, der aus dem Prompt-Cache des Providers kam
+    cached_prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+    seconds = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<RunMetric {self.run_id} {self.kind}:{self.name}>"
+
+
+class GraphCheckpoint(db.Model):
+    """LangGraph checkpoint of a graph run (see agent.checkpointing)."""
+
+    __tablename__ = "graph_checkpoint"
+    __table_args__ = (
+        db.UniqueConstraint("thread_id", "checkpoint_ns", "checkpoint_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    thread_id = db.Column(db.String(64), nullable=False, index=True)  # Karten-ID
+    checkpoint_ns = db.Column(db.String(200), nullable=False, default="")
+    checkpoint_id = db.Column(db.String(64), nullable=False)
+    parent_checkpoint_id = db.Column(db.String(64), nullable=True)
+    type = db.Column(db.String(20), nullable=False)
+    checkpoint = db.Column(db.LargeBinary, nullable=False)  # inkl. channel_values
+    metadata_type = db.Column(db.String(20), nullable=False)
+    checkpoint_metadata = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<GraphCheckpoint {self.thread_id} {self.checkpoint_id}>"
+
+
+class GraphCheckpointWrite(db.Model):
+    """Pending write of a graph task that belongs to a checkpoint."""
+
+    __tablename__ = "graph_checkpoint_write"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    thread_id = db.Column(db.String(64), nullable=False, index=True)
+    checkpoint_ns = db.Column(db.String(200), nullable=False, default="")
+    checkpoint_id = db.Column(db.String(64), nullable=False)
+    task_id = db.Column(db.String(64), nullable=False)
+    task_path = db.Column(db.String(500), nullable=False, default="")
+    idx = db.Column(db.Integer, nullable=False)
+    channel = db.Column(db.String(200), nullable=False)
+    type = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f"<GraphCheckpointWrite {self.thread_id} {self.task_id}:{self.idx}>"
+
+
+class GraphRun(db.Model):
+    """
+    Checkpointed graph run of a card that has not reached the end yet. The row
+    is removed when the run finishes; a row left over at the start of a cycle
+    is an interrupted run (error, recursion limit, restart) that gets resumed.
+    """
+
+    __tablename__ = "graph_run"
+
+    thread_id = db.Column(db.String(64), primary_key=True)  # Karten-ID
+    card_json = db.Column(db.Text, nullable=False)
+    trello_list_id = db.Column(db.String(64), nullable=True)
+    workspace = db.Column(db.String(500), nullable=False)  # Worktree mit dem Arbeitsstand
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<GraphRun {self.thread_id} attempts={self.attempts}>"
+
+
+def add_missing_columns() -> None:
+    """Adds the ADDED_COLUMNS missing in existing tables (idempotent, run after create_all)."""
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table, columns in ADDED_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl in columns.items():
+                if name not in existing:
+                    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
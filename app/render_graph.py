@@ -0,0 +1,52 @@
+"""
+Renders the workflow graph as Mermaid source or PNG, without a running agent.
+
+Uses the same on-disk cache as /graph.mmd and /graph.png (app/instance/graph_cache).
+
+    docker compose exec ai-coding-agent uv run python app/render_graph.py
+    docker compose exec ai-coding-agent uv run python app/render_graph.py \
+        --output images/workflow_graph.png --method graphviz
+"""
+
+import argparse
+import logging
+import os
+
+from agent.graph_render import (
+    GRAPH_RENDER_METHODS,
+    build_topology_graph,
+    render_graph_mermaid,
+    render_graph_png,
+)
+
+GRAPH_CACHE_DIR = os.path.join(os.path.dirname(__file__), "instance", "graph_cache")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--output", help="write to this file; .png renders a PNG, otherwise Mermaid"
+    )
+    parser.add_argument(
+        "--method", choices=GRAPH_RENDER_METHODS, help="PNG render method (default: GRAPH_RENDER_METHOD)"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(name)s - %(levelname)s - %(message)s")
+
+    graph = build_topology_graph()
+    if not args.output or not args.output.lower().endswith(".png"):
+        mermaid_code = render_graph_mermaid(graph, GRAPH_CACHE_DIR)
+        if not args.output:
+            print(mermaid_code)
+            return
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(mermaid_code)
+    else:
+        png_bytes = render_graph_png(graph, GRAPH_CACHE_DIR, args.method)
+        with open(args.output, "wb") as f:
+            f.write(png_bytes)
+    print(f"Graph written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Posts a fake Trello webhook action to /webhooks/trello to test the webhook
+intake without Trello.
+
+The payload creates a card in (or, with --move, moves a card into) the given
+list and is signed like Trello does, with TRELLO_WEBHOOK_SECRET and
+TRELLO_WEBHOOK_CALLBACK_URL. Exits with 0 if the agent answered
+'202 queued', i.e. an agent cycle was started.
+
+    docker compose exec ai-coding-agent uv run python app/send_trello_webhook.py
+    docker compose exec ai-coding-agent uv run python app/send_trello_webhook.py \
+        --list "Sprint Backlog" --move
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import requests
+
+from agent.trello_webhook import sign_trello_payload
+
+
+def build_payload(list_name: str, move: bool) -> dict:
+    card = {"id": "fake-card", "name": "Fake card from send_trello_webhook.py"}
+    if move:
+        data = {"card": card, "listBefore": {"name": "Backlog"}, "listAfter": {"name": list_name}}
+        return {"action": {"type": "updateCard", "data": data}}
+    return {"action": {"type": "createCard", "data": {"card": card, "list": {"name": list_name}}}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:5000/webhooks/trello")
+    parser.add_argument("--list", default="Sprint Backlog", help="read-from list of the agent")
+    parser.add_argument("--move", action="store_true", help="send updateCard instead of createCard")
+    args = parser.parse_args()
+
+    secret = os.environ.get("TRELLO_WEBHOOK_SECRET")
+    callback_url = os.environ.get("TRELLO_WEBHOOK_CALLBACK_URL")
+    if not secret or not callback_url:
+        sys.exit("TRELLO_WEBHOOK_SECRET and TRELLO_WEBHOOK_CALLBACK_URL must be set.")
+
+    body = json.dumps(build_payload(args.list, args.move)).encode()
+    # Der Server prüft gegen die registrierte Callback-URL, nicht gegen --url
+    headers = {
+        "Content-Type": "application/json",
+        "X-Trello-Webhook": sign_trello_payload(body, callback_url, secret),
+    }
+
+    response = requests.post(args.url, data=body, headers=headers, timeout=15)
+    print(f"{response.status_code} {response.text.strip()}")
+    sys.exit(0 if response.status_code == 202 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,29 @@
 import json
 import os
+import threading
 
 from cryptography.fernet import Fernet, InvalidToken
-from flask import Flask, flash, redirect, render_template, request, url_for
+from flask import (
+    Flask,
+    Response,
+    abort,
+    flash,
+    redirect,
+    render_template,
+    request,
+    url_for,
+)
 
+from agent.graph_render import (
+    build_topology_graph,
+    render_graph_mermaid,
+    render_graph_png,
+)
+from agent.metrics import get_metrics_summary, render_prometheus_metrics
+from agent.run_events import run_event_bus
+from agent.trello_client import register_trello_webhook
+from agent.trello_webhook import is_new_task_event, verify_trello_signature
+from agent.worker import reschedule_agent_job, runtime, trigger_agent_cycle
 from extensions import db, scheduler
 from models import AgentConfig
 
@@ -17,6 +37,10 @@ LLM_PROVIDER_API_ENV = {
     "anthropic": "ANTHROPIC_API_KEY",
 }
 
+SSE_KEEPALIVE_SECONDS = 15
+# Jeder offene Event-Stream belegt einen Thread des Webservers
+MAX_SSE_CLIENTS = 8
+
 
 def _missing_provider_env(provider: str) -> str | None:
     if provider == "ollama":
@@ -60,6 +84,7 @@ def create_app(encryption_key: Fernet) -> Flask:
             except (ValueError, TypeError):
                 flash("Invalid polling interval. Please enter a number.", "danger")
                 polling_interval = 60  # Fallback
+                config.polling_interval_seconds = polling_interval
 
             # Create JSON from the specific fields for the selected system
 
@@ -117,6 +142,15 @@ def create_app(encryption_key: Fernet) -> Flask:
             }
             new_config_data.update(llm_config)
 
+            try:
+                max_parallel_tasks = max(
+                    1, int(request.form.get("max_parallel_tasks", 1))
+                )
+            except (ValueError, TypeError):
+                flash("Invalid max parallel tasks. Please enter a number.", "danger")
+                max_parallel_tasks = 1  # Fallback
+            new_config_data["max_parallel_tasks"] = max_parallel_tasks
+
             # Encrypt the JSON configuration
             json_config_str = json.dumps(new_config_data, indent=2)
             encrypted_config = encryption_key.encrypt(json_config_str.encode()).decode()
@@ -127,10 +161,7 @@ def create_app(encryption_key: Fernet) -> Flask:
             db.session.commit()
 
             # Reschedule job
-            if scheduler.get_job("agent_job"):
-                scheduler.scheduler.reschedule_job(
-                    "agent_job", trigger="interval", seconds=polling_interval
-                )
+            reschedule_agent_job(config)
 
             flash("Configuration saved successfully!", "success")
             return redirect(url_for("index"))
@@ -180,6 +211,9 @@ def create_app(encryption_key: Fernet) -> Flask:
                 form_data["llm_model_small"] = saved_data.get("llm_model_small")
                 form_data["llm_temperature"] = saved_data.get("llm_temperature", 0.0)
 
+                # Agent data
+                form_data["max_parallel_tasks"] = saved_data.get("max_parallel_tasks", 1)
+
             except (InvalidToken, TypeError, AttributeError, json.JSONDecodeError):
                 flash(
                     "Could not parse or decrypt existing configuration. It may be legacy data. Re-saving will fix it.",
@@ -202,6 +236,136 @@ def create_app(encryption_key: Fernet) -> Flask:
             selected_provider=selected_provider,
             missing_provider_env=missing_provider_env,
             show_ollama_warning=show_ollama_warning,
+            metrics_summary=get_metrics_summary(),
         )
 
+    @app.route("/graph.mmd")
+    def graph_mermaid():
+        graph_cache_dir = os.path.join(app.instance_path, "graph_cache")
+        mermaid_code = render_graph_mermaid(build_topology_graph(), graph_cache_dir)
+        return Response(mermaid_code, mimetype="text/plain")
+
+    @app.route("/graph.png")
+    def graph_png():
+        graph = build_topology_graph()
+        graph_cache_dir = os.path.join(app.instance_path, "graph_cache")
+        try:
+            png_bytes = render_graph_png(
+                graph, graph_cache_dir, request.args.get("method")
+            )
+        except ValueError as e:
+            abort(400, description=str(e))
+        except ImportError as e:
+            abort(501, description=f"Local rendering not available: {e}")
+        except Exception as e:
+            abort(502, description=f"Graph rendering failed: {e}")
+        return Response(png_bytes, mimetype="image/png")
+
+    sse_clients = threading.BoundedSemaphore(MAX_SSE_CLIENTS)
+
+    @app.route("/runs")
+    def live_runs():
+        return render_template("runs.html", runs=run_event_bus.runs())
+
+    @app.route("/runs/events")
+    def run_events_stream():
+        after_seq = run_event_bus.resume_seq(
+            request.headers.get("Last-Event-ID") or request.args.get("after")
+        )
+        if not sse_clients.acquire(blocking=False):
+            abort(503, description="Too many live run viewers.")
+
+        def generate():
+            seq = after_seq
+            yield "retry: 3000\n\n"
+            while True:
+                events = run_event_bus.wait_for_events(seq, SSE_KEEPALIVE_SECONDS)
+                if not events:
+                    yield ": keepalive\n\n"
+                    continue
+                for event in events:
+                    seq = event.seq
+                    yield event.to_sse()
+
+        response = Response(
+            generate(),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.call_on_close(sse_clients.release)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(
+            render_prometheus_metrics(), mimetype="text/plain; version=0.0.4"
+        )
+
+    def _load_sys_config(config: AgentConfig) -> dict:
+        try:
+            decrypted_json = encryption_key.decrypt(
+                config.system_config_json.encode()
+            ).decode()
+            return json.loads(decrypted_json or "{}")
+        except (InvalidToken, TypeError, AttributeError, json.JSONDecodeError):
+            return {}
+
+    @app.route("/webhooks/trello", methods=["HEAD", "POST"])
+    def trello_webhook():
+        # Trello prüft die Callback-URL beim Registrieren mit einem HEAD Request
+        if request.method == "HEAD":
+            return Response(status=200)
+
+        # Ohne Secret könnte jeder per Fake-Payload einen Zyklus starten
+        secret = os.environ.get("TRELLO_WEBHOOK_SECRET")
+        callback_url = os.environ.get("TRELLO_WEBHOOK_CALLBACK_URL")
+        if not secret or not callback_url:
+            abort(
+                403,
+                description="Trello webhook intake needs TRELLO_WEBHOOK_SECRET "
+                "and TRELLO_WEBHOOK_CALLBACK_URL.",
+            )
+        if not verify_trello_signature(
+            request.get_data(),
+            request.headers.get("X-Trello-Webhook"),
+            callback_url,
+            secret,
+        ):
+            abort(401, description="Invalid Trello webhook signature.")
+
+        config = AgentConfig.query.first()
+        if not config or not config.is_active or config.task_system_type != "TRELLO":
+            return Response("ignored", status=200, mimetype="text/plain")
+
+        payload = request.get_json(silent=True) or {}
+        if not is_new_task_event(payload, _load_sys_config(config)):
+            return Response("ignored", status=200, mimetype="text/plain")
+
+        trigger_agent_cycle(app, encryption_key)
+        return Response("queued", status=202, mimetype="text/plain")
+
+    @app.route("/webhooks/trello/register", methods=["POST"])
+    def register_trello_webhook_route():
+        callback_url = os.environ.get("TRELLO_WEBHOOK_CALLBACK_URL")
+        if not callback_url:
+            flash("TRELLO_WEBHOOK_CALLBACK_URL is not set.", "danger")
+            return redirect(url_for("index"))
+        if not os.environ.get("TRELLO_WEBHOOK_SECRET"):
+            flash(
+                "TRELLO_WEBHOOK_SECRET is not set. Without it the webhook "
+                "signatures cannot be verified.",
+                "danger",
+            )
+            return redirect(url_for("index"))
+
+        config = AgentConfig.query.first()
+        sys_config = _load_sys_config(config) if config else {}
+        try:
+            runtime.run(register_trello_webhook(callback_url, sys_config))
+            flash(f"Trello webhook registered for {callback_url}.", "success")
+            reschedule_agent_job(config)
+        except Exception as e:
+            flash(f"Could not register Trello webhook: {e}", "danger")
+        return redirect(url_for("index"))
+
     return app
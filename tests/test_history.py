@@ -0,0 +1,159 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph import END, START, StateGraph
+
+from agent.history import ELIDED_PREVIEW_CHARS, compact_history
+from agent.state import AgentState
+
+LONG_OUTPUT = "x" * (ELIDED_PREVIEW_CHARS * 10)
+
+
+def tool_call(call_id: str, name: str, **args) -> list:
+    """An AI tool call and its tool result."""
+    return [
+        AIMessage(content="", tool_calls=[{"id": call_id, "name": name, "args": args}]),
+        ToolMessage(content=LONG_OUTPUT, tool_call_id=call_id, name=name),
+    ]
+
+
+def filler(count: int) -> list:
+    return [HumanMessage(content=f"step {i}") for i in range(count)]
+
+
+def is_elided(message, reason: str = "") -> bool:
+    return message.content.startswith("[") and reason in message.content.splitlines()[0]
+
+
+def test_read_superseded_by_later_write_is_elided():
+    messages = [
+        *tool_call("1", "read_file", filepath="/src/A.java"),
+        *tool_call("2", "write_to_file", filepath="src/A.java", content="..."),
+        *filler(6),
+    ]
+
+    compacted, stats = compact_history(messages, token_budget=10**6)
+
+    assert is_elided(compacted[1], "superseded read of src/A.java")
+    assert compacted[3] is messages[3]
+    assert stats.tokens_saved > 0
+
+
+def test_only_the_latest_read_of_a_file_is_kept():
+    messages = [
+        *tool_call("1", "read_file", filepath="src/A.java"),
+        *tool_call("2", "read_file", filepath="src/B.java"),
+        *tool_call("3", "read_file", filepath="src/A.java"),
+        *filler(6),
+    ]
+
+    compacted, _ = compact_history(messages, token_budget=10**6)
+
+    assert is_elided(compacted[1], "superseded read of src/A.java")
+    assert compacted[3] is messages[3]
+    assert compacted[5] is messages[5]
+
+
+def test_batch_read_of_whole_files_is_superseded():
+    messages = [
+        *tool_call("1", "read_files", files=[{"path": "src/A.java"}, {"path": "src/B.java"}]),
+        *tool_call("2", "write_to_file", filepath="src/A.java", content="..."),
+        *tool_call("3", "read_file", filepath="src/B.java"),
+        *filler(6),
+    ]
+
+    compacted, _ = compact_history(messages, token_budget=10**6)
+
+    assert is_elided(compacted[1], "superseded read of src/A.java, src/B.java")
+
+
+def test_partial_batch_read_is_kept():
+    messages = [
+        *tool_call(
+            "1",
+            "read_files",
+            files=[{"path": "src/A.java", "start_line": 10, "end_line": 40}],
+        ),
+        *tool_call("2", "write_to_file", filepath="src/A.java", content="..."),
+        *filler(6),
+    ]
+
+    compacted, _ = compact_history(messages, token_budget=10**6)
+
+    assert compacted[1] is messages[1]
+
+
+def test_only_the_latest_build_output_is_kept():
+    messages = [
+        *tool_call("1", "run_java_command", command="mvn test"),
+        *tool_call("2", "run_tests"),
+        *tool_call("3", "run_java_command", command="mvn test"),
+        *filler(6),
+    ]
+
+    compacted, _ = compact_history(messages, token_budget=10**6)
+
+    assert is_elided(compacted[1], "older build output")
+    assert is_elided(compacted[3], "older build output")
+    assert compacted[5] is messages[5]
+
+
+def test_recent_messages_are_never_compacted():
+    messages = [
+        *tool_call("1", "read_file", filepath="src/A.java"),
+        *tool_call("2", "read_file", filepath="src/A.java"),
+        *filler(3),
+    ]
+
+    # Die stale Lesung liegt im Fenster der letzten 6 Nachrichten
+    compacted, stats = compact_history(messages, token_budget=1, keep_recent=6)
+
+    assert compacted == messages
+    assert stats.tokens_saved == 0
+
+
+def test_token_budget_boundary():
+    messages = [
+        *tool_call("1", "read_file", filepath="src/A.java"),
+        *tool_call("2", "read_file", filepath="src/B.java"),
+        *tool_call("3", "read_file", filepath="src/C.java"),
+        *filler(6),
+    ]
+    tokens = count_tokens_approximately(messages)
+
+    at_budget, stats = compact_history(messages, token_budget=tokens)
+    assert at_budget == messages
+    assert stats.tokens_before == stats.tokens_after == tokens
+
+    over_budget, stats = compact_history(messages, token_budget=tokens - 1)
+    # Die ältesten Ausgaben zuerst, bis 75% des Budgets erreicht sind
+    assert is_elided(over_budget[1], "old tool output")
+    assert stats.tokens_after < tokens - 1
+    assert stats.tokens_after == count_tokens_approximately(over_budget)
+    assert len(over_budget) == len(messages)
+    assert [m.tool_call_id for m in over_budget if isinstance(m, ToolMessage)] == ["1", "2", "3"]
+
+
+def test_input_history_is_not_modified():
+    messages = [
+        *tool_call("1", "read_file", filepath="src/A.java"),
+        *tool_call("2", "read_file", filepath="src/A.java"),
+        *filler(6),
+    ]
+    original = [m.model_copy() for m in messages]
+
+    compact_history(messages, token_budget=1)
+
+    assert messages == original
+
+
+def test_history_tokens_saved_is_summed_over_nodes():
+    graph = StateGraph(AgentState)
+    graph.add_node("coder", lambda state: {"history_tokens_saved": 120})
+    graph.add_node("tester", lambda state: {"history_tokens_saved": 30})
+    graph.add_edge(START, "coder")
+    graph.add_edge("coder", "tester")
+    graph.add_edge("tester", END)
+
+    final_state = graph.compile().invoke({"messages": [], "history_tokens_saved": 0})
+
+    assert final_state["history_tokens_saved"] == 150
@@ -0,0 +1,130 @@
+import pytest
+
+from agent.incremental_build import (
+    MAX_INCREMENTAL_TEST_CLASSES,
+    TestSelection as Selection,
+    _is_test_class,
+    build_test_command,
+    select_affected_tests,
+    working_tree_hash,
+)
+from conftest import git, write_files
+
+MAIN = "src/main/java/com/example/"
+TEST = "src/test/java/com/example/"
+
+
+def java_class(name: str, body: str = "") -> str:
+    return f"package com.example;\n\npublic class {name} {{\n{body}\n}}\n"
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        (f"{TEST}CalculatorTest.java", True),
+        (f"{TEST}CalculatorTests.java", True),
+        (f"{TEST}CalculatorIT.java", True),
+        (f"{TEST}CalculatorTestCase.java", True),
+        (f"{TEST}TestCalculator.java", True),
+        (f"{TEST}CalculatorFixture.java", False),
+        (f"{MAIN}CalculatorTest.java", False),
+        (f"{TEST}CalculatorTest.kt", False),
+    ],
+)
+def test_is_test_class_follows_surefire_naming(path, expected):
+    assert _is_test_class(path) is expected
+
+
+def test_selects_tests_named_after_or_referencing_a_changed_class(make_repo):
+    repo = make_repo(
+        {
+            f"{MAIN}Calculator.java": java_class("Calculator"),
+            f"{TEST}CalculatorTest.java": java_class("CalculatorTest"),
+            f"{TEST}CalculatorServiceTest.java": java_class("CalculatorServiceTest"),
+            f"{TEST}ReportTest.java": java_class(
+                "ReportTest", "    Calculator calculator = new Calculator();"
+            ),
+            f"{TEST}UnrelatedTest.java": java_class("UnrelatedTest", "    int calculatorCount;"),
+        }
+    )
+
+    selection = select_affected_tests(repo, [f"{MAIN}Calculator.java"])
+
+    assert not selection.run_all
+    assert selection.test_classes == ["CalculatorServiceTest", "CalculatorTest", "ReportTest"]
+
+
+def test_changed_test_class_runs_itself_unless_deleted(make_repo):
+    repo = make_repo({f"{TEST}CalculatorTest.java": java_class("CalculatorTest")})
+
+    selection = select_affected_tests(
+        repo, [f"{TEST}CalculatorTest.java", f"{TEST}RemovedTest.java"]
+    )
+
+    assert selection.test_classes == ["CalculatorTest"]
+
+
+@pytest.mark.parametrize(
+    "changed",
+    ["pom.xml", "module/pom.xml", "src/main/resources/application.properties", "src/test/resources/data.sql"],
+)
+def test_pom_or_resource_change_runs_all_tests(make_repo, changed):
+    repo = make_repo({f"{TEST}CalculatorTest.java": java_class("CalculatorTest")})
+
+    selection = select_affected_tests(repo, [f"{MAIN}Calculator.java", changed])
+
+    assert selection.run_all
+    assert selection.reason == f"{changed} changed"
+
+
+@pytest.mark.parametrize(
+    "test_count, run_all",
+    [(MAX_INCREMENTAL_TEST_CLASSES, False), (MAX_INCREMENTAL_TEST_CLASSES + 1, True)],
+)
+def test_too_many_affected_test_classes_run_all_tests(make_repo, test_count, run_all):
+    files = {f"{MAIN}Shared.java": java_class("Shared")}
+    for i in range(test_count):
+        files[f"{TEST}Shared{i}Test.java"] = java_class(f"Shared{i}Test")
+    repo = make_repo(files)
+
+    selection = select_affected_tests(repo, [f"{MAIN}Shared.java"])
+
+    assert len(selection.test_classes) == test_count
+    assert selection.run_all is run_all
+
+
+def test_build_test_command():
+    assert build_test_command(None) == "mvn -B clean test"
+    assert build_test_command(Selection([], run_all=True)) == "mvn -B test"
+    assert build_test_command(Selection(["README.md"])) == "mvn -B test-compile"
+    assert build_test_command(Selection([], ["ATest", "BTest"])) == (
+        "mvn -B test -Dtest=ATest,BTest "
+        "-Dsurefire.failIfNoSpecifiedTests=false -DfailIfNoTests=false"
+    )
+
+
+def test_working_tree_hash_ignores_build_output(make_repo):
+    repo = make_repo({f"{MAIN}Calculator.java": java_class("Calculator")})
+    clean_hash = working_tree_hash(repo)
+
+    assert clean_hash == git(repo, "rev-parse", "HEAD^{tree}").strip()
+    assert working_tree_hash(repo) == clean_hash
+
+    write_files(repo, {"target/classes/Calculator.class": "bytecode", "web/node_modules/x.js": ""})
+    assert working_tree_hash(repo) == clean_hash
+
+    write_files(repo, {f"{MAIN}Calculator.java": java_class("Calculator", "    int x;")})
+    changed_hash = working_tree_hash(repo)
+    assert changed_hash != clean_hash
+
+    # Der echte Index bleibt unverändert
+    assert git(repo, "diff", "--cached", "--name-only") == ""
+
+
+def test_working_tree_hash_includes_untracked_files(make_repo):
+    repo = make_repo({f"{MAIN}Calculator.java": java_class("Calculator")})
+    clean_hash = working_tree_hash(repo)
+
+    write_files(repo, {f"{MAIN}Helper.java": java_class("Helper")})
+
+    assert working_tree_hash(repo) != clean_hash
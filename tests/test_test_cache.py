@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from agent import local_tools
+from agent.test_cache import (
+    MAX_CACHED_OUTPUT_CHARS,
+    TestResultCache as ResultCache,
+    is_cacheable_command,
+    make_cache_key,
+)
+from agent.utils import use_workspace
+
+
+@pytest.mark.parametrize(
+    "command, cacheable",
+    [
+        ("mvn -B test", True),
+        ("mvn -B test -Dtest=CalculatorTest", True),
+        ("  mvnd clean verify", True),
+        ("./mvnw test-compile", True),
+        ("npm run lint", True),
+        ("npx jest src/app", True),
+        ("mvn clean install", False),
+        ("mvn package", False),
+        ("npm install", False),
+        ("java -jar target/app.jar", False),
+        ("echo mvn test", False),
+    ],
+)
+def test_is_cacheable_command(command, cacheable):
+    assert is_cacheable_command(command) is cacheable
+
+
+def test_cache_key_normalises_whitespace():
+    assert make_cache_key("tree", "wb", " mvn  -B   test ") == ("tree", "wb", "mvn -B test")
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 0, "a")
+    cache.put("b", 0, "b")
+    assert cache.get("a").output == "a"
+
+    cache.put("c", 1, "c")
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a").hits == 2
+    assert cache.get("c").exit_code == 1
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_oversized_output_is_not_cached():
+    cache = ResultCache()
+    cache.put("fits", 0, "x" * MAX_CACHED_OUTPUT_CHARS)
+    cache.put("too large", 0, "x" * (MAX_CACHED_OUTPUT_CHARS + 1))
+
+    assert cache.get("fits") is not None
+    assert cache.get("too large") is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(max_entries=0)
+    cache.put("a", 0, "a")
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def run_build(make_repo, monkeypatch):
+    """Runs _run_build in a git workspace with a fake workbench returning the given exit codes."""
+    repo = make_repo({"pom.xml": "<project/>"})
+    cache = ResultCache()
+    monkeypatch.setattr(local_tools, "test_result_cache", cache)
+    calls = []
+
+    def _run_build(command: str, exit_code: int):
+        async def fake_workbench_command(resolved_command):
+            calls.append(resolved_command)
+            return exit_code, f"output {len(calls)}"
+
+        monkeypatch.setattr(local_tools, "_run_workbench_command", fake_workbench_command)
+        with use_workspace(repo):
+            return asyncio.run(local_tools._run_build(command))
+
+    _run_build.cache = cache
+    _run_build.calls = calls
+    return _run_build
+
+
+def test_run_build_returns_cached_result_on_identical_tree(run_build):
+    first = run_build("mvn -B test", 1)
+    second = run_build("mvn -B test", 1)
+
+    assert len(run_build.calls) == 1
+    assert second[0] == 1
+    assert second[1].startswith("(Cached result")
+    assert second[2] == first[2]
+
+
+@pytest.mark.parametrize("exit_code", [local_tools.TIMEOUT_EXIT_CODE, local_tools.KILLED_EXIT_CODE])
+def test_run_build_never_caches_timeouts_and_kills(run_build, exit_code):
+    run_build("mvn -B test", exit_code)
+    run_build("mvn -B test", exit_code)
+
+    assert len(run_build.calls) == 2
+    assert len(run_build.cache) == 0